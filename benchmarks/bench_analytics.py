@@ -0,0 +1,144 @@
+"""
+Benchmark of the vectorized spending forecast on a synthetic dataset.
+
+Stores `--rows` expenses of one user, spread over the last year across a dozen
+categories, in a temporary database. It then times loading them into arrays
+with one query, and computing the forecast with NumPy compared with the same
+computation written as Python loops.
+
+Usage:
+    python -m benchmarks.bench_analytics [--rows 1000000]
+"""
+import argparse
+import calendar
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+from src.utils import analytics, db
+
+CATEGORIES = ["Food", "Transport", "Rent", "Leisure", "Health", "Gifts",
+              "Utilities", "Travel", "Education", "Clothes", "Pets", ""]
+
+
+def make_database(path, rows, today):
+    """Creates a database holding `rows` expenses of user 1 over the last year."""
+    conn = sqlite3.connect(path)
+    db.create_expenses_table(conn)
+    db.create_budgets_table(conn)
+    db.create_indexes(conn)
+    start = today - timedelta(days=364)
+    conn.executemany(
+        "INSERT INTO expenses (user_id, amount, description, category, date_added) "
+        "VALUES (1, ?, 'Synthetic', ?, ?)",
+        (
+            (
+                round(random.uniform(1, 100), 2),
+                random.choice(CATEGORIES),
+                f"{start + timedelta(days=i * 365 // rows)} 12:00:00",
+            )
+            for i in range(rows)
+        ),
+    )
+    conn.commit()
+    return conn
+
+
+def python_forecast(
+    rows,
+    today,
+    history_days=analytics.DEFAULT_HISTORY_DAYS,
+    window_days=analytics.DEFAULT_WINDOW_DAYS,
+    horizon_days=analytics.DEFAULT_HORIZON_DAYS,
+):
+    """The same forecast as analytics.forecast, written with Python loops."""
+    today_number = analytics.day_number(today)
+    start_day = today_number - history_days + 1
+    month_start = analytics.day_number(today.replace(day=1))
+    daily = defaultdict(lambda: [0.0] * history_days)
+    spent = defaultdict(float)
+    for day, amount, category in rows:
+        if start_day <= day <= today_number:
+            daily[category][day - start_day] += amount
+        if month_start <= day <= today_number:
+            spent[category] += amount
+
+    days_left = calendar.monthrange(today.year, today.month)[1] - today.day
+    x_mean = (history_days - 1) / 2
+    denominator = sum((x - x_mean) ** 2 for x in range(history_days))
+    results = {}
+    for category, totals in daily.items():
+        y_mean = sum(totals) / history_days
+        slope = (
+            sum((x - x_mean) * (y - y_mean) for x, y in enumerate(totals)) / denominator
+        )
+        intercept = y_mean - slope * x_mean
+
+        def predict(stop):
+            return sum(
+                max(intercept + slope * x, 0)
+                for x in range(history_days, history_days + stop)
+            )
+
+        results[category] = {
+            "recent_total": sum(totals[-window_days:]),
+            "spent_this_month": spent[category],
+            "projected_month_total": spent[category] + predict(days_left),
+            "forecast_total": predict(horizon_days),
+            "trend_per_day": slope,
+        }
+    return results
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--rows", type=int, default=1000000)
+    args = parser.parse_args()
+
+    today = date.today()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        conn, setup = timed(
+            make_database, os.path.join(tmpdir, "expenses.db"), args.rows, today
+        )
+        try:
+            rows, query_time = timed(db.get_expense_series, conn, 1, None)
+            series, array_time = timed(analytics.ExpenseSeries.from_rows, rows)
+        finally:
+            conn.close()
+
+    vectorized, vectorized_time = timed(analytics.forecast, series, today)
+    looped, looped_time = timed(python_forecast, rows, today)
+    for result in vectorized:
+        expected = looped[result["category"]]
+        assert all(
+            abs(result[key] - expected[key]) < 1e-6 * max(1, abs(expected[key]))
+            for key in expected
+        )
+
+    print(
+        f"{args.rows} expenses in {len(series.categories)} categories (database built "
+        f"in {setup:.1f} s)"
+    )
+    print(f"query:                {query_time * 1000:8.1f} ms")
+    print(f"rows to arrays:       {array_time * 1000:8.1f} ms")
+    print(f"forecast (NumPy):     {vectorized_time * 1000:8.1f} ms")
+    print(
+        f"forecast (loops):     {looped_time * 1000:8.1f} ms  "
+        f"({looped_time / vectorized_time:.0f}x slower)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+Offline benchmark of the command path, driving the Cogs with simulated contexts.
+
+Fires `--invocations` concurrent `log_expense`, `list_expenses`, `update_expense`
+and `set_language` commands from `--concurrency` simulated users at a temporary
+database, the way the tests in tests/test_commands invoke them, so no network
+and no Discord token are needed. Prints the throughput, the p50/p95/p99
+latency of each command and the lag of the event loop (measured by a ticker
+task), as the median of `--repeat` runs.
+
+The results are then compared with the baseline in bench_commands_baseline.json:
+the run fails (exit status 1) if a command logged an error, or if the throughput
+dropped, or a p95 latency or the median loop lag grew, by more than `--tolerance`.
+`--update-baseline` stores the results as the new baseline instead.
+
+Usage:
+    python -m benchmarks.bench_commands [--invocations 5000] [--concurrency 200]
+                                        [--users 50] [--repeat 3] [--tolerance 0.5]
+                                        [--update-baseline]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import discord
+from discord.ext import commands
+
+from benchmarks.bench_import import ticker
+from src.commands.list_expenses import ListExpenses
+from src.commands.log_expense import LogExpense
+from src.commands.set_language import SetLanguage
+from src.commands.update_expense import UpdateExpense
+from src.utils import db
+from src.utils.config import Config
+from src.utils.database import Database
+from src.utils.metrics import Histogram
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "bench_commands_baseline.json")
+
+# Share of each command in the simulated load
+MIX = {
+    "log_expense": 0.5,
+    "list_expenses": 0.25,
+    "update_expense": 0.15,
+    "set_language": 0.1,
+}
+
+DESCRIPTIONS = ["Coffee", "Lunch at work", "Taxi home", "Groceries", "Cinema tickets",
+                "Phone bill", "Book", "Gym membership", "Pizza night", "Train ticket"]
+
+
+class ErrorCounter(logging.Handler):
+    """Counts the errors logged by the commands, e.g. a locked database."""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.count = 0
+
+    def emit(self, record):
+        self.count += 1
+
+
+class FakeMessage:
+    """The message returned by `send`; only what the Cogs use of it."""
+
+    async def edit(self, **kwargs):
+        pass
+
+
+class FakeContext:
+    """
+    A minimal stand-in for commands.Context. The tests use MagicMock contexts, but
+    creating and calling those costs more than the commands themselves, which would
+    hide the command path in the measurements.
+    """
+
+    def __init__(self, command, user_id):
+        self.command = command
+        self.author = SimpleNamespace(id=user_id, bot=False)
+        self.guild = None
+        self.message = SimpleNamespace(attachments=[])
+        self.sent = 0
+
+    async def send(self, content=None, **kwargs):
+        self.sent += 1
+        view = kwargs.get("view")
+        if view is not None:
+            view.stop()  # Nobody turns the pages; don't keep their timeouts running
+        return FakeMessage()
+
+
+async def make_bot(path):
+    """Creates a bot with the four Cogs and a database at `path`, without logging in."""
+    bot = commands.Bot(command_prefix="!", intents=discord.Intents.default())
+    bot.config = Config()
+    bot.db = Database(path)
+    cogs = {
+        "log_expense": LogExpense(bot),
+        "list_expenses": ListExpenses(bot),
+        "update_expense": UpdateExpense(bot),
+        "set_language": SetLanguage(bot),
+    }
+    for cog in cogs.values():
+        await bot.add_cog(cog)
+    return bot, cogs
+
+
+def make_calls(rng, cogs, invocations, users, expense_ids):
+    """
+    Returns (command name, command, context, arguments) tuples for a
+    random mix of invocations.
+    """
+    names = rng.choices(list(MIX), weights=list(MIX.values()), k=invocations)
+    calls = []
+    for name in names:
+        user_id = rng.randrange(users)
+        command = getattr(cogs[name], name)
+        ctx = FakeContext(command, user_id)
+        if name == "log_expense":
+            arguments = {
+                "amount": round(rng.uniform(1, 80), 2),
+                "description": rng.choice(DESCRIPTIONS),
+            }
+        elif name == "list_expenses":
+            arguments = {}
+        elif name == "update_expense":
+            arguments = {
+                "expense_id": rng.choice(expense_ids[user_id]),
+                "new_amount": round(rng.uniform(1, 80), 2),
+                "new_description": rng.choice(DESCRIPTIONS),
+            }
+        else:
+            arguments = {"language": rng.choice(("en", "es"))}
+        calls.append((name, command, ctx, arguments))
+    return calls
+
+
+async def run(invocations, concurrency, users, seed=42):
+    """Runs the load against a fresh database and returns the results as a dict."""
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        bot, cogs = await make_bot(os.path.join(tmpdir, "expenses.db"))
+        database = bot.db
+        errors = ErrorCounter()
+        logging.getLogger("src").addHandler(errors)
+        try:
+            # Seed a page and a half of history per user, so listings have a next page
+            expense_ids = {}
+            for user_id in range(users):
+                rows = [
+                    (user_id, float(i + 1), rng.choice(DESCRIPTIONS), None)
+                    for i in range(15)
+                ]
+                expense_ids[user_id] = await database.write(db.insert_expenses, rows)
+
+            calls = make_calls(rng, cogs, invocations, users, expense_ids)
+            histograms = {name: Histogram() for name in MIX}
+            overall = Histogram()
+            pending = iter(calls)
+
+            async def worker():
+                # Each worker stands for a user waiting on their
+                # reply before the next command
+                for name, command, ctx, arguments in pending:
+                    start = time.perf_counter()
+                    await command(ctx, **arguments)
+                    latency = time.perf_counter() - start
+                    histograms[name].record(latency)
+                    overall.record(latency)
+
+            stalls = []
+            tick = asyncio.create_task(ticker(stalls))
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - start
+            tick.cancel()
+        finally:
+            logging.getLogger("src").removeHandler(errors)
+            database.close()
+
+    lag = Histogram()
+    for stall in stalls:
+        lag.record(max(stall, 0.0))
+    return {
+        "invocations": invocations,
+        "concurrency": concurrency,
+        "throughput": round(invocations / elapsed, 1),
+        "errors": errors.count,
+        "latency_ms": {
+            name: dict(
+                zip(
+                    ("p50", "p95", "p99"),
+                    (round(value * 1000, 3) for value in histogram.quantiles()),
+                )
+            )
+            for name, histogram in {"all": overall, **histograms}.items()
+        },
+        "loop_lag_ms": dict(
+            zip(
+                ("p50", "p99", "max"),
+                (
+                    *(round(value * 1000, 3) for value in lag.quantiles((0.5, 0.99))),
+                    round(lag.max * 1000, 3),
+                ),
+            )
+        ),
+    }
+
+
+def median_results(runs):
+    """Combines the results of repeated runs, taking the median of every measurement."""
+    first = runs[0]
+    if not isinstance(first, dict):
+        return statistics.median(runs)
+    return {key: median_results([run[key] for run in runs]) for key in first}
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns a description of every measurement that regressed by more than `tolerance`.
+    The gate uses p95 latencies and the median loop lag: p99 and the longest stall of a
+    few thousand commands vary too much from run to run to fail a build on.
+    """
+    regressions = []
+    if results["errors"] > baseline["errors"]:
+        regressions.append(f"{results['errors']} commands logged errors")
+    if results["throughput"] < baseline["throughput"] * (1 - tolerance):
+        regressions.append(
+            f"throughput {results['throughput']:.0f}/s, baseline "
+            f"{baseline['throughput']:.0f}/s"
+        )
+    for name, latencies in baseline["latency_ms"].items():
+        current = results["latency_ms"][name]["p95"]
+        if current > latencies["p95"] * (1 + tolerance):
+            regressions.append(
+                f"{name} p95 {current:.2f} ms, baseline {latencies['p95']:.2f} ms"
+            )
+    if results["loop_lag_ms"]["p50"] > baseline["loop_lag_ms"]["p50"] * (1 + tolerance):
+        regressions.append(f"loop lag p50 {results['loop_lag_ms']['p50']:.2f} ms, "
+                           f"baseline {baseline['loop_lag_ms']['p50']:.2f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--invocations", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    # Errors are counted rather than printed; anything less severe is noise here
+    logging.disable(logging.WARNING)
+    results = median_results(
+        [
+            asyncio.run(run(args.invocations, args.concurrency, args.users))
+            for _ in range(args.repeat)
+        ]
+    )
+
+    print(
+        f"{results['invocations']} commands, {results['concurrency']} in flight, "
+        f"median of {args.repeat} runs: "
+        f"{results['throughput']:.0f} commands/s, {results['errors']} errors"
+    )
+    for name, latencies in results["latency_ms"].items():
+        print(
+            f"  {name:<15} p50 {latencies['p50']:8.2f} ms   p95 "
+            f"{latencies['p95']:8.2f} ms   p99 {latencies['p99']:8.2f} ms"
+        )
+    lag = results["loop_lag_ms"]
+    print(
+        f"Event loop lag: p50 {lag['p50']:.2f} ms, p99 {lag['p99']:.2f} ms, max "
+        f"{lag['max']:.2f} ms"
+    )
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+            baseline_file.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    try:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    except FileNotFoundError:
+        print(
+            f"No baseline at {args.baseline}; run with --update-baseline to create one"
+        )
+        return
+    if (baseline["invocations"], baseline["concurrency"]) != (
+        results["invocations"],
+        results["concurrency"],
+    ):
+        print(
+            "The baseline was recorded with other --invocations/--concurrency; not "
+            "comparing"
+        )
+        return
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    if regressions:
+        sys.exit(1)
+    print(f"Within {args.tolerance:.0%} of the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark comparing one commit per `insert_expense` with batched group commit.
+
+Simulates a burst of concurrent `!log_expense` commands against a temporary
+database and prints inserts per second for both strategies.
+
+Usage:
+    python -m benchmarks.bench_group_commit [--rows 2000] [--window-ms 5]
+                                            [--max-rows 100]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from src.utils import db
+from src.utils.database import Database
+
+
+async def per_row_commit(database, rows):
+    """Every insert is its own transaction on the serialized writer."""
+    await asyncio.gather(*(database.write(db.insert_expense, *row) for row in rows))
+
+
+async def batched_commit(database, rows):
+    """Inserts go through the group-commit batcher."""
+    await asyncio.gather(*(database.insert_expense(*row) for row in rows))
+
+
+async def measure(strategy, rows, synchronous, window_ms, max_rows):
+    """Returns inserts per second for one strategy on a fresh database."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        database = Database(
+            os.path.join(tmpdir, "expenses.db"),
+            synchronous=synchronous,
+            batch_window_ms=window_ms,
+            batch_max_rows=max_rows,
+        )
+        try:
+            await database.read(lambda conn: None)  # Open the database before timing
+            start = time.perf_counter()
+            await strategy(database, rows)
+            elapsed = time.perf_counter() - start
+        finally:
+            database.close()
+    return len(rows) / elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--window-ms", type=float, default=5)
+    parser.add_argument("--max-rows", type=int, default=100)
+    args = parser.parse_args()
+
+    rows = [(i % 25, 12.5, f"Expense {i}", None) for i in range(args.rows)]
+    print(
+        f"{args.rows} concurrent inserts, window {args.window_ms} ms, batches of up to "
+        f"{args.max_rows}"
+    )
+    for synchronous in ("full", "normal"):
+        per_row = await measure(
+            per_row_commit, rows, synchronous, args.window_ms, args.max_rows
+        )
+        batched = await measure(
+            batched_commit, rows, synchronous, args.window_ms, args.max_rows
+        )
+        print(
+            f"synchronous={synchronous:<6} per-row: {per_row:9.0f} rows/s  "
+            f"batched: {batched:9.0f} rows/s  ({batched / per_row:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
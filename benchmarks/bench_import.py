@@ -0,0 +1,99 @@
+"""
+Benchmark of the bulk expense import.
+
+Generates a CSV file of about a year of bank exports, imports it through
+`ExpenseImport` into a temporary database and prints rows per second, the
+number of transactions and the longest stall of the event loop during the
+import (measured by a ticker task), which is what other commands would wait.
+
+Usage:
+    python -m benchmarks.bench_import [--rows 100000] [--chunk-size 5000]
+"""
+import argparse
+import asyncio
+import io
+import os
+import random
+import tempfile
+import time
+
+from src.commands.import_expenses import IMPORT_CHUNK_SIZE, ExpenseImport
+from src.utils import db
+from src.utils.database import Database
+
+CATEGORIES = ["Food", "Transport", "Rent", "Leisure", ""]
+
+
+def make_csv(rows):
+    """Returns a CSV export with `rows` expenses spread over a year."""
+    lines = ["date,amount,description,category"]
+    for i in range(rows):
+        day = 1 + i * 365 // rows
+        lines.append(
+            f"2024-{1 + (day - 1) // 31 % 12:02d}-{1 + (day - 1) % 28:02d},"
+            f"{random.uniform(1, 200):.2f},Card payment {i},{random.choice(CATEGORIES)}"
+        )
+    return "\n".join(lines) + "\n"
+
+
+async def ticker(stalls, interval=0.005):
+    """Records the longest delay of a task that wakes up every `interval` seconds."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        stalls.append(loop.time() - start - interval)
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    data = make_csv(args.rows)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        database = Database(os.path.join(tmpdir, "expenses.db"))
+        try:
+            await database.read(lambda conn: None)  # Open the database before timing
+            transactions = []
+            write = database.write
+
+            async def counting_write(fn, *fn_args, **kwargs):
+                transactions.append(fn)
+                return await write(fn, *fn_args, **kwargs)
+
+            database.write = counting_write
+
+            stalls = []
+            tick = asyncio.create_task(ticker(stalls))
+            job = ExpenseImport(
+                database, 1, io.StringIO(data, newline=""), "csv", args.chunk_size
+            )
+            start = time.perf_counter()
+            imported = await job.run()
+            elapsed = time.perf_counter() - start
+            tick.cancel()
+
+            total = await write(
+                lambda conn: conn.execute("SELECT COUNT(*) FROM expenses").fetchone()[0]
+            )
+            drift = await write(db.find_expense_totals_drift)
+        finally:
+            database.close()
+
+    print(
+        f"Imported {imported} of {args.rows} rows ({job.invalid} invalid) in "
+        f"{elapsed:.2f} s: {imported / elapsed:.0f} rows/s"
+    )
+    print(
+        f"{len(transactions)} transactions of up to {args.chunk_size} rows, {total} "
+        f"rows stored, totals drift: {len(drift)}"
+    )
+    print(f"Longest event loop stall: {max(stalls, default=0) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
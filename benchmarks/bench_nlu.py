@@ -0,0 +1,159 @@
+"""
+Benchmark of the fuzzy category matcher and the natural-language expense parser.
+
+Indexes `--size` synthetic categories and as many past descriptions, then times
+category suggestions for descriptions with typos through the n-gram index, and
+the same lookup done by computing the edit distance against every description.
+Finally measures how many chat messages per second the expense parser handles,
+most of them expenses in English or Spanish and the rest ordinary chat.
+
+Usage:
+    python -m benchmarks.bench_nlu [--size 10000] [--queries 1000] [--messages 100000]
+"""
+import argparse
+import random
+import statistics
+import time
+
+from src.utils import nlu
+
+SYLLABLES = [
+    "ca",
+    "fe",
+    "ta",
+    "xi",
+    "mer",
+    "ca",
+    "do",
+    "su",
+    "per",
+    "far",
+    "ma",
+    "cia",
+    "gas",
+    "li",
+    "na",
+    "res",
+    "tau",
+    "ran",
+    "te",
+    "ci",
+    "ne",
+    "li",
+    "bro",
+    "pan",
+    "de",
+    "ria",
+]
+
+
+def make_word(rng, syllables):
+    return "".join(rng.choice(SYLLABLES) for _ in range(syllables))
+
+
+def make_typo(rng, text):
+    """Returns `text` with one character replaced, dropped or doubled."""
+    i = rng.randrange(len(text))
+    edit = rng.randrange(3)
+    if edit == 0:
+        return text[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + text[i + 1:]
+    if edit == 1:
+        return text[:i] + text[i + 1:]
+    return text[:i] + text[i] + text[i:]
+
+
+MESSAGES = [
+    "spent 12.50 on lunch yesterday",
+    "I paid $1,200 for rent",
+    "bought 3 coffees at the station today",
+    "gasté 20 en taxi",
+    "Gaste $45.000 en el mercado antes de ayer",
+    "pagué 12,50 por un libro",
+    "good morning everyone",
+    "did anyone see the game last night?",
+    "I spent all day at the office",
+    "¿quién viene al cine el sábado?",
+]
+
+
+def brute_force(index, description):
+    """
+    Returns the category of the most similar description, comparing against all of them.
+    """
+    key = nlu.normalize(description)
+    best = max(
+        range(len(index.keys)), key=lambda entry: nlu.similarity(key, index.keys[entry])
+    )
+    return index.values[best]
+
+
+def percentile(values, fraction):
+    return sorted(values)[int(fraction * (len(values) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--size", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=100000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    categories = [f"{make_word(rng, 2)} {make_word(rng, 3)}" for _ in range(args.size)]
+    descriptions = [
+        (
+            f"{make_word(rng, 3)} {make_word(rng, 2)} {make_word(rng, 3)}",
+            rng.choice(categories),
+        )
+        for _ in range(args.size)
+    ]
+
+    start = time.perf_counter()
+    user = nlu.UserCategories()
+    for description, category in descriptions:
+        user.add(description, category)
+    build_time = time.perf_counter() - start
+
+    queries = [rng.choice(descriptions) for _ in range(args.queries)]
+    typos = [make_typo(rng, description) for description, _ in queries]
+
+    latencies = []
+    correct = 0
+    for typo, (_, category) in zip(typos, queries):
+        start = time.perf_counter()
+        suggestion = user.suggest(typo)
+        latencies.append(time.perf_counter() - start)
+        correct += suggestion == category
+
+    brute = []
+    for typo in typos[:max(args.queries // 20, 1)]:
+        start = time.perf_counter()
+        brute_force(user.descriptions, typo)
+        brute.append(time.perf_counter() - start)
+
+    messages = [MESSAGES[i % len(MESSAGES)] for i in range(args.messages)]
+    start = time.perf_counter()
+    parsed = sum(nlu.parse_expense(message) is not None for message in messages)
+    parse_time = time.perf_counter() - start
+
+    print(
+        f"{len(user.descriptions)} descriptions and {len(user.categories)} categories "
+        f"indexed in {build_time:.2f} s"
+    )
+    print(
+        f"n-gram index:  mean {statistics.mean(latencies) * 1000:.3f} ms, "
+        f"p99 {percentile(latencies, 0.99) * 1000:.3f} ms, "
+        f"{correct / len(queries):.1%} correct"
+    )
+    print(f"brute force:   mean {statistics.mean(brute) * 1000:.1f} ms "
+          f"({statistics.mean(brute) / statistics.mean(latencies):.0f}x slower)")
+    print(
+        f"parser:        {args.messages / parse_time:.0f} messages/s on one core "
+        f"({parsed} expenses found)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark of bot startup: import and load time per command module.
+
+Every run happens in a fresh interpreter, so imports are cold as after a deploy.
+A run imports discord and the shared utilities, then each extension module in
+turn (time spent on dependencies the module is the first to import is counted
+against it), then loads the extensions into a bot backed by a temporary database
+through `load_extensions`. The median of all runs is printed.
+
+Usage:
+    python -m benchmarks.bench_startup [--runs 5]
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def timed_import(name):
+    """Imports a module and returns the seconds it took."""
+    start = time.perf_counter()
+    importlib.import_module(name)
+    return time.perf_counter() - start
+
+
+async def child():
+    """One cold start; prints the timings as JSON."""
+    imports = {"discord": timed_import("discord")}
+    imports["src.utils"] = sum(
+        timed_import(name)
+        for name in (
+            "src.utils.database",
+            "src.utils.shared",
+            "src.utils.lang",
+            "src.utils.scheduler",
+        )
+    )
+
+    from src.utils.database import Database
+    from src.bot import EXTENSIONS, load_extensions
+    import discord
+    from discord.ext import commands
+
+    for extension in EXTENSIONS:
+        imports[extension] = timed_import(extension)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        bot = commands.Bot(command_prefix="!", intents=discord.Intents.default())
+        bot.db = Database(os.path.join(tmpdir, "expenses.db"))
+        try:
+            start = time.perf_counter()
+            loads = await load_extensions(bot)
+            total = time.perf_counter() - start
+        finally:
+            bot.db.close()
+
+    print(json.dumps({"imports": imports, "loads": loads, "total_load": total}))
+
+
+def run_child():
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--child"],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(child())
+        return
+
+    runs = [run_child() for _ in range(args.runs)]
+
+    def median_ms(values):
+        return statistics.median(values) * 1000
+
+    print(f"Median of {args.runs} cold starts")
+    print(f"{'module':<32} {'import ms':>10} {'load ms':>10}")
+    for name in runs[0]["imports"]:
+        imported = median_ms([run["imports"][name] for run in runs])
+        loads = [run["loads"].get(name) for run in runs]
+        loaded = f"{median_ms(loads):10.1f}" if None not in loads else f"{'-':>10}"
+        print(f"{name:<32} {imported:10.1f} {loaded}")
+    print(
+        f"{'load_extensions (all)':<32} {'':>10} "
+        f"{median_ms([run['total_load'] for run in runs]):10.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark of `translate` throughput before and after the compiled catalog.
+
+The "before" implementation is the previous `translate`: a print of every call,
+a nested dict lookup and a `str.format` of the raw template. Its output goes to
+/dev/null so the terminal does not dominate the measurement.
+
+Usage:
+    python -m benchmarks.bench_translate [--calls 200000]
+"""
+import argparse
+import contextlib
+import os
+import timeit
+
+from src.utils.lang import translate, translations
+
+# A mix of the replies the commands send most often
+CALLS = [
+    ("expense_logged", "en", {"id": 1, "amount": 12.5, "description": "Lunch"}),
+    ("expense_deleted", "es", {"id": 7}),
+    ("category_total", "en", {"category": "Food", "total_spent": "42.00"}),
+    ("no_expenses_found", "es", {}),
+]
+
+
+def legacy_translate(message_key, language="en", **kwargs):
+    """The translate function before the catalog was compiled."""
+    print(f"Translating '{message_key}' to '{language}' with values {kwargs}")
+    if language not in translations:
+        language = "en"
+    message_template = translations[language].get(message_key, "")
+    return message_template.format(**kwargs)
+
+
+def measure(fn, calls):
+    """Returns translations per second for one implementation."""
+    rounds = max(1, calls // len(CALLS))
+
+    def run():
+        for key, language, kwargs in CALLS:
+            fn(key, language, **kwargs)
+
+    elapsed = timeit.timeit(run, number=rounds)
+    return rounds * len(CALLS) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--calls", type=int, default=200000)
+    args = parser.parse_args()
+
+    for key, language, kwargs in CALLS:
+        assert translate(key, language, **kwargs) == translations[language][key].format(
+            **kwargs
+        )
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        before = measure(legacy_translate, args.calls)
+        before_quiet = measure(
+            lambda key, language, **kwargs: translations[language][key].format(
+                **kwargs
+            ),
+            args.calls,
+        )
+        after = measure(translate, args.calls)
+
+    print(f"{args.calls} translations")
+    print(f"before (print + str.format): {before:12.0f} calls/s")
+    print(f"before without the print:    {before_quiet:12.0f} calls/s")
+    print(
+        f"compiled catalog:            {after:12.0f} calls/s  ({after / before:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
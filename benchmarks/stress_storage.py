@@ -0,0 +1,90 @@
+"""
+Stress test for the storage layer under a mixed read/write command load.
+
+Fires concurrent `insert_expense` and `list_expenses` calls at a temporary
+database, with the legacy SQLite defaults (rollback journal,
+synchronous=FULL), with the tuned WAL mode and with WAL split in four
+shards, and prints the throughput and the number of failed writes for each.
+
+Usage:
+    python -m benchmarks.stress_storage [--operations 5000] [--write-ratio 0.3]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from src.utils import db
+from src.utils.database import Database, ShardedDatabase
+
+MODES = {
+    "rollback": {"journal_mode": "delete", "synchronous": "full"},
+    "wal": {"journal_mode": "wal", "synchronous": "normal"},
+    "wal-4-shards": {"journal_mode": "wal", "synchronous": "normal", "shards": 4},
+}
+
+
+async def run_mode(name, options, operations, write_ratio, users):
+    """
+    Runs the mixed load against a fresh database and returns (ops/s, failed writes).
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "expenses.db")
+        database = (
+            ShardedDatabase(path, **options)
+            if "shards" in options
+            else Database(path, **options)
+        )
+        try:
+            # Seed some history so reads have rows to return
+            for user_id in range(users):
+                await database.write(db.insert_expense, user_id, 1.0, "Seed")
+
+            write_every = max(1, round(1 / write_ratio)) if write_ratio > 0 else 0
+            calls = []
+            for i in range(operations):
+                user_id = i % users
+                if write_every and i % write_every == 0:
+                    calls.append(
+                        database.write(db.insert_expense, user_id, 9.99, f"Expense {i}")
+                    )
+                else:
+                    calls.append(database.read(db.list_expenses, user_id))
+
+            start = time.perf_counter()
+            results = await asyncio.gather(*calls)
+            elapsed = time.perf_counter() - start
+        finally:
+            database.close()
+
+    failed = sum(
+        1
+        for i, result in enumerate(results)
+        if write_every and i % write_every == 0 and result is None
+    )
+    return operations / elapsed, failed
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--operations", type=int, default=5000)
+    parser.add_argument("--write-ratio", type=float, default=0.3)
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+
+    print(
+        f"{args.operations} operations, {args.write_ratio:.0%} writes, {args.users} "
+        "users"
+    )
+    for name, options in MODES.items():
+        throughput, failed = await run_mode(
+            name, options, args.operations, args.write_ratio, args.users
+        )
+        print(f"{name:>10}: {throughput:10.0f} ops/s, {failed} failed writes")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,15 +1,87 @@
-# Importa los módulos necesarios de los paquetes discord y yaml.
+# Importa los módulos necesarios de los paquetes discord y de la aplicación.
+import asyncio
+import logging
+import time
+
 import discord
 from discord.ext import commands
-from src.commands.set_language import SetLanguage  # Asegura que el path sea correcto para el Cog
-from src.utils.lang import translate  # Importa la función de traducción
-from src.utils.shared import user_language  # Importa el diccionario compartido de preferencias de idioma
+from src.utils.config import get_config, load_config  # Configuración compartida
+from src.utils.shared import LanguageCache  # Caché de idiomas de los usuarios
+from src.utils.database import open_database  # Acceso compartido a la base de datos
+from src.utils.scheduler import Scheduler, BudgetMonitor  # Tareas periódicas del bot
+from src.utils.validation import ExpenseValidator  # Gastos duplicados e inusuales
+from src.utils.nlu import CategoryMatcher  # Sugerencia de categorías
+from src.utils.ai import Summarizer  # Resúmenes de los informes, por lotes y con caché
+from src.utils.logging_config import (  # Registro estructurado en segundo plano
+    command_fields, setup_logging_from_config, shutdown_logging,
+)
+from src.utils import metrics  # Latencias, contadores y aciertos de las cachés
+from src.utils.watchdog import LoopWatchdog  # Detecta bloqueos del bucle de eventos
+
+logger = logging.getLogger(__name__)
+
+# Cargar la configuración desde config.yaml y las variables de entorno EXPENSE_BOT_*;
+# los Cogs usan el mismo objeto.
+config = load_config()
+
+# Extensiones (módulos de comandos) que se cargan al iniciar el bot.
+EXTENSIONS = [
+    'src.commands.log_expense',
+    'src.commands.delete_expense',
+    'src.commands.list_expenses',
+    'src.commands.update_expense',
+    'src.commands.generate_report',
+    'src.commands.set_language',
+    'src.commands.import_expenses',
+    'src.commands.export_expenses',
+    'src.commands.forecast',
+    'src.commands.stats',
+]
+
+
+class ExpenseBot(commands.AutoShardedBot):
+    """
+    Bot que prepara sus extensiones y tareas periódicas una sola vez, en setup_hook, en
+    lugar de repetirlo en cada on_ready (que se dispara de nuevo tras cada reconexión).
+    Maneja varios shards del gateway en un mismo proceso; src/launcher.py reparte los
+    shards entre varios procesos, cada uno con su propia instancia de este bot.
+    """
+
+    metrics_server = None
+    summarizer = None
+    watchdog = None
 
-import yaml
+    async def setup_hook(self):
+        await load_extensions(self)
+        self.scheduler.start()
+        if self.watchdog is not None:
+            self.watchdog.start()
+        # El endpoint local de Prometheus solo se abre si la sección
+        # 'metrics' define un puerto.
+        options = get_config(self).metrics
+        if options.prometheus_port:
+            self.metrics_server = metrics.MetricsServer(
+                host=options.prometheus_host, port=options.prometheus_port
+            )
+            await self.metrics_server.start()
 
-# Cargar la configuración desde el archivo config.yaml
-with open("src/config/config.yaml", 'r') as config_file:
-    config = yaml.safe_load(config_file)
+    async def close(self):
+        if self.watchdog is not None:
+            await self.watchdog.stop()
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+        scheduler = getattr(self, 'scheduler', None)
+        if scheduler is not None:
+            scheduler.stop()
+        await super().close()
+        # Cancela los resúmenes pendientes, que ya nadie espera.
+        if self.summarizer is not None:
+            await self.summarizer.close()
+        # Los gastos que esperan en el lote de escritura se guardan antes de
+        # cerrar la base de datos.
+        database = getattr(self, 'db', None)
+        if database is not None:
+            await database.flush()
 
 # Habilita intents para permitir que el bot gestione eventos como mensajes e interacciones con los usuarios.
 intents = discord.Intents.default()
@@ -17,42 +89,149 @@ intents.messages = True  # Permitir que el bot lea y responda a los mensajes.
 intents.message_content = True  # Habilita la intención de contenido de mensaje para acceder al contenido de texto de los mensajes.
 
 # Inicializa la instancia del bot con el prefijo y los intents cargados desde el archivo de configuración.
-bot = commands.Bot(command_prefix=config['bot']['prefix'], intents=intents)
-
-# Función asíncrona para cargar extensiones de comandos dinámicamente.
-async def load_extensions():
-    """
-    Carga asíncrona de extensiones (módulos de comandos).
-    """
-    extensions = [
-        'src.commands.log_expense',
-        'src.commands.delete_expense',
-        'src.commands.list_expenses',
-        'src.commands.update_expense',
-        'src.commands.set_language'  # Asegura el path correcto para set_language
-    ]
-
-    for extension in extensions:
-        try:
-            # Intente cargar cada extensión de comando.
-            await bot.load_extension(extension)
-            print(f"Loaded extension {extension}")
-        except Exception as e:
-            # Si la carga falla, imprima el error.
-            print(f"Failed to load extension {extension}. Error: {e}")
+# Con shard_count en 0, Discord indica cuántos shards usar.
+bot = ExpenseBot(
+    command_prefix=config.bot.prefix,
+    intents=intents,
+    shard_count=config.bot.shard_count or None,
+)
+bot.config = config
+
+# Crea una única capa de acceso a la base de datos, compartida por todos los Cogs
+# durante la vida del bot. La sección opcional 'database' ajusta el pool, el modo WAL,
+# los pragmas de SQLite y la escritura por lotes, y con 'shards' reparte a los usuarios
+# entre varios archivos, cada uno con su propio escritor.
+bot.db = open_database(config.database)
+
+# Caché acotada de idiomas preferidos; se carga desde la tabla user_language la primera
+# vez que se consulta cada usuario.
+bot.languages = LanguageCache(bot.db, config.caches.language_cache_size)
+
+# Estadísticas en memoria de los gastos recientes de cada usuario, para avisar de
+# duplicados y montos atípicos.
+bot.expense_validator = ExpenseValidator(bot.db)
+
+# Índice de n-gramas de las descripciones ya categorizadas de cada usuario, para sugerir
+# la categoría de los gastos nuevos.
+bot.category_matcher = CategoryMatcher(bot.db)
+
+# Resúmenes de los informes con el backend configurado en la sección 'summaries'
+# (None si está desactivado).
+bot.summarizer = Summarizer.from_config(config.summaries)
+
+# Vigila el retraso del bucle de eventos y registra la pila del código que lo
+# bloquea (sección 'watchdog').
+bot.watchdog = LoopWatchdog.from_config(config.watchdog)
+
+# Cachés cuya tasa de aciertos muestran !stats y el endpoint de Prometheus.
+metrics.registry.register_cache('languages', bot.languages.entries)
+metrics.registry.register_cache('expense_histories', bot.expense_validator.histories)
+metrics.registry.register_cache('category_indexes', bot.category_matcher.indexes)
+if bot.summarizer is not None:
+    metrics.registry.register_cache('summaries', bot.summarizer.cache)
+
+# Revisa periódicamente los presupuestos de los usuarios cuyos gastos
+# cambiaron y les avisa por DM.
+budget_monitor = BudgetMonitor(
+    bot, bot.db, bot.languages, default_language=config.default_language
+)
+bot.scheduler = Scheduler()
+bot.scheduler.every(
+    config.scheduler.budget_interval, budget_monitor.run_once, name='budget_monitor'
+)
+
+async def load_extension_timed(bot, extension):
+    """
+    Carga una extensión y devuelve los segundos que tardó, o None si falló.
+    """
+    start = time.perf_counter()
+    try:
+        await bot.load_extension(extension)
+    except Exception as e:
+        # Si la carga falla, registre el error; las demás extensiones siguen cargándose.
+        logger.error(
+            f"Failed to load extension {extension}. Error: {e}",
+            extra={"extension": extension},
+        )
+        return None
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"Loaded extension {extension}",
+        extra={"extension": extension, "latency_ms": round(elapsed * 1000, 1)},
+    )
+    return elapsed
+
+# Función asíncrona para cargar extensiones de comandos.
+async def load_extensions(bot, extensions=EXTENSIONS):
+    """
+    Carga asíncrona de extensiones (módulos de comandos), midiendo el tiempo de cada
+    una. Los Cogs son independientes entre sí, así que sus funciones setup se ejecutan
+    de forma concurrente; la importación de cada módulo sigue siendo secuencial.
+    Devuelve un diccionario {extensión: segundos} (None para las que fallaron).
+    """
+    timings = await asyncio.gather(
+        *(load_extension_timed(bot, extension) for extension in extensions)
+    )
+    return dict(zip(extensions, timings))
 
 @bot.event
 async def on_ready():
     """
     Evento que se activa cuando el bot se conecta con éxito a Discord.
     """
-    print(f'Logged in as {bot.user.name}')
-    await load_extensions()  # Carga todas las extensiones de comandos después de que el bot esté listo.
+    logger.info(f'Logged in as {bot.user.name}')
+
+# Ganchos globales: cada comando deja un registro estructurado con su nombre, el usuario
+# y la latencia, y suma su latencia total y la que pasó esperando a la base de datos a
+# los histogramas de métricas. El watchdog también sabe qué comando se está ejecutando,
+# para nombrarlo si bloquea el bucle.
+@bot.before_invoke
+async def start_command_timer(ctx):
+    ctx.started_at = time.perf_counter()
+    metrics.start_command()
+    if bot.watchdog is not None and ctx.command is not None:
+        bot.watchdog.command_started(ctx.command.qualified_name)
+
+@bot.after_invoke
+async def log_command(ctx):
+    """
+    Registra cada comando ejecutado (también los que fallaron) con su latencia
+    en milisegundos, separando el tiempo de base de datos del resto (E/S de
+    Discord y procesamiento).
+    """
+    latency = time.perf_counter() - ctx.started_at
+    if bot.watchdog is not None:
+        bot.watchdog.command_finished()
+    db_time = metrics.command_db_time()
+    name = ctx.command.qualified_name if ctx.command else "unknown"
+    metrics.registry.observe(f"command.{name}", latency)
+    metrics.registry.observe(f"command.{name}.db", db_time)
+    if ctx.command_failed:
+        metrics.registry.increment(f"command.{name}.failed")
+    logger.info(
+        "Command completed",
+        extra={
+            **command_fields(ctx),
+            "latency_ms": round(latency * 1000, 1),
+            "db_ms": round(db_time * 1000, 1),
+            "failed": ctx.command_failed,
+        },
+    )
 
 # Define un simple comando ping para probar si el bot responde.
 @bot.command()
 async def ping(ctx):
     await ctx.send("Pong!")  # Responde con "¡Pong!" para verificar la capacidad de respuesta del bot.
 
-# Ejecuta el bot con el token proporcionado en el archivo de configuración.
-bot.run(config['bot']['token'])
+# Ejecuta el bot con el token proporcionado en el archivo de configuración
+# (solo al ejecutar este archivo, no al importarlo, por ejemplo desde las
+# pruebas o los benchmarks).
+if __name__ == "__main__":
+    # Los registros se formatean y escriben en un hilo aparte; discord.py
+    # usa la misma configuración.
+    setup_logging_from_config(config.logging)
+    try:
+        bot.run(config.bot.token, log_handler=None)
+    finally:
+        bot.db.close()  # Cierra las conexiones de la base de datos al apagar el bot.
+        shutdown_logging()
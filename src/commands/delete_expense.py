@@ -1,27 +1,22 @@
-import os
+import logging
 import sqlite3
 from discord.ext import commands
 from src.utils.lang import translate  # Import the translation module for multilingual responses
 from src.utils import db  # Import the db module where database functions are located.
-from src.utils.shared import user_language  # Import user_language dictionary to access user language preferences
-import yaml
+from src.utils.config import get_config  # Import the configuration shared with the bot
+from src.utils.database import get_database  # Import the bot's shared database layer
+from src.utils.shared import get_language_cache  # Import the users' language cache
+from src.utils.logging_config import command_fields
 
-# Load configuration from config.yaml
-config_path = os.path.join(os.path.dirname(__file__), '..', 'config', 'config.yaml')
-with open(config_path, 'r') as config_file:
-    config = yaml.safe_load(config_file)
-
-# Function to initialize the database if it doesn't exist
-def initialize_database(db_path):
-    if not os.path.exists(db_path):
-        conn = sqlite3.connect(db_path)
-        db.create_expenses_table(conn)  # Ensure the table is created
-        conn.close()
+logger = logging.getLogger(__name__)
 
 # Define a Cog class to handle the "delete_expense" command.
 class DeleteExpense(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.config = get_config(bot)
+        self.db = get_database(bot)
+        self.languages = get_language_cache(bot)
 
     @commands.command(name='delete_expense', aliases=['eliminar_gasto'])
     async def delete_expense(self, ctx, expense_id: int):
@@ -30,32 +25,20 @@ class DeleteExpense(commands.Cog):
         """
         # Get the user's preferred language, defaulting to 'en' if not set
         user_id = ctx.author.id
-        language = user_language.get(user_id, config.get("default_language", "en"))
-
-        # Generate an absolute path to the database
-        db_directory = os.path.join(os.path.dirname(__file__), "../database")
-        db_path = os.path.join(db_directory, "expenses.db")
-
-        # Ensure the directory exists
-        if not os.path.exists(db_directory):
-            os.makedirs(db_directory)
-
-        # Initialize the database if needed
-        initialize_database(db_path)
+        language = await self.languages.get(user_id, self.config.default_language)
 
-        # Connect to the database and delete the expense
+        # Delete the expense through the shared database (off the event loop)
         try:
-            with sqlite3.connect(db_path) as conn:
-                db.delete_expense(conn, expense_id)
+            await self.db.write(db.delete_expense, expense_id, user_id=user_id)
 
-                # Use the translation function to generate a response in the user's language
-                response = translate("expense_deleted", language, id=expense_id)
+            # Use the translation function to generate a response in the user's language
+            response = translate("expense_deleted", language, id=expense_id)
 
-                # Send the translated response to the Discord channel
-                await ctx.send(response)
+            # Send the translated response to the Discord channel
+            await ctx.send(response)
 
         except sqlite3.OperationalError as e:
-            print(f"Error: {e}")
+            logger.error(f"Error: {e}", extra=command_fields(ctx))
             await ctx.send("Could not open the database. Please try again later.")
 
 # Asynchronous function to add the Cog to the bot.
@@ -0,0 +1,157 @@
+import csv
+import gzip
+import logging
+import sqlite3
+import tempfile
+
+import discord
+from discord.ext import commands
+from src.utils.lang import translate
+from src.utils import db
+from src.utils.config import get_config
+from src.utils.database import get_database
+from src.utils.shared import get_language_cache
+from src.utils.logging_config import command_fields
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet export is optional
+    pyarrow = None
+
+# Rows fetched from the cursor and written at a time
+EXPORT_CHUNK_SIZE = 5000
+
+# Upload limit of Discord outside of boosted servers (and in DMs)
+DEFAULT_UPLOAD_LIMIT = 8 * 1024 * 1024
+
+COLUMNS = ("id", "amount", "description", "category", "date_added")
+
+
+def write_csv(chunks, fp):
+    """
+    Writes chunks of expense rows to a binary file as gzip-compressed CSV.
+    Returns the number of rows.
+    """
+    count = 0
+    with gzip.open(fp, "wt", compresslevel=6, encoding="utf-8", newline="") as out:
+        writer = csv.writer(out)
+        writer.writerow(COLUMNS)
+        for rows in chunks:
+            writer.writerows(rows)
+            count += len(rows)
+    return count
+
+
+def write_parquet(chunks, fp):
+    """
+    Writes chunks of expense rows to a binary file as a zstd-compressed Parquet file,
+    one row group per chunk. Returns the number of rows.
+    """
+    schema = pyarrow.schema([
+        ("id", pyarrow.int64()),
+        ("amount", pyarrow.float64()),
+        ("description", pyarrow.string()),
+        ("category", pyarrow.string()),
+        ("date_added", pyarrow.timestamp("s")),
+    ])
+    count = 0
+    with pyarrow.parquet.ParquetWriter(
+        pyarrow.PythonFile(fp, mode="w"), schema, compression="zstd"
+    ) as writer:
+        for rows in chunks:
+            ids, amounts, descriptions, categories, dates = zip(*rows)
+            writer.write_table(pyarrow.Table.from_arrays([
+                pyarrow.array(ids, pyarrow.int64()),
+                pyarrow.array(amounts, pyarrow.float64()),
+                pyarrow.array(descriptions, pyarrow.string()),
+                pyarrow.array(categories, pyarrow.string()),
+                pyarrow.array(dates, pyarrow.string()).cast(pyarrow.timestamp("s")),
+            ], schema=schema))
+            count += len(rows)
+    return count
+
+
+# Export formats: writer and file name
+FORMATS = {"csv": (write_csv, "expenses.csv.gz")}
+if pyarrow is not None:
+    FORMATS["parquet"] = (write_parquet, "expenses.parquet")
+
+
+def write_export(conn, user_id, fp, file_format, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Streams a user's expenses from the database into `fp`. Returns the number of rows.
+    """
+    writer, _ = FORMATS[file_format]
+    return writer(db.iter_expenses(conn, user_id, chunk_size), fp)
+
+
+class ExportExpenses(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.config = get_config(bot)
+        self.db = get_database(bot)
+        self.languages = get_language_cache(bot)
+
+    @commands.command(name='export_expenses', aliases=['exportar_gastos'])
+    async def export_expenses(self, ctx, file_format: str = "csv", conn=None):
+        """
+        A command that sends all of the user's expenses as a compressed file attachment.
+        Rows are streamed from the database in chunks into a temporary file, so memory
+        use does not grow with the size of the history.
+        Parameters:
+        ctx: The context of the command invocation.
+        file_format: 'csv' (gzip-compressed) or 'parquet' (when pyarrow is installed).
+        conn: Optional database connection for testing.
+        """
+        user_id = ctx.author.id
+        language = await self.languages.get(user_id, self.config.default_language)
+
+        file_format = file_format.lower()
+        if file_format not in FORMATS:
+            await ctx.send(
+                translate(
+                    "export_unsupported_format",
+                    language,
+                    file_format=file_format,
+                    formats=", ".join(FORMATS),
+                )
+            )
+            return
+
+        try:
+            with tempfile.TemporaryFile() as fp:
+                count = await self.db.read(
+                    write_export, user_id, fp, file_format, EXPORT_CHUNK_SIZE, conn=conn
+                )
+                if not count:
+                    await ctx.send(translate("no_expenses_found", language))
+                    return
+
+                size = fp.tell()
+                limit = ctx.guild.filesize_limit if ctx.guild else DEFAULT_UPLOAD_LIMIT
+                if size > limit:
+                    await ctx.send(
+                        translate(
+                            "export_too_large",
+                            language,
+                            size=f"{size / 1024 / 1024:.1f}",
+                            limit=f"{limit / 1024 / 1024:.0f}",
+                        )
+                    )
+                    return
+
+                fp.seek(0)
+                await ctx.send(
+                    translate("export_ready", language, count=count),
+                    file=discord.File(fp, filename=FORMATS[file_format][1]),
+                )
+
+        except sqlite3.OperationalError as e:
+            logger.error(f"Error: {e}", extra=command_fields(ctx))
+            await ctx.send("Could not open the database. Please try again later.")
+
+async def setup(bot):
+    await bot.add_cog(ExportExpenses(bot))
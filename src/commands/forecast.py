@@ -0,0 +1,113 @@
+import logging
+import sqlite3
+from datetime import date, datetime, timezone
+from discord.ext import commands
+from src.utils.lang import translate
+from src.utils import analytics, db
+from src.utils.config import get_config
+from src.utils.database import get_database
+from src.utils.shared import get_language_cache, split_message
+from src.utils.logging_config import command_fields
+
+logger = logging.getLogger(__name__)
+
+def monthly_budget(budget, today):
+    """
+    Prorates a budget to the month of `today` by the length of its own period, so it can
+    be compared with a projected month total: a weekly budget of 20 is worth 20 * 31 / 7
+    in a 31-day month, a yearly one of 1200 about 100.
+    """
+    start = date.fromisoformat(budget["start_date"][:10])
+    end = date.fromisoformat(budget["end_date"][:10])
+    days = (end - start).days + 1
+    return budget["budget"] * analytics.month_end(today).day / days
+
+def load_forecast(conn, user_id, today):
+    """
+    Loads the expenses the forecast needs and the user's active budgets, and computes
+    the forecast on the reader thread (NumPy releases the GIL for most of the work).
+    Returns (forecasts, monthly budgets by category).
+    """
+    series = analytics.load_series(
+        conn, user_id, analytics.history_start(today).isoformat()
+    )
+    budgets = db.check_user_budgets(conn, user_id, today.isoformat())
+    return analytics.forecast(series, today), {
+        budget["category"]: monthly_budget(budget, today) for budget in budgets
+    }
+
+class Forecast(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.config = get_config(bot)
+        self.db = get_database(bot)
+        self.languages = get_language_cache(bot)
+
+    @commands.command(name='forecast', aliases=['pronostico'])
+    async def forecast(self, ctx, conn=None):
+        """
+        A command that projects the user's spending per category to the end of the month
+        and over the next days, from the linear trend of their recent expenses. Days are
+        UTC days, like the expense timestamps.
+        Parameters:
+        ctx: The context of the command invocation.
+        conn: Optional database connection for testing.
+        """
+        user_id = ctx.author.id
+        language = await self.languages.get(user_id, self.config.default_language)
+        today = datetime.now(timezone.utc).date()
+
+        try:
+            forecasts, budgets = await self.db.read(
+                load_forecast, user_id, today, conn=conn
+            )
+        except sqlite3.OperationalError as e:
+            logger.error(f"Error: {e}", extra=command_fields(ctx))
+            await ctx.send("Could not open the database. Please try again later.")
+            return
+
+        if not forecasts:
+            await ctx.send(translate("no_expenses_found", language))
+            return
+        for message in split_message(self.render(forecasts, budgets, today, language)):
+            await ctx.send(message)
+
+    @staticmethod
+    def render(forecasts, budgets, today, language):
+        """
+        Formats the forecast of every category and the overall total, warning about the
+        categories projected above their monthly budget.
+        """
+        lines = [translate(
+            "forecast_header", language,
+            end_date=analytics.month_end(today).isoformat(),
+            days=analytics.DEFAULT_HISTORY_DAYS,
+        )]
+        for result in forecasts:
+            category = result["category"] or None
+            lines.append(translate(
+                "forecast_category", language,
+                category=category or translate("uncategorized", language),
+                spent=f"{result['spent_this_month']:.2f}",
+                projected=f"{result['projected_month_total']:.2f}",
+                trend=f"{result['trend_per_day']:+.2f}",
+            ))
+            budget = budgets.get(category)
+            if budget is not None and result["projected_month_total"] > budget:
+                lines.append(
+                    translate("forecast_over_budget", language, budget=f"{budget:.2f}")
+                )
+        spent = sum(result["spent_this_month"] for result in forecasts)
+        projected = sum(result["projected_month_total"] for result in forecasts)
+        upcoming = sum(result["forecast_total"] for result in forecasts)
+        lines.append(translate(
+            "forecast_total", language,
+            spent=f"{spent:.2f}",
+            projected=f"{projected:.2f}",
+            days=analytics.DEFAULT_HORIZON_DAYS,
+            upcoming=f"{upcoming:.2f}",
+        ))
+        return "\n".join(lines)
+
+async def setup(bot):
+    await bot.add_cog(Forecast(bot))
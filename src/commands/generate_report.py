@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import sqlite3
+from datetime import date, datetime, timezone
+from discord.ext import commands
+from src.utils.lang import translate
+from src.utils import db
+from src.utils.ai import get_summarizer, report_digest
+from src.utils.cache import LRUCache
+from src.utils.config import get_config, DEFAULT_REPORT_CACHE_SIZE
+from src.utils.database import get_database
+from src.utils.shared import get_language_cache, split_message
+from src.utils.logging_config import command_fields
+from src.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+class ReportCache:
+    """
+    LRU cache of rendered reports, with the digest their summary is made from, keyed on
+    (user_id, start_date, end_date, language). Every write to a user's expenses drops
+    that user's reports.
+
+    Invalidations are stamped from one counter and the latest stamp of each user is kept
+    in an LRU of the same size. Users whose stamp was evicted report the highest evicted
+    stamp instead, so a report built before an invalidation is never cached afterwards.
+    """
+
+    def __init__(self, maxsize=DEFAULT_REPORT_CACHE_SIZE):
+        self.entries = LRUCache(maxsize, on_evict=self._forget)
+        self._keys_by_user = {}
+        self._generations = LRUCache(maxsize, on_evict=self._retire)
+        self._clock = 0
+        self._floor = 0
+
+    def _forget(self, key, value):
+        """Removes an evicted report from the per-user index."""
+        keys = self._keys_by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[key[0]]
+
+    def _retire(self, user_id, generation):
+        """
+        Keeps the stamp of an evicted user as the generation of every unknown user.
+        """
+        self._floor = max(self._floor, generation)
+
+    def generation(self, user_id):
+        """
+        Returns a counter that changes every time the user's reports are invalidated.
+        """
+        return self._generations.get(user_id, self._floor)
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def put(self, key, report, generation):
+        """
+        Caches a report unless the user's expenses changed while it was being built.
+        """
+        user_id = key[0]
+        if generation != self.generation(user_id):
+            return
+        self.entries.put(key, report)
+        self._keys_by_user.setdefault(user_id, set()).add(key)
+
+    def invalidate_user(self, user_id):
+        """
+        Drops every cached report of a user. Registered as a database write listener.
+        """
+        self._clock += 1
+        self._generations.put(user_id, self._clock)
+        for key in self._keys_by_user.pop(user_id, ()):
+            self.entries.pop(key)
+
+def parse_date(value):
+    """Parses a YYYY-MM-DD argument, returning None if it is not a valid date."""
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return None
+
+class GenerateReport(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.config = get_config(bot)
+        self.db = get_database(bot)
+        self.languages = get_language_cache(bot)
+        self.cache = ReportCache(self.config.caches.report_cache_size)
+        registry.register_cache("reports", self.cache.entries)
+        self.summarizer = get_summarizer(bot)
+        self.db.add_write_listener(self.cache.invalidate_user)
+
+    def cog_unload(self):
+        self.db.remove_write_listener(self.cache.invalidate_user)
+
+    @commands.command(name='generate_report', aliases=['generar_informe'])
+    async def generate_report(
+        self, ctx, start_date: str = None, end_date: str = None, conn=None
+    ):
+        """
+        A command that reports the user's total spending per category between two dates.
+        Dates use the YYYY-MM-DD format and default to the current month up to today,
+        in UTC like the expense timestamps. Long reports are sent as several messages.
+        Parameters:
+        ctx: The context of the command invocation.
+        start_date: First day of the report.
+        end_date: Last day of the report.
+        conn: Optional database connection for testing.
+        """
+        user_id = ctx.author.id
+        language = await self.languages.get(user_id, self.config.default_language)
+
+        today = datetime.now(timezone.utc).date()
+        start = parse_date(start_date) if start_date else today.replace(day=1)
+        end = parse_date(end_date) if end_date else today
+        for value, parsed in ((start_date, start), (end_date, end)):
+            if parsed is None:
+                await ctx.send(translate("invalid_date", language, value=value))
+                return
+
+        key = (user_id, start.isoformat(), end.isoformat(), language)
+        cached = self.cache.get(key)
+        if cached is None:
+            generation = self.cache.generation(user_id)
+            try:
+                rows = await self.db.read(
+                    db.generate_expense_report, user_id, key[1], key[2], conn=conn
+                )
+            except sqlite3.OperationalError as e:
+                logger.error(f"Error: {e}", extra=command_fields(ctx))
+                await ctx.send("Could not open the database. Please try again later.")
+                return
+            cached = (
+                self.render(rows, key[1], key[2], language),
+                report_digest(rows, key[1], key[2], language),
+            )
+            self.cache.put(key, cached, generation)
+        report, digest = cached
+
+        for message in split_message(report):
+            await ctx.send(message)
+
+        # The summary follows the report, unless the backend fails or is too slow
+        if self.summarizer is not None and digest["categories"]:
+            try:
+                summary = await asyncio.wait_for(
+                    self.summarizer.summarize(digest), self.config.summaries.timeout
+                )
+            except asyncio.TimeoutError:
+                logger.warning(f"The summary of a report of user {user_id} timed out")
+                return
+            except Exception as e:
+                logger.error(f"Could not summarize a report of user {user_id}: {e}")
+                return
+            await ctx.send(summary)
+
+    @staticmethod
+    def render(rows, start_date, end_date, language):
+        """Formats the aggregated rows of a report."""
+        if not rows:
+            return translate("no_report_data", language)
+
+        lines = [
+            translate(
+                "report_generated", language, start_date=start_date, end_date=end_date
+            )
+        ]
+        for category, total_spent, _ in rows:
+            lines.append(translate(
+                "category_total", language,
+                category=category or translate("uncategorized", language),
+                total_spent=f"{total_spent:.2f}",
+            ))
+        lines.append(
+            translate(
+                "report_total",
+                language,
+                total_spent=f"{sum(row[1] for row in rows):.2f}",
+            )
+        )
+        return "\n".join(lines)
+
+async def setup(bot):
+    await bot.add_cog(GenerateReport(bot))
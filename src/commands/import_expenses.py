@@ -0,0 +1,263 @@
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+
+import aiohttp
+from discord.ext import commands
+from src.utils.lang import translate
+from src.utils import db
+from src.utils.config import get_config
+from src.utils.database import get_database
+from src.utils.shared import get_language_cache
+from src.utils.validation import ValidationError, validate_expense_row
+from src.utils.logging_config import command_fields
+
+logger = logging.getLogger(__name__)
+
+# Rows inserted per transaction; a 100k row import takes about 20 transactions
+IMPORT_CHUNK_SIZE = 5000
+
+# Minimum seconds between two edits of the progress message (Discord rate limits edits)
+PROGRESS_INTERVAL = 2.0
+
+# Number of invalid rows listed in the final message
+MAX_REPORTED_ERRORS = 5
+
+# Bytes read at a time when downloading the attachment
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Supported file extensions and their format
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".json": "jsonl"}
+
+
+def iter_csv_rows(lines):
+    """
+    Yields (line number, row) for every record of a CSV file, with lower case column
+    names. The delimiter (',', ';' or tab) is detected from the header line.
+    """
+    header = next(lines, "")
+    try:
+        dialect = csv.Sniffer().sniff(header, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    fieldnames = [name.strip().lower() for name in next(csv.reader([header], dialect))]
+    reader = csv.DictReader(lines, fieldnames=fieldnames, dialect=dialect)
+    for row in reader:
+        yield reader.line_num + 1, row
+
+
+def iter_jsonl_rows(lines):
+    """
+    Yields (line number, row) for every object of a JSON lines
+    file, skipping blank lines.
+    """
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            row = None
+        if not isinstance(row, dict):
+            yield line_number, ValidationError("Not a JSON object")
+            continue
+        yield line_number, {
+            str(key).strip().lower(): value for key, value in row.items()
+        }
+
+
+def iter_expense_rows(lines, file_format):
+    """
+    Parses a CSV or JSON lines stream one line at a time. Yields (line number, result)
+    where result is a validated (amount, description, category, date_added) tuple or
+    the ValidationError of an invalid row.
+    """
+    reader = iter_csv_rows if file_format == "csv" else iter_jsonl_rows
+    for line_number, row in reader(iter(lines)):
+        if isinstance(row, ValidationError):
+            yield line_number, row
+            continue
+        try:
+            yield line_number, validate_expense_row(row)
+        except ValidationError as e:
+            yield line_number, e
+
+
+class ExpenseImport:
+    """
+    Imports a stream of expenses for one user. Rows are parsed and validated in a
+    worker thread, a chunk at a time, and each chunk is inserted with one executemany
+    in its own transaction, so other writes can run between chunks.
+    """
+
+    def __init__(
+        self,
+        database,
+        user_id,
+        lines,
+        file_format,
+        chunk_size=IMPORT_CHUNK_SIZE,
+        conn=None,
+    ):
+        self.database = database
+        self.user_id = user_id
+        self.rows = iter_expense_rows(lines, file_format)
+        self.chunk_size = chunk_size
+        self.conn = conn
+        self.imported = 0
+        self.invalid = 0
+        self.errors = []  # (line number, error) of the first invalid rows
+        self.done = False
+
+    def _take_chunk(self):
+        """Parses rows until a chunk is full or the stream ends."""
+        chunk = []
+        for line_number, result in self.rows:
+            if isinstance(result, ValidationError):
+                self.invalid += 1
+                if len(self.errors) < MAX_REPORTED_ERRORS:
+                    self.errors.append((line_number, str(result)))
+                continue
+            chunk.append((self.user_id, *result))
+            if len(chunk) >= self.chunk_size:
+                return chunk
+        self.done = True
+        return chunk
+
+    async def run(self, on_progress=None):
+        """Imports every row, awaiting `on_progress(self)` after each chunk."""
+        try:
+            while not self.done:
+                chunk = await asyncio.to_thread(self._take_chunk)
+                if chunk:
+                    inserted = await self.database.write(
+                        db.import_expenses, chunk, conn=self.conn
+                    )
+                    if not inserted:
+                        raise sqlite3.DatabaseError("the expenses could not be saved")
+                    self.imported += inserted
+                if on_progress is not None:
+                    await on_progress(self)
+        finally:
+            if self.imported:
+                self.database.notify_write({self.user_id})
+        return self.imported
+
+
+async def download(attachment, fp):
+    """Streams an attachment into a binary file object without holding it in memory."""
+    async with aiohttp.ClientSession() as session:
+        async with session.get(attachment.url) as response:
+            response.raise_for_status()
+            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                fp.write(chunk)
+
+
+class ImportExpenses(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.config = get_config(bot)
+        self.db = get_database(bot)
+        self.languages = get_language_cache(bot)
+        self.running = set()  # Users with an import in progress
+
+    @commands.command(name='import_expenses', aliases=['importar_gastos'])
+    async def import_expenses(self, ctx, conn=None):
+        """
+        A command that imports the expenses of an attached CSV or JSON lines file, with
+        amount, description and optional category and date columns. Progress is shown
+        by editing a single message.
+        Parameters:
+        ctx: The context of the command invocation.
+        conn: Optional database connection for testing.
+        """
+        user_id = ctx.author.id
+        language = await self.languages.get(user_id, self.config.default_language)
+
+        if not ctx.message.attachments:
+            await ctx.send(translate("import_no_attachment", language))
+            return
+        attachment = ctx.message.attachments[0]
+        filename = attachment.filename
+        file_format = FORMATS.get(os.path.splitext(filename)[1].lower())
+        if file_format is None:
+            await ctx.send(
+                translate("import_unsupported_format", language, filename=filename)
+            )
+            return
+        if user_id in self.running:
+            await ctx.send(translate("import_already_running", language))
+            return
+
+        self.running.add(user_id)
+        try:
+            message = await ctx.send(
+                translate("import_started", language, filename=filename)
+            )
+            with tempfile.TemporaryFile() as raw:
+                await download(attachment, raw)
+                raw.seek(0)
+                lines = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+                job = ExpenseImport(
+                    self.db, user_id, lines, file_format, IMPORT_CHUNK_SIZE, conn=conn
+                )
+                last_edit = asyncio.get_running_loop().time()
+
+                async def on_progress(job):
+                    nonlocal last_edit
+                    now = asyncio.get_running_loop().time()
+                    if not job.done and now - last_edit >= PROGRESS_INTERVAL:
+                        last_edit = now
+                        await message.edit(
+                            content=translate(
+                                "import_progress",
+                                language,
+                                filename=filename,
+                                imported=job.imported,
+                                invalid=job.invalid,
+                            )
+                        )
+
+                try:
+                    await job.run(on_progress)
+                    summary = translate(
+                        "import_finished",
+                        language,
+                        filename=filename,
+                        imported=job.imported,
+                        invalid=job.invalid,
+                    )
+                except (UnicodeDecodeError, csv.Error, sqlite3.DatabaseError) as e:
+                    summary = translate(
+                        "import_failed",
+                        language,
+                        filename=filename,
+                        imported=job.imported,
+                        error=e,
+                    )
+            report = [summary] + [
+                translate("import_invalid_row", language, line=line, error=error)
+                for line, error in job.errors
+            ]
+            await message.edit(content="\n".join(report))
+
+        except aiohttp.ClientError as e:
+            logger.error(f"Error: {e}", extra=command_fields(ctx))
+            await ctx.send(
+                translate(
+                    "import_failed", language, filename=filename, imported=0, error=e
+                )
+            )
+        except sqlite3.OperationalError as e:
+            logger.error(f"Error: {e}", extra=command_fields(ctx))
+            await ctx.send("Could not open the database. Please try again later.")
+        finally:
+            self.running.discard(user_id)
+
+async def setup(bot):
+    await bot.add_cog(ImportExpenses(bot))
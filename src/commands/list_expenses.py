@@ -1,71 +1,145 @@
-import os
+import logging
 import sqlite3
+import discord
 from discord.ext import commands
 from src.utils.lang import translate
 from src.utils import db
-from src.utils.shared import user_language
-import yaml
+from src.utils.config import get_config
+from src.utils.database import get_database
+from src.utils.shared import get_language_cache
+from src.utils.logging_config import command_fields
 
-# Load configuration from config.yaml
-config_path = os.path.join(os.path.dirname(__file__), '..', 'config', 'config.yaml')
-with open(config_path, 'r') as config_file:
-    config = yaml.safe_load(config_file)
+logger = logging.getLogger(__name__)
 
-# Function to initialize the database if it doesn't exist
-def initialize_database(db_path):
-    if not os.path.exists(db_path):
-        conn = sqlite3.connect(db_path)
-        db.create_expenses_table(conn)
-        conn.close()
+# Number of expenses shown per page and the longest description shown per line
+PAGE_SIZE = 10
+MAX_DESCRIPTION_LENGTH = 100
+
+# Seconds of inactivity before the page buttons are disabled
+PAGE_TIMEOUT = 180
+
+def format_expense(expense):
+    """Formats one expense row as a single line of the listing."""
+    description = expense[3]
+    if len(description) > MAX_DESCRIPTION_LENGTH:
+        description = description[:MAX_DESCRIPTION_LENGTH - 1] + "…"
+    return (
+        f"ID: {expense[0]}, Amount: {expense[2]}, Description: {description}, "
+        f"Date Added: {expense[5]}"
+    )
+
+class ExpensePages(discord.ui.View):
+    """
+    A paged embed of a user's expenses with previous/next buttons.
+    Only the page being shown is fetched, using keyset cursors on (date_added, id).
+    """
+
+    def __init__(self, database, user_id, language, page_size=PAGE_SIZE, conn=None):
+        super().__init__(timeout=PAGE_TIMEOUT)
+        self.database = database
+        self.user_id = user_id
+        self.language = language
+        self.page_size = page_size
+        self.conn = conn
+        self.page = 0
+        self.keys = [None]  # Keyset cursor of every page visited so far
+        self.rows = []
+        self.has_next = False
+        self.message = None
+
+    async def load(self):
+        """
+        Fetches the current page, plus one extra row to know if a next page exists.
+        """
+        rows = await self.database.read(
+            db.list_expenses_page,
+            self.user_id,
+            self.page_size + 1,
+            self.keys[self.page],
+            conn=self.conn,
+        )
+        self.has_next = len(rows) > self.page_size
+        self.rows = rows[:self.page_size]
+        if self.has_next and len(self.keys) == self.page + 1:
+            self.keys.append(db.page_key(self.rows[-1]))
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = not self.has_next
+        return self.rows
+
+    def build_embed(self):
+        """Builds the embed for the current page."""
+        embed = discord.Embed(
+            title=translate("here_are_your_expenses", self.language),
+            description="\n".join(format_expense(expense) for expense in self.rows),
+        )
+        embed.set_footer(
+            text=translate("page_footer", self.language, page=self.page + 1)
+        )
+        return embed
+
+    async def interaction_check(self, interaction):
+        """Only the user who asked for the listing can turn its pages."""
+        return interaction.user.id == self.user_id
+
+    async def show(self, interaction):
+        """Loads the current page and replaces the message content with it."""
+        await self.load()
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
+    @discord.ui.button(label="◀", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction, button):
+        self.page = max(self.page - 1, 0)
+        await self.show(interaction)
+
+    @discord.ui.button(label="▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction, button):
+        if self.has_next:
+            self.page += 1
+        await self.show(interaction)
+
+    async def on_timeout(self):
+        """Disables the buttons once the listing is no longer being browsed."""
+        self.previous_page.disabled = True
+        self.next_page.disabled = True
+        if self.message is not None:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                pass
 
 class ListExpenses(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.config = get_config(bot)
+        self.db = get_database(bot)
+        self.languages = get_language_cache(bot)
 
     @commands.command(name='list_expenses', aliases=['listar_gastos'])
     async def list_expenses(self, ctx, conn=None):
         """
-        A command that lists all expenses from the SQLite database and sends them to the Discord channel.
+        A command that lists the user's expenses as a paged embed, newest first.
         Parameters:
         ctx: The context of the command invocation.
         conn: Optional database connection for testing.
         """
         user_id = ctx.author.id
-        language = user_language.get(user_id, config.get("default_language", "en"))
-
-        if not conn:
-            # Generate an absolute path to the database
-            db_directory = os.path.join(os.path.dirname(__file__), "../database")
-            db_path = os.path.join(db_directory, "expenses.db")
-
-            # Ensure the directory exists
-            if not os.path.exists(db_directory):
-                os.makedirs(db_directory)
-
-            # Initialize the database if needed
-            initialize_database(db_path)
-
-            try:
-                conn = sqlite3.connect(db_path)
-            except sqlite3.OperationalError as e:
-                print(f"Error: {e}")
-                await ctx.send("Could not open the database. Please try again later.")
-                return
+        language = await self.languages.get(user_id, self.config.default_language)
 
         try:
-            expenses = db.list_expenses(conn, user_id)
+            pages = ExpensePages(self.db, user_id, language, conn=conn)
+            expenses = await pages.load()
 
             if not expenses:
-                response = translate("no_expenses_found", language)
+                await ctx.send(translate("no_expenses_found", language))
+            elif not pages.has_next:
+                # A single page needs no buttons
+                pages.stop()
+                await ctx.send(embed=pages.build_embed())
             else:
-                response = translate("here_are_your_expenses", language) + "\n"
-                for expense in expenses:
-                    response += f"ID: {expense[0]}, Amount: {expense[2]}, Description: {expense[3]}, Date Added: {expense[5]}\n"
-
-            await ctx.send(response)
+                pages.message = await ctx.send(embed=pages.build_embed(), view=pages)
 
         except sqlite3.OperationalError as e:
-            print(f"Error: {e}")
+            logger.error(f"Error: {e}", extra=command_fields(ctx))
             await ctx.send("Could not open the database. Please try again later.")
 
 # Async function to add the Cog to the bot
@@ -1,30 +1,24 @@
-import os
 import sqlite3
 import logging
 from discord.ext import commands
 from src.utils.lang import translate
-from src.utils.shared import user_language
-from src.utils.db import insert_expense, create_expenses_table
-import yaml
+from src.utils.shared import get_language_cache
+from src.utils.config import get_config
+from src.utils.database import get_database
+from src.utils.validation import get_expense_validator
+from src.utils.nlu import get_category_matcher, parse_expense
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
-
-# Load configuration from config.yaml
-with open("src/config/config.yaml", 'r') as config_file:
-    config = yaml.safe_load(config_file)
-
-# Function to initialize the database if it doesn't exist
-def initialize_database(db_path):
-    if not os.path.exists(db_path):
-        conn = sqlite3.connect(db_path)
-        create_expenses_table(conn)  # Ensure the table is created
-        conn.close()
+logger = logging.getLogger(__name__)
 
 # Define a Cog class to handle the "log_expense" command
 class LogExpense(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.config = get_config(bot)
+        self.db = get_database(bot)
+        self.languages = get_language_cache(bot)
+        self.validator = get_expense_validator(bot)
+        self.matcher = get_category_matcher(bot)
 
     @commands.command(name='log_expense', aliases=['ingresar_gasto'])
     async def log_expense(self, ctx, amount: float, *, description: commands.clean_content, conn=None):
@@ -37,45 +31,118 @@ class LogExpense(commands.Cog):
         description: The description of the expense.
         conn: Optional database connection for testing.
         """
+        await self.log(ctx.send, ctx.author.id, amount, description, conn=conn)
+
+    @commands.Cog.listener()
+    async def on_message(self, message, conn=None):
+        """
+        Logs expenses written in plain language, such as "spent 12.50 on lunch
+        yesterday" or "gasté 20 en taxi", through the same path as the log_expense
+        command. Commands and messages from bots are ignored.
+
+        Parameters:
+        message: The message received.
+        conn: Optional database connection for testing.
+        """
+        if message.author.bot or message.content.startswith(self.config.bot.prefix):
+            return
+        parsed = parse_expense(message.clean_content)
+        if parsed is None:
+            return
+        await self.log(
+            message.channel.send,
+            message.author.id,
+            parsed["amount"],
+            parsed["description"],
+            parsed["category"],
+            parsed["date_added"],
+            conn=conn,
+        )
+
+    async def log(
+        self,
+        send,
+        user_id,
+        amount,
+        description,
+        category=None,
+        date_added=None,
+        conn=None,
+    ):
+        """
+        Logs an expense and sends the confirmation, with its category and any warning
+        from the validator.
+
+        Parameters:
+        send: Coroutine function sending a message to the user's channel.
+        category: Category found in the message; without one, a category is suggested
+        from the user's similar expenses.
+        date_added: Optional SQLite timestamp of the expense; None means now.
+        conn: Optional database connection for testing.
+        """
         # Retrieve user's preferred language or use default
-        user_id = ctx.author.id
-        language = user_language.get(ctx.author.id, config.get("default_language", "en"))
+        language = await self.languages.get(user_id, self.config.default_language)
 
         # Log language confirmation
-        logging.info(f"User {user_id} is using language: {language}")
+        logger.debug(
+            f"User {user_id} is using language: {language}", extra={"user_id": user_id}
+        )
 
-        # Use the provided database connection or create a new one if none is provided (for testing)
+        # Use the provided database connection or the bot's shared
+        # database (off the event loop)
         try:
-            if not conn:
-                # Generate an absolute path to the database
-                db_directory = os.path.join(os.path.dirname(__file__), "../database")
-                db_path = os.path.join(db_directory, "expenses.db")
-
-                # Ensure the directory exists
-                if not os.path.exists(db_directory):
-                    os.makedirs(db_directory)
+            # Keep the category the user wrote, or suggest one from their similar
+            # past expenses
+            category = category or await self.matcher.suggest(
+                user_id, description, conn=conn
+            )
 
-                # Initialize the database if needed
-                initialize_database(db_path)
+            # Look for likely duplicates and unusual amounts in the
+            # user's in-memory history
+            findings = await self.validator.check(
+                user_id, amount, description, category, conn=conn
+            )
 
-                # Create the connection
-                conn = sqlite3.connect(db_path)
-
-            # Add the expense to the database
-            expense_id = insert_expense(conn, user_id, amount, description)
+            # Add the expense to the database; concurrent inserts are committed together
+            expense_id = await self.db.insert_expense(
+                user_id, amount, description, category, date_added, conn=conn
+            )
+            self.validator.record(user_id, expense_id, amount, description, category)
+            self.matcher.learn(user_id, description, category)
 
             # Generate a response in the appropriate language
             response = translate("expense_logged", language, id=expense_id, amount=amount, description=description)
+            if category:
+                response += "\n" + translate(
+                    "category_suggested", language, category=category
+                )
+            for finding in findings:
+                response += "\n" + self.describe(finding, expense_id, language)
 
             # Send confirmation message to Discord channel
-            await ctx.send(response)
-        
+            await send(response)
+
         except sqlite3.OperationalError as e:
-            logging.error(f"Error: {e}")
-            await ctx.send("Could not open the database. Please try again later.")
-        finally:
-            if conn:
-                conn.close()
+            logger.error(f"Error: {e}", extra={"user_id": user_id})
+            await send("Could not open the database. Please try again later.")
+
+    @staticmethod
+    def describe(finding, expense_id, language):
+        """Formats a warning about a logged expense found by the validator."""
+        if finding["kind"] == "duplicate":
+            return translate(
+                "possible_duplicate",
+                language,
+                previous_id=finding["expense_id"],
+                id=expense_id,
+                minutes=int(finding["seconds_ago"] // 60),
+            )
+        return translate(
+            "unusual_amount",
+            language,
+            category=finding["category"] or translate("uncategorized", language),
+            usual=f"{finding['usual']:.2f}",
+        )
 
 # Async function to add the Cog to the bot
 async def setup(bot):
@@ -0,0 +1,37 @@
+# src/commands/stats.py
+
+from discord.ext import commands
+from src.utils.metrics import registry, format_stats
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Latency rows shown by !stats, the ones with the most total time first,
+# to stay within a message
+STATS_ROWS = 20
+
+# Longest message Discord accepts
+MAX_MESSAGE_LENGTH = 2000
+
+class Stats(commands.Cog):
+    def __init__(self, bot, metrics=registry):
+        self.bot = bot
+        self.metrics = metrics
+
+    @commands.command(name='stats', aliases=['estadisticas'])
+    @commands.is_owner()
+    async def stats(self, ctx):
+        """
+        An owner-only command that shows the p50/p95/p99 latency of the commands and the
+        database functions, in milliseconds, the event counters and the hit rate of the
+        caches. A command's `.db` row is the part of its latency spent waiting for the
+        database.
+        """
+        table = format_stats(self.metrics.snapshot(), limit=STATS_ROWS)
+        # Leave room for the code block markers
+        table = table[:MAX_MESSAGE_LENGTH - 8]
+        await ctx.send(f"```\n{table}\n```")
+
+async def setup(bot):
+    logger.debug("Adding Stats Cog")  # Debug statement to confirm Cog addition
+    await bot.add_cog(Stats(bot))
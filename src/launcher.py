@@ -0,0 +1,386 @@
+# launcher.py
+#
+# Runs the bot in several worker processes, each connected to a contiguous range of the
+# gateway shards, so command parsing, translation and formatting use more than one core:
+#
+#     python -m src.launcher
+#
+# `bot.processes` sets the number of workers and `bot.shard_count` the shards of
+# the whole bot (0 asks Discord for its recommendation). Every worker opens the
+# database itself; SQLite in WAL mode, with the busy timeout of the `database`
+# section, serializes the writers of the different processes on each file (see
+# also `database.shards`).
+import asyncio
+import dataclasses
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import sys
+import threading
+import time
+
+import discord
+
+from src.utils.config import load_config
+from src.utils.logging_config import setup_logging_from_config, shutdown_logging
+
+logger = logging.getLogger(__name__)
+
+# Seconds per shard a worker has to connect before the next worker is started anyway;
+# the gateway lets a bot identify one shard about every 5 seconds
+READY_TIMEOUT_PER_SHARD = 10
+
+# Seconds the workers have to close their connections and write out
+# pending expenses on shutdown
+SHUTDOWN_TIMEOUT = 30
+
+
+def shard_ranges(shard_count, processes):
+    """
+    Splits the shards 0 to shard_count - 1 into `processes` contiguous ranges, whose
+    sizes differ by one at most, e.g. [[0, 1], [2, 3], [4]] for 5 shards in 3 processes.
+    """
+    if not 1 <= processes <= shard_count:
+        raise ValueError("processes must be between 1 and shard_count")
+    size, extra = divmod(shard_count, processes)
+    ranges = []
+    start = 0
+    for index in range(processes):
+        end = start + size + (index < extra)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+
+def worker_log_file(path, index):
+    """
+    Returns the log file of a worker, e.g. bot.worker1.log for
+    bot.log: one writer per file.
+    """
+    root, extension = os.path.splitext(path)
+    return f"{root}.worker{index}{extension}"
+
+
+async def recommended_shard_count(token):
+    """Asks Discord for the number of shards recommended for the bot."""
+    http = discord.http.HTTPClient(asyncio.get_running_loop())
+    try:
+        await http.static_login(token)
+        shard_count, _ = await http.get_bot_gateway()
+    finally:
+        await http.close()
+    return shard_count
+
+
+class CacheSync:
+    """
+    Keeps the caches of the worker processes coherent.
+
+    Each worker keeps users' languages, expense histories, category indexes and reports
+    in memory, but a user can talk to the bot in guilds served by different workers. The
+    IDs of the users a worker wrote data for (reported by its database write listeners)
+    are sent to the other workers, which drop those users from their caches and pass the
+    IDs on to their own write listeners, as if they had written the data themselves. The
+    IDs written during one iteration of the event loop are sent as one message.
+    """
+
+    def __init__(self, bot, inbox, peers):
+        self.bot = bot
+        self.inbox = inbox
+        self.peers = peers
+        self._pending = set()
+        self._applying = False
+        self._loop = None
+        self._receiver = None
+
+    def start(self):
+        """
+        Starts publishing this worker's writes and applying the other workers'. Must be
+        called on the event loop.
+        """
+        self._loop = asyncio.get_running_loop()
+        self.bot.db.add_write_listener(self.publish)
+        self._receiver = threading.Thread(
+            target=self._receive, name="cache-sync", daemon=True
+        )
+        self._receiver.start()
+
+    async def stop(self):
+        """Sends the last writes and stops the receiver thread."""
+        self.bot.db.remove_write_listener(self.publish)
+        self._send()
+        for peer in self.peers:
+            # Don't hold up the exit of this process for a worker
+            # that already stopped reading
+            peer.cancel_join_thread()
+        self.inbox.put(None)
+        await asyncio.to_thread(self._receiver.join)
+
+    def publish(self, user_id):
+        """
+        Queues a user for the other workers. Registered as a database write listener.
+        """
+        if self._applying:
+            return
+        if not self._pending:
+            self._loop.call_soon(self._send)
+        self._pending.add(user_id)
+
+    def apply(self, user_ids):
+        """
+        Forgets what this worker cached about users whose data another worker wrote.
+        """
+        # The expense validator and the reports listen to the writes themselves
+        for cache in (self.bot.languages.entries, self.bot.category_matcher.indexes):
+            for user_id in user_ids:
+                cache.pop(user_id)
+        self._applying = True
+        try:
+            self.bot.db.notify_write(user_ids)
+        finally:
+            self._applying = False
+
+    def _send(self):
+        user_ids, self._pending = self._pending, set()
+        if user_ids:
+            for peer in self.peers:
+                peer.put(user_ids)
+
+    def _receive(self):
+        """Receiver thread: hands every message of the inbox to the event loop."""
+        while True:
+            user_ids = self.inbox.get()
+            if user_ids is None:
+                return
+            self._loop.call_soon_threadsafe(self.apply, user_ids)
+
+
+async def run_worker(index, shard_ids, shard_count, inbox, peers, ready, gateway=None):
+    """
+    Runs the bot of one worker process until SIGTERM or SIGINT, or
+    until its connection ends.
+
+    `gateway` replaces the connection to Discord: an object whose `run(bot)` coroutine
+    feeds the bot its events, as the tests do. `ready` is set once the shards are
+    connected.
+    """
+    # The bot, its database and its caches are built here, once per worker process
+    from src import bot as app
+
+    bot = app.bot
+    bot.shard_ids = shard_ids
+    bot.shard_count = shard_count
+    config = app.config
+    if config.metrics.prometheus_port:
+        # One Prometheus endpoint per worker, on consecutive ports
+        metrics_options = dataclasses.replace(
+            config.metrics, prometheus_port=config.metrics.prometheus_port + index
+        )
+        bot.config = dataclasses.replace(config, metrics=metrics_options)
+    if index:
+        # Budgets are checked by the first worker only, which hears about every worker's
+        # writes through CacheSync, so each warning is sent once
+        app.budget_monitor.close()
+        bot.scheduler.remove('budget_monitor')
+
+    async def mark_ready():
+        ready.set()
+
+    bot.add_listener(mark_ready, 'on_ready')
+
+    loop = asyncio.get_running_loop()
+    stopping = asyncio.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stopping.set)
+
+    sync = CacheSync(bot, inbox, peers)
+    try:
+        async with bot:
+            sync.start()
+            connection = asyncio.create_task(
+                gateway.run(bot) if gateway is not None else bot.start(config.bot.token)
+            )
+            stop = asyncio.create_task(stopping.wait())
+            await asyncio.wait({connection, stop}, return_when=asyncio.FIRST_COMPLETED)
+            stop.cancel()
+            logger.info(
+                f"Worker {index} stopping", extra={"worker": index, "shards": shard_ids}
+            )
+            await bot.close()
+            await sync.stop()
+            if connection.done():
+                # Re-raises the error of a connection that ended on its own
+                connection.result()
+            else:
+                connection.cancel()
+                await asyncio.gather(connection, return_exceptions=True)
+    finally:
+        bot.db.close()
+
+
+def worker_main(index, shard_ids, shard_count, inbox, peers, ready, gateway=None):
+    """Entry point of a worker process."""
+    options = load_config().logging
+    if options.file:
+        options = dataclasses.replace(
+            options, file=worker_log_file(options.file, index)
+        )
+    setup_logging_from_config(options)
+    try:
+        asyncio.run(
+            run_worker(index, shard_ids, shard_count, inbox, peers, ready, gateway)
+        )
+    except Exception:
+        logger.exception(
+            f"Worker {index} failed", extra={"worker": index, "shards": shard_ids}
+        )
+        sys.exit(1)
+    finally:
+        shutdown_logging()
+
+
+class Launcher:
+    """
+    Starts and supervises the worker processes.
+
+    Workers are started one after the other, each once the previous one connected its
+    shards, because the gateway limits how fast a bot may identify. If a worker exits,
+    or the launcher is asked to stop, every worker gets SIGTERM and has
+    `shutdown_timeout` seconds to close its connections, write out its pending expenses
+    and close its database before it is killed. `gateway` is passed on to run_worker.
+    """
+
+    def __init__(
+        self, shard_count, processes, gateway=None, shutdown_timeout=SHUTDOWN_TIMEOUT
+    ):
+        self.shard_count = shard_count
+        self.shard_ranges = shard_ranges(shard_count, processes)
+        self.gateway = gateway
+        self.shutdown_timeout = shutdown_timeout
+        self.workers = []
+        self._context = multiprocessing.get_context("spawn")
+        self._stopping = threading.Event()
+
+    def start(self):
+        """
+        Starts the workers. Returns False if one of them exited, or a stop
+        was requested, meanwhile.
+        """
+        inboxes = [self._context.Queue() for _ in self.shard_ranges]
+        for index, shard_ids in enumerate(self.shard_ranges):
+            ready = self._context.Event()
+            peers = [inbox for peer, inbox in enumerate(inboxes) if peer != index]
+            process = self._context.Process(
+                target=worker_main,
+                name=f"expense-bot-worker-{index}",
+                args=(
+                    index,
+                    shard_ids,
+                    self.shard_count,
+                    inboxes[index],
+                    peers,
+                    ready,
+                    self.gateway,
+                ),
+            )
+            process.start()
+            self.workers.append(process)
+            logger.info(
+                f"Started worker {index} for shards {shard_ids[0]}-{shard_ids[-1]} of "
+                f"{self.shard_count}",
+                extra={"worker": index, "pid": process.pid, "shards": shard_ids},
+            )
+            if not self._wait_ready(
+                index, process, ready, READY_TIMEOUT_PER_SHARD * len(shard_ids)
+            ):
+                return False
+        return True
+
+    def _wait_ready(self, index, process, ready, timeout):
+        deadline = time.monotonic() + timeout
+        while not ready.wait(0.1):
+            if not process.is_alive() or self._stopping.is_set():
+                return False
+            if time.monotonic() > deadline:
+                logger.warning(
+                    f"Worker {index} is not connected after {timeout} s; starting the "
+                    "next one",
+                    extra={"worker": index},
+                )
+                return True
+        return True
+
+    def wait(self):
+        """Blocks until a worker exits or a stop is requested."""
+        sentinels = [process.sentinel for process in self.workers]
+        while not self._stopping.is_set():
+            finished = multiprocessing.connection.wait(sentinels, timeout=0.2)
+            if finished:
+                process = next(
+                    process for process in self.workers if process.sentinel in finished
+                )
+                logger.error(
+                    f"Worker {process.name} exited with status {process.exitcode}; "
+                    "stopping the others"
+                )
+                return
+
+    def request_stop(self, signum=None, frame=None):
+        """Makes start or wait return. Installed as the SIGTERM and SIGINT handler."""
+        self._stopping.set()
+
+    def stop(self):
+        """
+        Stops every worker, killing those that do not exit in time.
+        Returns their exit statuses.
+        """
+        self._stopping.set()
+        for process in self.workers:
+            if process.is_alive():
+                process.terminate()  # SIGTERM: the worker shuts down gracefully
+        deadline = time.monotonic() + self.shutdown_timeout
+        for process in self.workers:
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                logger.error(
+                    f"Worker {process.name} did not stop within "
+                    f"{self.shutdown_timeout} s; killing it"
+                )
+                process.kill()
+                process.join()
+        return [process.exitcode for process in self.workers]
+
+
+def main():
+    config = load_config()
+    setup_logging_from_config(config.logging)
+    exit_codes = []
+    failed = False
+    try:
+        shard_count = config.bot.shard_count
+        if not shard_count:
+            shard_count = max(
+                asyncio.run(recommended_shard_count(config.bot.token)),
+                config.bot.processes,
+            )
+        launcher = Launcher(shard_count, config.bot.processes)
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, launcher.request_stop)
+        try:
+            if launcher.start():
+                launcher.wait()
+        finally:
+            exit_codes = launcher.stop()
+            logger.info("Every worker stopped", extra={"exit_codes": exit_codes})
+    except Exception:
+        failed = True
+        logger.exception("The launcher failed")
+    finally:
+        shutdown_logging()
+    sys.exit(1 if failed or any(code != 0 for code in exit_codes) else 0)
+
+
+if __name__ == "__main__":
+    main()
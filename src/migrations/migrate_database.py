@@ -1,10 +1,42 @@
+import argparse
+import contextlib
+import sqlite3
 import sys
 import os
+from collections import defaultdict
 
-# Add the 'src' directory to the system path
-sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+# Add the repository root to the system path, so the 'src' package (and
+# its own imports) resolve
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
-from utils.db import connect_db  # Import after the path has been updated
+from src.utils import db  # Import after the path has been updated
+from src.utils.db import (
+    connect_db,
+    create_expense_totals_table,
+    find_expense_totals_drift,
+    rebuild_expense_totals,
+)
+from src.utils.config import load_config
+from src.utils.database import SHARD_ID_SPACING, shard_index, shard_paths
+
+# Tables copied between shard layouts, with their columns; every
+# one has a user_id column
+SHARDED_TABLES = {
+    "expenses": ("id", "user_id", "amount", "description", "category", "date_added"),
+    "budgets": (
+        "id",
+        "user_id",
+        "category",
+        '"limit"',
+        "period",
+        "start_date",
+        "end_date",
+    ),
+    "user_language": ("user_id", "language"),
+}
+
+# Rows read from a source file at a time while resharding
+RESHARD_CHUNK_SIZE = 10000
 
 # Updated functions (same as before)
 def create_user_language_table(cursor):
@@ -46,30 +78,246 @@ def create_budgets_table(cursor):
     ''')
     print("Budgets table created successfully.")
 
+def create_indexes(cursor):
+    """Creates the composite indexes used by the per-user expense and budget queries."""
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_expenses_user_date
+        ON expenses (user_id, date_added)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_expenses_user_category_date
+        ON expenses (user_id, category, date_added)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_budgets_user_category
+        ON budgets (user_id, category)
+    ''')
+    print("Indexes created successfully.")
+
 def drop_tables(cursor):
-    """Drops the expenses, budgets, and user_language tables if they exist."""
+    """
+    Drops the expenses, budgets, user_language and expense_totals tables if they exist.
+    """
+    cursor.execute('DROP TABLE IF EXISTS expense_totals')
     cursor.execute('DROP TABLE IF EXISTS expenses')
     cursor.execute('DROP TABLE IF EXISTS budgets')
     cursor.execute('DROP TABLE IF EXISTS user_language')
     print("Tables dropped successfully.")
 
-def migrate_database():
-    """Run the migration to update the database schema."""
-    # Connect to the actual database
-    conn = connect_db()
-    cursor = conn.cursor()
+def database_paths():
+    """
+    Returns the files of the configured database: `database.path`, or each of its
+    shards when `database.shards` is more than 1.
+    """
+    options = load_config().database
+    return shard_paths(options.path, options.shards)
+
+def migrate_database(paths=None):
+    """Run the migration to update the database schema of every file of the database."""
+    for path in paths or database_paths():
+        conn = connect_db(path)
+        cursor = conn.cursor()
+
+        # Drop existing tables (if necessary) to ensure the schema is updated
+        drop_tables(cursor)
+
+        # Create the tables with the updated schema
+        create_expenses_table(cursor)
+        create_budgets_table(cursor)
+        create_user_language_table(cursor)
+        create_indexes(cursor)
+        conn.commit()
 
-    # Drop existing tables (if necessary) to ensure the schema is updated
-    drop_tables(cursor)
+        # The running totals and their triggers are shared with the bot's schema setup
+        create_expense_totals_table(conn)
+        print("Expense totals table created successfully.")
 
-    # Create the tables with the updated schema
-    create_expenses_table(cursor)
-    create_budgets_table(cursor)
-    create_user_language_table(cursor)
+        print(f"Migration of {path} complete.")
+        conn.close()
 
-    print("Migration complete.")
-    conn.commit()
-    conn.close()
+def migrate_indexes(paths=None):
+    """
+    Adds the indexes to every file of an existing database without dropping any data.
+    """
+    for path in paths or database_paths():
+        conn = connect_db(path)
+        cursor = conn.cursor()
+        create_indexes(cursor)
+        # Refresh the planner statistics so the new indexes are picked up
+        cursor.execute('ANALYZE')
+        conn.commit()
+        conn.close()
+        print(f"Index migration of {path} complete.")
+
+def check_expense_totals(rebuild=False, paths=None):
+    """
+    Reports every running total in expense_totals that drifted from the raw expenses,
+    in every file of the database. With `rebuild`, recomputes the totals from the raw
+    rows afterwards. Returns the number of drifted buckets.
+    """
+    drifted = 0
+    for path in paths or database_paths():
+        conn = connect_db(path)
+        drift = find_expense_totals_drift(conn)
+        for (
+            user_id,
+            category,
+            bucket,
+            stored_total,
+            actual_total,
+            stored_count,
+            actual_count,
+        ) in drift:
+            print(
+                f"Drift in {path} for user {user_id}, category '{category}', period "
+                f"{bucket}: "
+                f"stored {stored_total} ({stored_count} expenses), "
+                f"actual {actual_total} ({actual_count} expenses)"
+            )
+        print(f"{len(drift)} drifted totals found in {path}.")
+
+        if rebuild:
+            rebuild_expense_totals(conn)
+            print(f"Expense totals of {path} rebuilt from the raw expenses.")
+        conn.close()
+        drifted += len(drift)
+    return drifted
+
+def reshard(source_paths, target_paths, chunk_size=RESHARD_CHUNK_SIZE):
+    """
+    Copies every user's expenses, budgets and language from the source files (the single
+    database file, or the shards of the current layout) into the shards of a new layout,
+    each user to the shard shard_index picks for the new count. IDs are kept and the
+    running totals are maintained by the triggers as rows arrive. SQLite numbers new
+    rows after the highest ID of their table, so the ID ranges of the targets start
+    above every kept ID (at base + index * SHARD_ID_SPACING) and new IDs stay unique.
+    The targets must not exist yet; the sources are only read, so the bot must be
+    stopped but nothing is lost if the copy fails. Returns the number of expenses in
+    each target.
+    """
+    existing = [path for path in target_paths if os.path.exists(path)]
+    if existing:
+        raise FileExistsError(f"Target shards already exist: {', '.join(existing)}")
+
+    highest = 0
+    for source_path in source_paths:
+        with contextlib.closing(sqlite3.connect(source_path)) as source:
+            for table, columns in SHARDED_TABLES.items():
+                if "id" in columns:
+                    highest = max(
+                        highest,
+                        source.execute(
+                            f"SELECT COALESCE(MAX(id), 0) FROM {table}"
+                        ).fetchone()[0],
+                    )
+    base = (highest // SHARD_ID_SPACING + 1) * SHARD_ID_SPACING
+
+    targets = []
+    for index, path in enumerate(target_paths):
+        conn = sqlite3.connect(path)
+        db.create_expenses_table(conn)
+        db.create_budgets_table(conn)
+        db.create_user_language_table(conn)
+        db.create_expense_totals_table(conn)
+        db.create_indexes(conn)
+        db.set_id_floor(conn, base + index * SHARD_ID_SPACING)
+        targets.append(conn)
+
+    copied = 0
+    try:
+        for source_path in source_paths:
+            source = sqlite3.connect(source_path)
+            try:
+                for table, columns in SHARDED_TABLES.items():
+                    user_column = columns.index("user_id")
+                    names = ", ".join(columns)
+                    placeholders = ", ".join("?" * len(columns))
+                    insert = f"INSERT INTO {table} ({names}) VALUES ({placeholders})"
+                    cursor = source.execute(f"SELECT {names} FROM {table}")
+                    while rows := cursor.fetchmany(chunk_size):
+                        groups = defaultdict(list)
+                        for row in rows:
+                            groups[shard_index(row[user_column], len(targets))].append(
+                                row
+                            )
+                        for index, group in groups.items():
+                            targets[index].executemany(insert, group)
+                        if table == "expenses":
+                            copied += len(rows)
+            finally:
+                source.close()
+
+        counts = []
+        for conn in targets:
+            conn.commit()
+            counts.append(conn.execute("SELECT COUNT(*) FROM expenses").fetchone()[0])
+    except Exception:
+        for conn in targets:
+            conn.close()
+        for path in target_paths:
+            os.remove(path)
+        raise
+
+    for conn in targets:
+        conn.close()
+    if sum(counts) != copied:
+        raise RuntimeError(
+            f"Copied {copied} expenses but the shards hold {sum(counts)}"
+        )
+    return counts
+
+def migrate_shards(shards, source_shards=None):
+    """
+    Moves the configured database to `shards` shards. The current layout is read from
+    the configuration unless `source_shards` is given. Set `database.shards` to the new
+    count once it completes; the old files are kept until they are removed by hand.
+    """
+    options = load_config().database
+    source_paths = shard_paths(options.path, source_shards or options.shards)
+    target_paths = shard_paths(options.path, shards)
+    counts = reshard(source_paths, target_paths)
+    for path, count in zip(target_paths, counts):
+        print(f"{path}: {count} expenses")
+    print(
+        f"Resharded {len(source_paths)} file(s) into {shards}. Set database.shards to "
+        f"{shards} to use them."
+    )
 
 if __name__ == "__main__":
-    migrate_database()
+    parser = argparse.ArgumentParser(
+        description="Migrate the expenses database schema."
+    )
+    parser.add_argument("--indexes-only", action="store_true",
+                        help="only add the missing indexes, keeping all existing data")
+    parser.add_argument("--check-totals", action="store_true",
+                        help="report running totals that drifted from the raw expenses")
+    parser.add_argument(
+        "--rebuild-totals",
+        action="store_true",
+        help="report drift, then rebuild the running totals from the raw expenses",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        help="copy the users of the database into this many shard files "
+        "(stop the bot first)",
+    )
+    parser.add_argument(
+        "--source-shards",
+        type=int,
+        help="number of shards the database has now, if not database.shards "
+        "of the configuration",
+    )
+    args = parser.parse_args()
+
+    if args.shards:
+        migrate_shards(args.shards, args.source_shards)
+    elif args.check_totals or args.rebuild_totals:
+        drifted = check_expense_totals(rebuild=args.rebuild_totals)
+        # A plain check exits with an error when drift is found,
+        # so it can run unattended
+        sys.exit(1 if drifted and not args.rebuild_totals else 0)
+    elif args.indexes_only:
+        migrate_indexes()
+    else:
+        migrate_database()
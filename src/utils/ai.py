@@ -0,0 +1,262 @@
+# ai.py
+import abc
+import asyncio
+import hashlib
+import json
+import logging
+
+from src.utils.cache import LRUCache
+from src.utils.lang import translate
+
+logger = logging.getLogger(__name__)
+
+# Default batching: summary requests arriving within 20 ms (or up to 8)
+# go to the backend together
+DEFAULT_BATCH_WINDOW_MS = 20
+DEFAULT_MAX_BATCH_SIZE = 8
+
+# Default number of batches the backend may work on at the same time
+DEFAULT_MAX_CONCURRENCY = 2
+
+# Default seconds a report waits for its summary before it is sent without one
+DEFAULT_SUMMARY_TIMEOUT = 10.0
+
+# Default number of summaries kept, keyed on the hash of their input
+DEFAULT_SUMMARY_CACHE_SIZE = 256
+
+
+def report_digest(rows, start_date, end_date, language):
+    """
+    Builds the input of a report summary from the (category, total_spent, count) rows of
+    db.generate_expense_report: the period, the language, the overall total and count,
+    and every category with its total, count and share of the total, largest first.
+    """
+    total = sum(row[1] for row in rows)
+    return {
+        "language": language,
+        "start_date": start_date,
+        "end_date": end_date,
+        "total": round(total, 2),
+        "count": sum(row[2] for row in rows),
+        "categories": [
+            {
+                "category": category,
+                "total": round(total_spent, 2),
+                "count": count,
+                "share": round(100 * total_spent / total, 1) if total else 0.0,
+            }
+            for category, total_spent, count in rows
+        ],
+    }
+
+
+def digest_key(digest):
+    """
+    Returns a hash of a digest's content, identical for identical aggregated inputs.
+    """
+    encoded = json.dumps(
+        digest, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class SummaryBackend(abc.ABC):
+    """
+    Interface of summarization backends. `summarize` receives a batch of report digests
+    (see report_digest) and returns one summary per digest, in the same order. It runs
+    on the event loop, so a backend calling a blocking model or client must do so in a
+    thread (asyncio.to_thread) or use an async client.
+    """
+
+    @abc.abstractmethod
+    async def summarize(self, digests):
+        """Returns one summary per digest, in the same order."""
+
+
+class TemplateBackend(SummaryBackend):
+    """
+    A deterministic local backend that fills translated templates;
+    needs no model or network.
+    """
+
+    async def summarize(self, digests):
+        return [self.render(digest) for digest in digests]
+
+    @staticmethod
+    def render(digest):
+        language = digest["language"]
+        if not digest["categories"]:
+            return translate("no_report_data", language)
+        top = digest["categories"][0]
+        return translate(
+            "report_summary",
+            language,
+            total=f"{digest['total']:.2f}",
+            count=digest["count"],
+            average=(
+                f"{digest['total'] / digest['count']:.2f}"
+                if digest["count"]
+                else "0.00"
+            ),
+            category=top["category"] or translate("uncategorized", language),
+            share=f"{top['share']:.0f}",
+        )
+
+
+# Backends selectable with the `summaries.backend` setting; "none" disables summaries
+BACKENDS = {"template": TemplateBackend}
+
+
+class Summarizer:
+    """
+    Summarizes reports through a backend, batching, deduplicating and bounding the work.
+
+    Requests arriving within `batch_window_ms` milliseconds (or until `max_batch_size`
+    are pending) are sent to the backend as one batch, and at most `max_concurrency`
+    batches run at a time, so a slow model queues work instead of piling it up.
+    Summaries are cached on the hash of their input, and concurrent requests for an
+    identical input share one backend call.
+    """
+
+    def __init__(
+        self,
+        backend,
+        batch_window_ms=DEFAULT_BATCH_WINDOW_MS,
+        max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+        max_concurrency=DEFAULT_MAX_CONCURRENCY,
+        cache_size=DEFAULT_SUMMARY_CACHE_SIZE,
+    ):
+        if batch_window_ms < 0:
+            raise ValueError("batch_window_ms cannot be negative")
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.backend = backend
+        self.batch_window_ms = batch_window_ms
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        self.cache = LRUCache(cache_size)
+        self._pending = []
+        self._in_flight = {}
+        self._timer = None
+        self._semaphore = None
+        self._batches = set()
+
+    @classmethod
+    def from_config(cls, options):
+        """
+        Builds a Summarizer from the `summaries` section of the configuration (a
+        SummaryConfig), or returns None when summaries are disabled.
+        """
+        if options.backend == "none":
+            return None
+        return cls(
+            BACKENDS[options.backend](),
+            batch_window_ms=options.batch_window_ms,
+            max_batch_size=options.max_batch_size,
+            max_concurrency=options.max_concurrency,
+            cache_size=options.cache_size,
+        )
+
+    async def summarize(self, digest):
+        """
+        Returns the summary of a report digest. Raises whatever the backend raised.
+        """
+        key = digest_key(digest)
+        summary = self.cache.get(key)
+        if summary is not None:
+            return summary
+
+        future = self._in_flight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._in_flight[key] = loop.create_future()
+            # Mark the outcome as retrieved even if every caller timed out
+            future.add_done_callback(lambda done: done.cancelled() or done.exception())
+            self._pending.append((key, digest))
+            if len(self._pending) >= self.max_batch_size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.batch_window_ms / 1000, self._flush)
+
+        # A caller giving up (e.g. on a timeout) must not cancel
+        # the summary for the others
+        return await asyncio.shield(future)
+
+    async def flush(self):
+        """Sends any pending requests immediately and waits for the running batches."""
+        self._flush()
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+
+    async def close(self):
+        """
+        Cancels the pending requests and the running batches, e.g.
+        when the bot shuts down.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for key, _ in self._pending:
+            self._in_flight.pop(key).cancel()
+        self._pending = []
+        for task in self._batches:
+            task.cancel()
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+
+    def _flush(self):
+        """Hands the pending requests to the backend as one batch."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run(self, batch):
+        """
+        Summarizes one batch once a concurrency slot is free, and resolves its futures.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        try:
+            async with self._semaphore:
+                summaries = await self.backend.summarize(
+                    [digest for _, digest in batch]
+                )
+            if len(summaries) != len(batch):
+                raise ValueError(
+                    f"The backend returned {len(summaries)} summaries for {len(batch)} "
+                    "reports"
+                )
+        except asyncio.CancelledError:
+            for key, _ in batch:
+                self._in_flight.pop(key).cancel()
+            raise
+        except Exception as e:
+            logger.error(f"Summarizing {len(batch)} reports failed: {e}")
+            for key, _ in batch:
+                future = self._in_flight.pop(key)
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (key, _), summary in zip(batch, summaries):
+            self.cache.put(key, summary)
+            future = self._in_flight.pop(key)
+            if not future.done():
+                future.set_result(summary)
+
+
+def get_summarizer(bot):
+    """
+    Returns the Summarizer owned by the bot, creating one with the local template
+    backend on first use. Returns None if the bot disabled summaries.
+    """
+    if not hasattr(bot, "summarizer"):
+        bot.summarizer = Summarizer(TemplateBackend())
+    return bot.summarizer
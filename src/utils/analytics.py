@@ -0,0 +1,192 @@
+# analytics.py
+import calendar
+from datetime import date, timedelta
+from operator import itemgetter
+
+import numpy as np
+
+from src.utils import db
+
+# Days of history the trends are fitted on, and the default rolling window and horizon
+DEFAULT_HISTORY_DAYS = 90
+DEFAULT_WINDOW_DAYS = 30
+DEFAULT_HORIZON_DAYS = 30
+
+EPOCH = date(1970, 1, 1)
+
+
+def day_number(day):
+    """Returns the number of days between 1970-01-01 and a date."""
+    return (day - EPOCH).days
+
+
+class ExpenseSeries:
+    """
+    A user's expenses as parallel NumPy arrays: the day of each expense (days since
+    1970-01-01), its amount and the index of its category in `categories`.
+    """
+
+    def __init__(self, days, amounts, codes, categories):
+        self.days = days
+        self.amounts = amounts
+        self.codes = codes
+        self.categories = categories
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Builds a series from (day, amount, category) rows such as
+        db.get_expense_series returns.
+        """
+        if not rows:
+            return cls(
+                np.empty(0, np.int64),
+                np.empty(0, np.float64),
+                np.empty(0, np.intp),
+                np.empty(0, str),
+            )
+        # Mapping itemgetter over the rows is several times faster than
+        # zip(*rows) on large results, and a dict numbers the categories about
+        # twice as fast as np.unique
+        lookup = {}
+        codes = map(
+            lambda category: lookup.setdefault(category, len(lookup)),
+            map(itemgetter(2), rows),
+        )
+        codes = np.fromiter(codes, np.intp, len(rows))
+        return cls(
+            np.fromiter(map(itemgetter(0), rows), np.int64, len(rows)),
+            np.fromiter(map(itemgetter(1), rows), np.float64, len(rows)),
+            codes,
+            np.array(list(lookup), dtype=str),
+        )
+
+    def __len__(self):
+        return len(self.days)
+
+
+def load_series(conn, user_id, start_date=None):
+    """
+    Loads a user's expenses since `start_date` into an ExpenseSeries with one query.
+    """
+    return ExpenseSeries.from_rows(db.get_expense_series(conn, user_id, start_date))
+
+
+def daily_totals(series, start_day, n_days):
+    """
+    Returns a (categories, days) matrix with the total spent per category on each of the
+    `n_days` days starting at day number `start_day`.
+    """
+    n_categories = len(series.categories)
+    offsets = series.days - start_day
+    mask = (offsets >= 0) & (offsets < n_days)
+    index = series.codes[mask] * n_days + offsets[mask]
+    totals = np.bincount(
+        index, weights=series.amounts[mask], minlength=n_categories * n_days
+    )
+    return totals.reshape(n_categories, n_days)
+
+
+def rolling_totals(daily, window):
+    """
+    Returns the total of the last `window` days (the day included)
+    for every day of `daily`.
+    """
+    cumulative = np.cumsum(daily, axis=-1)
+    rolling = cumulative.copy()
+    rolling[..., window:] -= cumulative[..., :-window]
+    return rolling
+
+
+def linear_trend(daily):
+    """
+    Fits a least-squares line to every row of `daily` against the day index.
+    Returns the (slope, intercept) arrays, the slope being in amount per day.
+    """
+    n_days = daily.shape[-1]
+    x = np.arange(n_days, dtype=np.float64)
+    x_centered = x - x.mean()
+    y_mean = daily.mean(axis=-1)
+    denominator = (x_centered ** 2).sum()
+    if denominator == 0:
+        return np.zeros_like(y_mean), y_mean
+    slope = (daily - y_mean[..., None]) @ x_centered / denominator
+    return slope, y_mean - slope * x.mean()
+
+
+def predict_total(slope, intercept, start, stop):
+    """
+    Sums the trend lines over the day indexes [start, stop), never
+    predicting negative spending.
+    """
+    x = np.arange(start, stop, dtype=np.float64)
+    predicted = intercept[..., None] + slope[..., None] * x
+    return np.clip(predicted, 0, None).sum(axis=-1)
+
+
+def forecast(
+    series,
+    today,
+    history_days=DEFAULT_HISTORY_DAYS,
+    window_days=DEFAULT_WINDOW_DAYS,
+    horizon_days=DEFAULT_HORIZON_DAYS,
+):
+    """
+    Forecasts a user's spending per category from the trend of the
+    last `history_days` days.
+
+    Returns a list of dicts, largest projection first, with the category ('' when
+    uncategorized), the total of the last `window_days` days, the amount spent this
+    month, the projected total at the end of the month, the forecast for the next
+    `horizon_days` days and the trend in amount per day.
+    """
+    if not len(series):
+        return []
+    today_number = day_number(today)
+    start_day = today_number - history_days + 1
+    daily = daily_totals(series, start_day, history_days)
+    slope, intercept = linear_trend(daily)
+
+    month_start = day_number(today.replace(day=1))
+    in_month = (series.days >= month_start) & (series.days <= today_number)
+    spent = np.bincount(
+        series.codes[in_month],
+        weights=series.amounts[in_month],
+        minlength=len(series.categories),
+    )
+
+    days_left = calendar.monthrange(today.year, today.month)[1] - today.day
+    projected = spent + predict_total(
+        slope, intercept, history_days, history_days + days_left
+    )
+    upcoming = predict_total(
+        slope, intercept, history_days, history_days + horizon_days
+    )
+    recent = rolling_totals(daily, window_days)[:, -1]
+
+    order = np.argsort(-projected, kind="stable")
+    return [
+        {
+            "category": str(series.categories[i]),
+            "recent_total": float(recent[i]),
+            "spent_this_month": float(spent[i]),
+            "projected_month_total": float(projected[i]),
+            "forecast_total": float(upcoming[i]),
+            "trend_per_day": float(slope[i]),
+        }
+        for i in order
+        if recent[i] or spent[i] or upcoming[i]
+    ]
+
+
+def month_end(today):
+    """Returns the last day of the month of `today`."""
+    return today.replace(day=calendar.monthrange(today.year, today.month)[1])
+
+
+def history_start(today, history_days=DEFAULT_HISTORY_DAYS):
+    """
+    Returns the first day the forecast needs expenses from (the history or the
+    month, whichever is earlier).
+    """
+    return min(today - timedelta(days=history_days - 1), today.replace(day=1))
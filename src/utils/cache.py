@@ -0,0 +1,62 @@
+from collections import OrderedDict
+
+# Sentinel distinguishing "not cached" from a cached None
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    A bounded mapping that evicts the least recently used entry once full.
+    Counts hits and misses so the hit rate can be reported.
+    """
+
+    def __init__(self, maxsize=128, on_evict=None):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        """Returns the cached value for `key` and marks it as recently used."""
+        value = self._entries.get(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """
+        Caches `value`, evicting the least recently used entry if the cache is full.
+        """
+        if key in self._entries:
+            self._entries.move_to_end(key)
+        self._entries[key] = value
+        if len(self._entries) > self.maxsize:
+            evicted_key, evicted_value = self._entries.popitem(last=False)
+            if self.on_evict is not None:
+                self.on_evict(evicted_key, evicted_value)
+
+    def pop(self, key, default=None):
+        """Removes `key` from the cache and returns its value."""
+        return self._entries.pop(key, default)
+
+    def clear(self):
+        """Removes every entry."""
+        self._entries.clear()
+
+    @property
+    def hit_rate(self):
+        """Fraction of lookups served from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,289 @@
+import dataclasses
+import functools
+import os
+import typing
+from dataclasses import dataclass, field
+
+import yaml
+
+from src.utils.ai import (
+    BACKENDS,
+    DEFAULT_BATCH_WINDOW_MS as DEFAULT_SUMMARY_BATCH_WINDOW_MS,
+    DEFAULT_MAX_BATCH_SIZE,
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_SUMMARY_CACHE_SIZE,
+    DEFAULT_SUMMARY_TIMEOUT,
+)
+from src.utils.database import (
+    DEFAULT_BATCH_MAX_ROWS,
+    DEFAULT_BATCH_WINDOW_MS,
+    DEFAULT_BUSY_TIMEOUT,
+    DEFAULT_CACHE_SIZE,
+    DEFAULT_DB_PATH,
+    DEFAULT_JOURNAL_MODE,
+    DEFAULT_MMAP_SIZE,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_SYNCHRONOUS,
+    JOURNAL_MODES,
+    SYNCHRONOUS_MODES,
+)
+from src.utils.logging_config import DEFAULT_LEVEL, FORMATS, LEVELS, parse_levels
+from src.utils.metrics import DEFAULT_PROMETHEUS_HOST
+from src.utils.scheduler import DEFAULT_BUDGET_INTERVAL
+from src.utils.shared import DEFAULT_LANGUAGE_CACHE_SIZE
+from src.utils.watchdog import DEFAULT_WATCHDOG_INTERVAL, DEFAULT_WATCHDOG_THRESHOLD
+
+# Location of the bot configuration file
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), '..', 'config', 'config.yaml')
+
+# Prefix of the environment variables overriding the configuration file,
+# e.g. EXPENSE_BOT_BOT_TOKEN or EXPENSE_BOT_DATABASE_POOL_SIZE
+ENV_PREFIX = "EXPENSE_BOT_"
+
+# Default number of rendered reports kept by !generate_report
+DEFAULT_REPORT_CACHE_SIZE = 256
+
+
+class ConfigError(ValueError):
+    """Raised when the configuration has an unknown key or a value of the wrong type."""
+
+
+@dataclass(frozen=True)
+class BotConfig:
+    prefix: str = "!"
+    token: str = ""
+    # Gateway shards of the whole bot; 0 uses the number Discord recommends
+    shard_count: int = 0
+    # Worker processes started by src/launcher.py, each running a range of the shards
+    processes: int = 1
+
+    def __post_init__(self):
+        _check(self.shard_count >= 0, "bot.shard_count", "zero or more")
+        _check(self.processes >= 1, "bot.processes", "at least 1")
+        _check(
+            not self.shard_count or self.shard_count >= self.processes,
+            "bot.shard_count",
+            "0 or at least bot.processes",
+        )
+
+
+@dataclass(frozen=True)
+class DatabaseConfig:
+    path: str = DEFAULT_DB_PATH
+    pool_size: int = DEFAULT_POOL_SIZE
+    journal_mode: str = DEFAULT_JOURNAL_MODE
+    synchronous: str = DEFAULT_SYNCHRONOUS
+    cache_size: int = DEFAULT_CACHE_SIZE
+    mmap_size: int = DEFAULT_MMAP_SIZE
+    busy_timeout: int = DEFAULT_BUSY_TIMEOUT
+    batch_window_ms: float = DEFAULT_BATCH_WINDOW_MS
+    batch_max_rows: int = DEFAULT_BATCH_MAX_ROWS
+    # Number of files users are spread over; changing it needs
+    # migrate_database.py --shards
+    shards: int = 1
+
+    def __post_init__(self):
+        _check(
+            self.journal_mode.lower() in JOURNAL_MODES,
+            "database.journal_mode",
+            f"one of {JOURNAL_MODES}",
+        )
+        _check(
+            self.synchronous.lower() in SYNCHRONOUS_MODES,
+            "database.synchronous",
+            f"one of {SYNCHRONOUS_MODES}",
+        )
+        _check(self.pool_size >= 1, "database.pool_size", "at least 1")
+        _check(self.busy_timeout >= 0, "database.busy_timeout", "zero or more")
+        _check(self.batch_window_ms >= 0, "database.batch_window_ms", "zero or more")
+        _check(self.batch_max_rows >= 1, "database.batch_max_rows", "at least 1")
+        _check(self.shards >= 1, "database.shards", "at least 1")
+
+
+@dataclass(frozen=True)
+class CacheConfig:
+    language_cache_size: int = DEFAULT_LANGUAGE_CACHE_SIZE
+    report_cache_size: int = DEFAULT_REPORT_CACHE_SIZE
+
+    def __post_init__(self):
+        _check(
+            self.language_cache_size >= 1, "caches.language_cache_size", "at least 1"
+        )
+        _check(self.report_cache_size >= 1, "caches.report_cache_size", "at least 1")
+
+
+@dataclass(frozen=True)
+class SchedulerConfig:
+    budget_interval: float = DEFAULT_BUDGET_INTERVAL
+
+    def __post_init__(self):
+        _check(self.budget_interval > 0, "scheduler.budget_interval", "positive")
+
+
+@dataclass(frozen=True)
+class SummaryConfig:
+    backend: str = "template"
+    batch_window_ms: float = DEFAULT_SUMMARY_BATCH_WINDOW_MS
+    max_batch_size: int = DEFAULT_MAX_BATCH_SIZE
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    timeout: float = DEFAULT_SUMMARY_TIMEOUT
+    cache_size: int = DEFAULT_SUMMARY_CACHE_SIZE
+
+    def __post_init__(self):
+        backends = ("none", *BACKENDS)
+        _check(self.backend in backends, "summaries.backend", f"one of {backends}")
+        _check(self.batch_window_ms >= 0, "summaries.batch_window_ms", "zero or more")
+        _check(self.max_batch_size >= 1, "summaries.max_batch_size", "at least 1")
+        _check(self.max_concurrency >= 1, "summaries.max_concurrency", "at least 1")
+        _check(self.timeout > 0, "summaries.timeout", "positive")
+        _check(self.cache_size >= 1, "summaries.cache_size", "at least 1")
+
+
+@dataclass(frozen=True)
+class LoggingConfig:
+    level: str = DEFAULT_LEVEL
+    format: str = "text"
+    file: str = ""
+    levels: str = ""
+
+    def __post_init__(self):
+        _check(self.level.upper() in LEVELS, "logging.level", f"one of {LEVELS}")
+        _check(self.format in FORMATS, "logging.format", f"one of {FORMATS}")
+        try:
+            parse_levels(self.levels)
+        except ValueError as e:
+            raise ConfigError(f"logging.levels: {e}") from None
+
+
+@dataclass(frozen=True)
+class MetricsConfig:
+    # Port of the local Prometheus endpoint; 0 leaves it off
+    prometheus_port: int = 0
+    prometheus_host: str = DEFAULT_PROMETHEUS_HOST
+
+    def __post_init__(self):
+        _check(
+            0 <= self.prometheus_port <= 65535,
+            "metrics.prometheus_port",
+            "between 0 and 65535",
+        )
+
+
+@dataclass(frozen=True)
+class WatchdogConfig:
+    interval: float = DEFAULT_WATCHDOG_INTERVAL
+    # Lag in seconds from which stalls are reported with their stack;
+    # 0 turns the watchdog off
+    threshold: float = DEFAULT_WATCHDOG_THRESHOLD
+
+    def __post_init__(self):
+        _check(self.interval > 0, "watchdog.interval", "positive")
+        _check(self.threshold >= 0, "watchdog.threshold", "zero or more")
+
+
+@dataclass(frozen=True)
+class Config:
+    """
+    The bot configuration: config.yaml overridden by EXPENSE_BOT_* environment
+    variables. Every section and value is optional and defaults to the values the
+    subsystems use on their own.
+    """
+    default_language: str = "en"
+    bot: BotConfig = field(default_factory=BotConfig)
+    database: DatabaseConfig = field(default_factory=DatabaseConfig)
+    caches: CacheConfig = field(default_factory=CacheConfig)
+    scheduler: SchedulerConfig = field(default_factory=SchedulerConfig)
+    summaries: SummaryConfig = field(default_factory=SummaryConfig)
+    logging: LoggingConfig = field(default_factory=LoggingConfig)
+    metrics: MetricsConfig = field(default_factory=MetricsConfig)
+    watchdog: WatchdogConfig = field(default_factory=WatchdogConfig)
+
+
+def _check(condition, name, expected):
+    if not condition:
+        raise ConfigError(f"{name} must be {expected}")
+
+
+def _convert(name, value, kind):
+    """Converts a value from the file or the environment to the declared type."""
+    if isinstance(value, str) and kind is not str:
+        try:
+            value = kind(value)
+        except ValueError:
+            raise ConfigError(
+                f"{name} must be a {kind.__name__}, got {value!r}"
+            ) from None
+    if kind is float and isinstance(value, int) and not isinstance(value, bool):
+        value = float(value)
+    if not isinstance(value, kind) or isinstance(value, bool):
+        raise ConfigError(f"{name} must be a {kind.__name__}, got {value!r}")
+    return value
+
+
+def _build(cls, values, environ, prefix, env_prefix):
+    """Builds a config dataclass from a mapping, applying the environment overrides."""
+    if values is None:
+        values = {}
+    if not isinstance(values, dict):
+        raise ConfigError(
+            f"{prefix.rstrip('.') or 'The configuration'} must be a mapping"
+        )
+    fields = {f.name: f for f in dataclasses.fields(cls)}
+    unknown = set(values) - set(fields)
+    if unknown:
+        raise ConfigError(
+            "Unknown configuration keys: "
+            f"{', '.join(prefix + key for key in sorted(unknown))}"
+        )
+
+    types = typing.get_type_hints(cls)
+    kwargs = {}
+    for name in fields:
+        kind = types[name]
+        env_name = f"{env_prefix}{name.upper()}"
+        if dataclasses.is_dataclass(kind):
+            kwargs[name] = _build(
+                kind, values.get(name), environ, f"{prefix}{name}.", f"{env_name}_"
+            )
+        elif env_name in environ:
+            kwargs[name] = _convert(prefix + name, environ[env_name], kind)
+        elif name in values:
+            kwargs[name] = _convert(prefix + name, values[name], kind)
+    return cls(**kwargs)
+
+
+def parse_config(data, environ=None):
+    """Builds a Config from the parsed YAML document and the environment variables."""
+    return _build(
+        Config, data, os.environ if environ is None else environ, "", ENV_PREFIX
+    )
+
+
+def read_config(path=CONFIG_PATH, environ=None):
+    """
+    Reads and validates a configuration file. A missing file
+    means every default applies.
+    """
+    try:
+        with open(path, 'r') as config_file:
+            data = yaml.safe_load(config_file)
+    except FileNotFoundError:
+        data = None
+    return parse_config(data, environ)
+
+
+@functools.lru_cache(maxsize=None)
+def load_config(path=CONFIG_PATH):
+    """
+    Returns the configuration. The file is read once per path and every caller shares
+    the resulting immutable Config.
+    """
+    return read_config(path)
+
+
+def get_config(bot):
+    """
+    Returns the Config of the bot, or the shared configuration if the bot has none.
+    """
+    config = getattr(bot, "config", None)
+    return config if isinstance(config, Config) else load_config()
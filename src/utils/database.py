@@ -0,0 +1,677 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from src.utils import db
+from src.utils.metrics import add_db_time
+
+logger = logging.getLogger(__name__)
+
+# Default location of the SQLite database file
+DEFAULT_DB_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "database", "expenses.db"
+)
+
+# Default number of pooled read connections (and reader threads)
+DEFAULT_POOL_SIZE = 4
+
+# Default storage tuning: WAL journal, relaxed fsync, ~16 MB page cache,
+# 64 MB memory map and a 5 second wait on a locked database
+DEFAULT_JOURNAL_MODE = "wal"
+DEFAULT_SYNCHRONOUS = "normal"
+DEFAULT_CACHE_SIZE = -16000
+DEFAULT_MMAP_SIZE = 64 * 1024 * 1024
+DEFAULT_BUSY_TIMEOUT = 5000
+
+# Default group commit: inserts arriving within 5 ms (or up to 100
+# rows) share one transaction
+DEFAULT_BATCH_WINDOW_MS = 5
+DEFAULT_BATCH_MAX_ROWS = 100
+
+# Distance between the first expense and budget IDs of two shards, keeping
+# IDs unique across shards
+SHARD_ID_SPACING = 10 ** 12
+
+JOURNAL_MODES = ("delete", "truncate", "persist", "memory", "wal", "off")
+SYNCHRONOUS_MODES = ("off", "normal", "full", "extra")
+
+
+@functools.lru_cache(maxsize=None)
+def _signature(fn):
+    """Caches the signature of a query helper."""
+    return inspect.signature(fn)
+
+
+def _user_argument(fn, args, kwargs):
+    """Returns the `user_id` argument of a query helper call, or None if it has none."""
+    try:
+        bound = _signature(fn).bind(None, *args, **kwargs)
+    except (TypeError, ValueError):
+        return None
+    return bound.arguments.get("user_id")
+
+
+def shard_index(user_id, shards):
+    """
+    Returns the shard holding a user's data: a hash of the user ID, stable across
+    processes and runs, modulo the number of shards.
+    """
+    digest = hashlib.blake2b(str(user_id).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shards
+
+
+def shard_paths(path, shards):
+    """
+    Returns the files of a database split in `shards` shards: `path` itself for
+    one shard, otherwise e.g. expenses.shard0-of-4.db to expenses.shard3-of-4.db
+    next to it, so the files of two layouts never collide while a migration
+    copies one into the other.
+    """
+    if shards == 1:
+        return [path]
+    root, extension = os.path.splitext(path)
+    return [f"{root}.shard{index}-of-{shards}{extension}" for index in range(shards)]
+
+
+class ExpenseBatcher:
+    """
+    Groups expense inserts that arrive close together into one transaction.
+
+    Each caller awaits its own expense ID while rows are collected for up to
+    `window_ms` milliseconds (or until `max_rows` are pending) and then written
+    with a single `db.insert_expenses` call on the serialized writer, so a burst
+    of `!log_expense` commands costs one commit instead of one per row.
+    """
+
+    def __init__(
+        self,
+        database,
+        window_ms=DEFAULT_BATCH_WINDOW_MS,
+        max_rows=DEFAULT_BATCH_MAX_ROWS,
+    ):
+        if window_ms < 0:
+            raise ValueError("window_ms cannot be negative")
+        if max_rows < 1:
+            raise ValueError("max_rows must be at least 1")
+        self.database = database
+        self.window_ms = window_ms
+        self.max_rows = max_rows
+        self._pending = []
+        self._timer = None
+        self._commits = set()
+
+    async def insert_expense(
+        self, user_id, amount, description, category=None, date_added=None
+    ):
+        """
+        Queues one expense and returns its ID once the batch containing it is committed.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(
+            ((user_id, amount, description, category, date_added), future)
+        )
+
+        if len(self._pending) >= self.max_rows:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_ms / 1000, self._flush)
+
+        return await future
+
+    async def flush(self):
+        """Commits any pending rows immediately and waits for in-flight batches."""
+        self._flush()
+        if self._commits:
+            await asyncio.gather(*self._commits, return_exceptions=True)
+
+    def _flush(self):
+        """Hands the pending rows to the writer as one batch."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._commit(batch))
+            self._commits.add(task)
+            task.add_done_callback(self._commits.discard)
+
+    async def _commit(self, batch):
+        """Writes one batch and resolves each caller's future with its expense ID."""
+        try:
+            expense_ids = await self.database.write(
+                db.insert_expenses, [row for row, _ in batch]
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # db.insert_expenses returns an empty list when the transaction failed
+        if len(expense_ids) != len(batch):
+            expense_ids = [None] * len(batch)
+        else:
+            self.database.notify_write({row[0] for row, _ in batch}, insert=True)
+        for (_, future), expense_id in zip(batch, expense_ids):
+            if not future.done():
+                future.set_result(expense_id)
+
+
+class Database:
+    """
+    Bot-scoped access layer for the SQLite database.
+
+    Reads run concurrently on a bounded pool of long-lived connections, while
+    every write goes through a single serialized writer thread with its own
+    connection, so writers never contend for the SQLite lock. In the default
+    WAL mode readers are never blocked by that writer. None of this runs on the
+    event loop. The query helpers in `src.utils.db` are reused as-is: each one
+    receives a connection as its first argument.
+    """
+
+    def __init__(
+        self,
+        path=DEFAULT_DB_PATH,
+        pool_size=DEFAULT_POOL_SIZE,
+        journal_mode=DEFAULT_JOURNAL_MODE,
+        synchronous=DEFAULT_SYNCHRONOUS,
+        cache_size=DEFAULT_CACHE_SIZE,
+        mmap_size=DEFAULT_MMAP_SIZE,
+        busy_timeout=DEFAULT_BUSY_TIMEOUT,
+        batch_window_ms=DEFAULT_BATCH_WINDOW_MS,
+        batch_max_rows=DEFAULT_BATCH_MAX_ROWS,
+        first_id=0,
+    ):
+        if pool_size < 1:
+            raise ValueError("pool_size must be at least 1")
+        if journal_mode.lower() not in JOURNAL_MODES:
+            raise ValueError(f"Unsupported journal_mode: {journal_mode}")
+        if synchronous.lower() not in SYNCHRONOUS_MODES:
+            raise ValueError(f"Unsupported synchronous mode: {synchronous}")
+
+        self.path = path
+        self.pool_size = pool_size
+        self.journal_mode = journal_mode.lower()
+        self.synchronous = synchronous.lower()
+        self.cache_size = int(cache_size)
+        self.mmap_size = int(mmap_size)
+        self.busy_timeout = int(busy_timeout)
+        self.first_id = first_id
+
+        self._readers = ThreadPoolExecutor(
+            max_workers=pool_size, thread_name_prefix="expenses-db-read"
+        )
+        self._writer = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="expenses-db-write"
+        )
+        self._connections = queue.LifoQueue(maxsize=pool_size)
+        self._writer_conn = None
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self.batcher = ExpenseBatcher(
+            self, window_ms=batch_window_ms, max_rows=batch_max_rows
+        )
+        self._write_listeners = []
+
+    @classmethod
+    def from_config(cls, options):
+        """
+        Builds a Database from the `database` section of the
+        configuration (a DatabaseConfig).
+        """
+        return cls(
+            path=options.path,
+            pool_size=options.pool_size,
+            journal_mode=options.journal_mode,
+            synchronous=options.synchronous,
+            cache_size=options.cache_size,
+            mmap_size=options.mmap_size,
+            busy_timeout=options.busy_timeout,
+            batch_window_ms=options.batch_window_ms,
+            batch_max_rows=options.batch_max_rows,
+        )
+
+    def _connect(self):
+        """
+        Opens and tunes a new connection, creating the database and
+        its tables the first time.
+        """
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        conn = sqlite3.connect(
+            self.path, timeout=self.busy_timeout / 1000, check_same_thread=False
+        )
+        conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        conn.execute(f"PRAGMA cache_size = {self.cache_size}")
+        conn.execute(f"PRAGMA mmap_size = {self.mmap_size}")
+        conn.execute(f"PRAGMA busy_timeout = {self.busy_timeout}")
+
+        with self._schema_lock:
+            if not self._schema_ready:
+                db.create_expenses_table(conn)
+                db.create_budgets_table(conn)
+                db.create_user_language_table(conn)
+                db.create_expense_totals_table(conn)
+                db.create_indexes(conn)
+                if self.first_id:
+                    db.set_id_floor(conn, self.first_id)
+                self._schema_ready = True
+        return conn
+
+    def _acquire(self):
+        """
+        Takes a read connection from the pool, opening a new one
+        while below the pool size.
+        """
+        try:
+            return self._connections.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._opened < self.pool_size:
+                conn = self._connect()
+                self._opened += 1
+                return conn
+
+        return self._connections.get()
+
+    def _release(self, conn):
+        """Returns a read connection to the pool."""
+        self._connections.put_nowait(conn)
+
+    def _read_call(self, fn, args, kwargs):
+        """Runs `fn` with a pooled connection. Executed on a reader thread."""
+        conn = self._acquire()
+        try:
+            return fn(conn, *args, **kwargs)
+        finally:
+            self._release(conn)
+
+    def _write_call(self, fn, args, kwargs):
+        """
+        Runs `fn` with the writer connection. Executed on the single writer thread.
+        """
+        if self._writer_conn is None:
+            self._writer_conn = self._connect()
+        return fn(self._writer_conn, *args, **kwargs)
+
+    async def read(self, fn, *args, conn=None, **kwargs):
+        """
+        Runs a read-only query helper such as `db.list_expenses` off the event loop.
+
+        Parameters:
+        fn: A function taking a connection as its first argument.
+        conn: Optional connection to use directly instead of the pool (for testing).
+        """
+        if conn is not None:
+            return fn(conn, *args, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            return await loop.run_in_executor(
+                self._readers, functools.partial(self._read_call, fn, args, kwargs)
+            )
+        finally:
+            add_db_time(time.perf_counter() - start)
+
+    async def write(self, fn, *args, conn=None, **kwargs):
+        """
+        Queues a writing helper such as `db.insert_expense` on the serialized writer.
+        Write listeners are notified with the helper's `user_id` argument, if it has
+        one.
+
+        Parameters:
+        fn: A function taking a connection as its first argument.
+        conn: Optional connection to use directly instead of the writer (for testing).
+        """
+        if conn is not None:
+            result = fn(conn, *args, **kwargs)
+        else:
+            loop = asyncio.get_running_loop()
+            start = time.perf_counter()
+            try:
+                result = await loop.run_in_executor(
+                    self._writer, functools.partial(self._write_call, fn, args, kwargs)
+                )
+            finally:
+                add_db_time(time.perf_counter() - start)
+
+        user_id = _user_argument(fn, args, kwargs)
+        if user_id is not None:
+            self.notify_write((user_id,))
+        return result
+
+    def partition(self, user_ids):
+        """
+        Groups user IDs by the database holding their data, as (database, user IDs)
+        pairs, so a query over several users can run once per shard; here, one group.
+        """
+        return [(self, list(user_ids))] if user_ids else []
+
+    def add_write_listener(self, listener, inserts=True):
+        """
+        Registers a callable run on the event loop with the user_id of every write.
+        With `inserts=False`, it is not told about the expenses added through
+        insert_expense, for a listener whose owner records those expenses itself.
+        """
+        self._write_listeners.append((listener, inserts))
+
+    def remove_write_listener(self, listener):
+        """Unregisters a write listener."""
+        self._write_listeners = [
+            entry for entry in self._write_listeners if entry[0] != listener
+        ]
+
+    def notify_write(self, user_ids, insert=False):
+        """
+        Tells the write listeners that the given users' data changed; `insert` marks
+        expenses added through insert_expense.
+        """
+        for listener, inserts in self._write_listeners:
+            if insert and not inserts:
+                continue
+            for user_id in user_ids:
+                listener(user_id)
+
+    async def insert_expense(
+        self, user_id, amount, description, category=None, date_added=None, conn=None
+    ):
+        """
+        Inserts an expense through the group-commit batcher and returns its ID.
+
+        Parameters:
+        date_added: Optional SQLite timestamp of the expense; None means now.
+        conn: Optional connection to insert into directly, without batching (for
+        testing).
+        """
+        if conn is not None:
+            expense_id = db.insert_expense(
+                conn, user_id, amount, description, category, date_added
+            )
+            self.notify_write((user_id,), insert=True)
+            return expense_id
+        start = time.perf_counter()
+        try:
+            return await self.batcher.insert_expense(
+                user_id, amount, description, category, date_added
+            )
+        finally:
+            add_db_time(time.perf_counter() - start)
+
+    async def flush(self):
+        """
+        Commits the expenses waiting in the batcher. Called before close on shutdown.
+        """
+        await self.batcher.flush()
+
+    def close(self):
+        """Waits for pending queries and closes every connection."""
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+        if self._writer_conn is not None:
+            self._writer_conn.close()
+            self._writer_conn = None
+        while True:
+            try:
+                conn = self._connections.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+        self._opened = 0
+
+
+class ShardedDatabase:
+    """
+    Spreads users over several SQLite files by a hash of their ID (see shard_index),
+    each shard being a Database with its own writer thread, group-commit batcher and
+    reader pool, so the writes of users on different shards no longer wait for one lock.
+
+    It has the interface of Database, and the helpers in `src.utils.db` are called
+    exactly as before: a call is routed to the shard of its `user_id` argument, and the
+    rows of insert_expenses and import_expenses are split by the user of each row. A
+    call without a user, such as the maintenance helpers, runs on every shard and the
+    results are
+    combined: lists are concatenated, numbers added and dicts merged. Shard i numbers
+    its expenses and budgets from i * SHARD_ID_SPACING, so IDs stay unique across
+    shards.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH, shards=2, **options):
+        if shards < 1:
+            raise ValueError("shards must be at least 1")
+        self.path = path
+        self.shards = [
+            Database(shard_path, first_id=index * SHARD_ID_SPACING, **options)
+            for index, shard_path in enumerate(shard_paths(path, shards))
+        ]
+        self._write_listeners = []
+        for shard in self.shards:
+            # insert_expense notifies the inserts itself, apart from other writes
+            shard.add_write_listener(self._forward_write, inserts=False)
+
+    @classmethod
+    def from_config(cls, options):
+        """
+        Builds a ShardedDatabase from the `database` section of the
+        configuration (a DatabaseConfig).
+        """
+        return cls(
+            path=options.path,
+            shards=options.shards,
+            pool_size=options.pool_size,
+            journal_mode=options.journal_mode,
+            synchronous=options.synchronous,
+            cache_size=options.cache_size,
+            mmap_size=options.mmap_size,
+            busy_timeout=options.busy_timeout,
+            batch_window_ms=options.batch_window_ms,
+            batch_max_rows=options.batch_max_rows,
+        )
+
+    def shard_for(self, user_id):
+        """Returns the Database holding a user's data."""
+        return self.shards[shard_index(user_id, len(self.shards))]
+
+    def partition(self, user_ids):
+        """Groups user IDs by shard, as (shard Database, user IDs) pairs."""
+        groups = defaultdict(list)
+        for user_id in user_ids:
+            groups[shard_index(user_id, len(self.shards))].append(user_id)
+        return [(self.shards[index], group) for index, group in groups.items()]
+
+    async def read(self, fn, *args, conn=None, **kwargs):
+        """
+        Runs a read-only query helper on the shard of its `user_id` argument, or on
+        every shard if it has none.
+
+        Parameters:
+        fn: A function taking a connection as its first argument.
+        conn: Optional connection to use directly instead of the shards (for testing).
+        """
+        if conn is not None:
+            return fn(conn, *args, **kwargs)
+        return await self._route("read", fn, args, kwargs)
+
+    async def write(self, fn, *args, conn=None, **kwargs):
+        """
+        Queues a writing helper on the writer of the shard of its `user_id`
+        argument, or of every shard if it has none. Write listeners are
+        notified as with Database.write.
+
+        Parameters:
+        fn: A function taking a connection as its first argument.
+        conn: Optional connection to use directly instead of the shards (for testing).
+        """
+        if conn is not None:
+            result = fn(conn, *args, **kwargs)
+            user_id = _user_argument(fn, args, kwargs)
+            if user_id is not None:
+                self.notify_write((user_id,))
+            return result
+        return await self._route("write", fn, args, kwargs)
+
+    async def _route(self, method, fn, args, kwargs):
+        """
+        Runs a helper through `method` ("read" or "write") of the
+        shards holding its data.
+        """
+        user_id = _user_argument(fn, args, kwargs)
+        if user_id is not None:
+            return await getattr(self.shard_for(user_id), method)(fn, *args, **kwargs)
+        if fn in (db.insert_expenses, db.import_expenses) and args and not kwargs:
+            return await self._split_rows(method, fn, args[0])
+        results = await asyncio.gather(
+            *(getattr(shard, method)(fn, *args, **kwargs) for shard in self.shards)
+        )
+        return _combine(results)
+
+    async def _split_rows(self, method, fn, rows):
+        """
+        Runs a helper taking (user_id, ...) rows once per shard with that shard's rows.
+        insert_expenses returns the IDs in the order of `rows` (empty if a shard
+        failed), import_expenses the number of rows inserted.
+        """
+        positions = defaultdict(list)
+        for position, row in enumerate(rows):
+            positions[shard_index(row[0], len(self.shards))].append(position)
+        results = await asyncio.gather(
+            *(
+                getattr(self.shards[index], method)(
+                    fn, [rows[position] for position in group]
+                )
+                for index, group in positions.items()
+            )
+        )
+        if fn is not db.insert_expenses:
+            return sum(results)
+
+        expense_ids = [None] * len(rows)
+        for group, shard_ids in zip(positions.values(), results):
+            if len(shard_ids) != len(group):
+                return []
+            for position, expense_id in zip(group, shard_ids):
+                expense_ids[position] = expense_id
+        return expense_ids
+
+    async def insert_expense(
+        self, user_id, amount, description, category=None, date_added=None, conn=None
+    ):
+        """
+        Inserts an expense through the group-commit batcher of the user's
+        shard and returns its ID.
+
+        Parameters:
+        date_added: Optional SQLite timestamp of the expense; None means now.
+        conn: Optional connection to insert into directly, without batching (for
+        testing).
+        """
+        if conn is not None:
+            expense_id = db.insert_expense(
+                conn, user_id, amount, description, category, date_added
+            )
+            self.notify_write((user_id,), insert=True)
+            return expense_id
+        expense_id = await self.shard_for(user_id).insert_expense(
+            user_id, amount, description, category, date_added
+        )
+        if expense_id is not None:
+            self.notify_write((user_id,), insert=True)
+        return expense_id
+
+    def add_write_listener(self, listener, inserts=True):
+        """
+        Registers a callable run on the event loop with the user_id of every write.
+        With `inserts=False`, it is not told about the expenses added through
+        insert_expense, for a listener whose owner records those expenses itself.
+        """
+        self._write_listeners.append((listener, inserts))
+
+    def remove_write_listener(self, listener):
+        """Unregisters a write listener."""
+        self._write_listeners = [
+            entry for entry in self._write_listeners if entry[0] != listener
+        ]
+
+    def notify_write(self, user_ids, insert=False):
+        """
+        Tells the write listeners that the given users' data changed; `insert` marks
+        expenses added through insert_expense.
+        """
+        for listener, inserts in self._write_listeners:
+            if insert and not inserts:
+                continue
+            for user_id in user_ids:
+                listener(user_id)
+
+    def _forward_write(self, user_id):
+        """Passes the writes notified by a shard on to the listeners of the router."""
+        self.notify_write((user_id,))
+
+    async def flush(self):
+        """Commits the expenses waiting in the batcher of every shard."""
+        await asyncio.gather(*(shard.flush() for shard in self.shards))
+
+    def close(self):
+        """Waits for pending queries and closes every shard."""
+        for shard in self.shards:
+            shard.close()
+
+
+def _combine(results):
+    """Combines the results of a helper run on every shard."""
+    results = [result for result in results if result is not None]
+    if not results:
+        return None
+    if isinstance(results[0], list):
+        return [item for result in results for item in result]
+    if isinstance(results[0], dict):
+        return {key: value for result in results for key, value in result.items()}
+    if isinstance(results[0], (int, float)):
+        return sum(results)
+    raise TypeError(
+        f"Cannot combine results of type {type(results[0]).__name__} from several "
+        "shards"
+    )
+
+
+def open_database(options):
+    """
+    Opens the database described by the `database` section of the configuration (a
+    DatabaseConfig): a Database, or a ShardedDatabase when `shards` is more than 1.
+    """
+    if options.shards > 1:
+        return ShardedDatabase.from_config(options)
+    return Database.from_config(options)
+
+
+def get_database(bot):
+    """
+    Returns the Database owned by the bot, creating a default one on first use.
+    The default one is the file at DEFAULT_DB_PATH, so a warning is logged: bots,
+    and the tests' bots, are expected to attach their own database as `bot.db`.
+    """
+    database = getattr(bot, "db", None)
+    if database is None:
+        logger.warning(
+            f"The bot has no database; opening the default one at {DEFAULT_DB_PATH}"
+        )
+        database = Database()
+        bot.db = database
+    return database
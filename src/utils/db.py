@@ -1,18 +1,25 @@
+import logging
 import sqlite3
 
-def connect_db():
+from src.utils.metrics import instrument_functions
+
+logger = logging.getLogger(__name__)
+
+def connect_db(path='src/database/expenses.db'):
     """
-    Establishes a connection to the SQLite database and creates necessary tables if they don't exist.
-    Returns the database connection object.
+    Establishes a connection to the SQLite database at `path` and creates necessary
+    tables if they don't exist. Returns the database connection object.
     """
     try:
-        conn = sqlite3.connect('src/database/expenses.db')
+        conn = sqlite3.connect(path)
         create_expenses_table(conn)
         create_budgets_table(conn)
         create_user_language_table(conn)
+        create_expense_totals_table(conn)
+        create_indexes(conn)
         return conn
     except sqlite3.Error as e:
-        print(f"Error connecting to the database: {e}")
+        logger.error(f"Error connecting to the database: {e}")
         return None
 
 def create_expenses_table(conn):
@@ -31,7 +38,7 @@ def create_expenses_table(conn):
         ''')
         conn.commit()
     except sqlite3.Error as e:
-        print(f"Error creating expenses table: {e}")
+        logger.error(f"Error creating expenses table: {e}")
         conn.rollback()
 
 def create_budgets_table(conn):
@@ -51,7 +58,7 @@ def create_budgets_table(conn):
         ''')
         conn.commit()
     except sqlite3.Error as e:
-        print(f"Error creating budgets table: {e}")
+        logger.error(f"Error creating budgets table: {e}")
         conn.rollback()
 
 def create_user_language_table(conn):
@@ -66,62 +73,307 @@ def create_user_language_table(conn):
         ''')
         conn.commit()
     except sqlite3.Error as e:
-        print(f"Error creating user_language table: {e}")
+        logger.error(f"Error creating user_language table: {e}")
         conn.rollback()
 
-def insert_expense(conn, user_id, amount, description, category=None):
-    """Inserts a new expense into the 'expenses' table."""
+def create_expense_totals_table(conn):
+    """
+    Creates the 'expense_totals' table, which keeps a running total and count of
+    expenses per user, category and monthly period bucket ('YYYY-MM'), plus the
+    triggers that keep it up to date on every insert, update and delete of an
+    expense. Must run after the expenses table is created; existing expenses are
+    aggregated the first time.
+    """
     try:
         cursor = conn.cursor()
         cursor.execute('''
-            INSERT INTO expenses (user_id, amount, description, category)
-            VALUES (?, ?, ?, ?)
-        ''', (user_id, amount, description, category))
+            CREATE TABLE IF NOT EXISTS expense_totals (
+                user_id INTEGER NOT NULL,
+                category TEXT NOT NULL,
+                period_bucket TEXT NOT NULL,
+                total REAL NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (user_id, category, period_bucket)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS expense_totals_insert AFTER INSERT ON expenses
+            BEGIN
+                {_ADD_TO_TOTALS.format(row="NEW")}
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS expense_totals_delete AFTER DELETE ON expenses
+            BEGIN
+                {_SUBTRACT_FROM_TOTALS.format(row="OLD")}
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS expense_totals_update
+            AFTER UPDATE OF user_id, amount, category, date_added ON expenses
+            BEGIN
+                {_SUBTRACT_FROM_TOTALS.format(row="OLD")}
+                {_ADD_TO_TOTALS.format(row="NEW")}
+            END
+        ''')
         conn.commit()
-        return cursor.lastrowid  # Return the ID of the newly inserted expense
+
+        # Aggregate the expenses logged before the table existed
+        if cursor.execute('SELECT 1 FROM expense_totals LIMIT 1').fetchone() is None:
+            rebuild_expense_totals(conn)
     except sqlite3.Error as e:
-        print(f"Error inserting expense: {e}")
+        logger.error(f"Error creating expense_totals table: {e}")
         conn.rollback()
-        return None
 
-def delete_expense(conn, expense_id):
-    """Deletes an expense by its ID."""
+# Statements shared by the expense_totals triggers; {row} is NEW or OLD
+_ADD_TO_TOTALS = '''
+                INSERT INTO expense_totals
+                    (user_id, category, period_bucket, total, count)
+                VALUES ({row}.user_id, COALESCE({row}.category, ''),
+                        COALESCE(strftime('%Y-%m', {row}.date_added), ''),
+                        {row}.amount, 1)
+                ON CONFLICT (user_id, category, period_bucket)
+                DO UPDATE SET total = total + excluded.total, count = count + 1;
+'''
+_SUBTRACT_FROM_TOTALS = '''
+                UPDATE expense_totals
+                SET total = total - {row}.amount, count = count - 1
+                WHERE user_id = {row}.user_id
+                  AND category = COALESCE({row}.category, '')
+                  AND period_bucket = COALESCE(strftime('%Y-%m', {row}.date_added), '');
+                DELETE FROM expense_totals
+                WHERE user_id = {row}.user_id
+                  AND category = COALESCE({row}.category, '')
+                  AND period_bucket = COALESCE(strftime('%Y-%m', {row}.date_added), '')
+                  AND count <= 0;
+'''
+
+# Aggregates the raw expenses exactly like the triggers do
+_AGGREGATE_EXPENSES = '''
+    SELECT user_id, COALESCE(category, '') AS category,
+           COALESCE(strftime('%Y-%m', date_added), '') AS period_bucket,
+           SUM(amount) AS total, COUNT(*) AS count
+    FROM expenses
+    GROUP BY 1, 2, 3
+'''
+
+# Bounds of a period from the day {start} to the day {end}, both included: the expenses
+# from s (included) to e (excluded) count, and the months from fs to le are wholly
+# inside it (none if fs >= le)
+_PERIOD_BOUNDS = '''
+    date({start}) AS s, date({end}, '+1 day') AS e,
+    CASE WHEN date({start}) = date({start}, 'start of month') THEN date({start})
+         ELSE date({start}, 'start of month', '+1 month') END AS fs,
+    date({end}, '+1 day', 'start of month') AS le
+'''
+
+# What a user spent in a category during a period with the _PERIOD_BOUNDS {s}, {e}, {fs}
+# and {le}: the whole months from the running totals, the partial first and last months
+# from the raw expenses (through idx_expenses_user_category_date)
+_SPENT_IN_PERIOD = '''
+    (SELECT COALESCE(SUM(total), 0) FROM expense_totals
+     WHERE user_id = {user} AND category = COALESCE({category}, '')
+       AND period_bucket >= strftime('%Y-%m', {fs})
+       AND period_bucket < strftime('%Y-%m', {le}))
+    + (SELECT COALESCE(SUM(amount), 0) FROM expenses
+       WHERE user_id = {user} AND category IS {category}
+         AND date_added >= {s} AND date_added < MIN({fs}, {e}))
+    + (SELECT COALESCE(SUM(amount), 0) FROM expenses
+       WHERE user_id = {user} AND category IS {category}
+         AND date_added >= MAX({le}, {fs}) AND date_added < {e})
+'''
+
+def create_indexes(conn):
+    """
+    Creates the composite indexes used by the per-user queries if they don't already
+    exist. Must run after the tables are created.
+    """
     try:
         cursor = conn.cursor()
         cursor.execute('''
-            DELETE FROM expenses WHERE id = ?
-        ''', (expense_id,))
+            CREATE INDEX IF NOT EXISTS idx_expenses_user_date
+            ON expenses (user_id, date_added)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_expenses_user_category_date
+            ON expenses (user_id, category, date_added)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_budgets_user_category
+            ON budgets (user_id, category)
+        ''')
+        conn.commit()
+    except sqlite3.Error as e:
+        logger.error(f"Error creating indexes: {e}")
+        conn.rollback()
+
+def set_id_floor(conn, first_id):
+    """
+    Makes new expenses and budgets get IDs above `first_id`, unless they already do.
+    Each shard of a sharded database starts at its own floor, keeping IDs unique across
+    shards.
+    """
+    try:
+        cursor = conn.cursor()
+        for table in ("expenses", "budgets"):
+            cursor.execute(
+                'UPDATE sqlite_sequence SET seq = ? WHERE name = ? AND seq < ?',
+                (first_id, table, first_id),
+            )
+            cursor.execute('''
+                INSERT INTO sqlite_sequence (name, seq)
+                SELECT ?, ?
+                WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = ?)
+            ''', (table, first_id, table))
         conn.commit()
     except sqlite3.Error as e:
-        print(f"Error deleting expense: {e}")
+        logger.error(f"Error setting the ID floor: {e}")
         conn.rollback()
 
-def update_expense(conn, expense_id, new_amount, new_description):
-    """Updates the amount and description of an existing expense."""
+def set_user_language(conn, user_id, language):
+    """Inserts or updates the preferred language of a user. Returns True on success."""
     try:
         cursor = conn.cursor()
         cursor.execute('''
-            UPDATE expenses
-            SET amount = ?, description = ?
-            WHERE id = ?
-        ''', (new_amount, new_description, expense_id))
+            INSERT INTO user_language (user_id, language)
+            VALUES (?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET language = excluded.language
+        ''', (user_id, language))
         conn.commit()
+        return True
     except sqlite3.Error as e:
-        print(f"Error updating expense: {e}")
+        logger.error(f"Error setting user language: {e}")
         conn.rollback()
+        return False
+
+def get_user_language(conn, user_id):
+    """
+    Returns the preferred language of a user, or None if they never set one. A failed
+    query raises sqlite3.Error instead, so it is not mistaken for a missing preference.
+    """
+    cursor = conn.cursor()
+    cursor.execute('SELECT language FROM user_language WHERE user_id = ?', (user_id,))
+    row = cursor.fetchone()
+    return row[0] if row else None
 
-def update_expense_category(conn, expense_id, category):
-    """Updates the category of an existing expense."""
+def insert_expense(conn, user_id, amount, description, category=None, date_added=None):
+    """Inserts a new expense into the 'expenses' table; a None date_added means now."""
     try:
         cursor = conn.cursor()
         cursor.execute('''
-            UPDATE expenses
-            SET category = ?
-            WHERE id = ?
-        ''', (category, expense_id))
+            INSERT INTO expenses (user_id, amount, description, category, date_added)
+            VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+        ''', (user_id, amount, description, category, date_added))
+        conn.commit()
+        return cursor.lastrowid  # Return the ID of the newly inserted expense
+    except sqlite3.Error as e:
+        logger.error(f"Error inserting expense: {e}")
+        conn.rollback()
+        return None
+
+def insert_expenses(conn, expenses):
+    """
+    Inserts several (user_id, amount, description, category[, date_added]) rows in a
+    single transaction; a missing or None date_added means now. Returns the IDs of the
+    new expenses in the same order, or an empty list on error.
+    """
+    if not expenses:
+        return []
+    try:
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT INTO expenses (user_id, amount, description, category, date_added)
+            VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+        ''', (row if len(row) == 5 else (*row, None) for row in expenses))
+        # Rows inserted by one transaction on one connection get
+        # consecutive AUTOINCREMENT IDs
+        last_id = cursor.execute('SELECT last_insert_rowid()').fetchone()[0]
+        conn.commit()
+        return list(range(last_id - len(expenses) + 1, last_id + 1))
+    except sqlite3.Error as e:
+        logger.error(f"Error inserting expenses: {e}")
+        conn.rollback()
+        return []
+
+def import_expenses(conn, expenses):
+    """
+    Inserts (user_id, amount, description, category, date_added) rows in a single
+    transaction; a None date_added means now. Returns the number of rows inserted,
+    or 0 on error.
+    """
+    if not expenses:
+        return 0
+    try:
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT INTO expenses (user_id, amount, description, category, date_added)
+            VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+        ''', expenses)
+        conn.commit()
+        return len(expenses)
+    except sqlite3.Error as e:
+        logger.error(f"Error importing expenses: {e}")
+        conn.rollback()
+        return 0
+
+def delete_expense(conn, expense_id, user_id=None):
+    """
+    Deletes an expense by its ID. With `user_id`, only if the
+    expense belongs to that user.
+    """
+    try:
+        cursor = conn.cursor()
+        query = 'DELETE FROM expenses WHERE id = ?'
+        params = [expense_id]
+
+        if user_id is not None:
+            query += ' AND user_id = ?'
+            params.append(user_id)
+
+        cursor.execute(query, params)
+        conn.commit()
+    except sqlite3.Error as e:
+        logger.error(f"Error deleting expense: {e}")
+        conn.rollback()
+
+def update_expense(conn, expense_id, new_amount, new_description, user_id=None):
+    """
+    Updates the amount and description of an existing expense.
+    With `user_id`, only if the expense belongs to that user.
+    """
+    try:
+        cursor = conn.cursor()
+        query = 'UPDATE expenses SET amount = ?, description = ? WHERE id = ?'
+        params = [new_amount, new_description, expense_id]
+
+        if user_id is not None:
+            query += ' AND user_id = ?'
+            params.append(user_id)
+
+        cursor.execute(query, params)
+        conn.commit()
+    except sqlite3.Error as e:
+        logger.error(f"Error updating expense: {e}")
+        conn.rollback()
+
+def update_expense_category(conn, expense_id, category, user_id=None):
+    """
+    Updates the category of an existing expense.
+    With `user_id`, only if the expense belongs to that user.
+    """
+    try:
+        cursor = conn.cursor()
+        query = 'UPDATE expenses SET category = ? WHERE id = ?'
+        params = [category, expense_id]
+
+        if user_id is not None:
+            query += ' AND user_id = ?'
+            params.append(user_id)
+
+        cursor.execute(query, params)
         conn.commit()
     except sqlite3.Error as e:
-        print(f"Error updating expense category: {e}")
+        logger.error(f"Error updating expense category: {e}")
         conn.rollback()
 
 def get_expenses_by_user(conn, user_id):
@@ -133,7 +385,7 @@ def get_expenses_by_user(conn, user_id):
         ''', (user_id,))
         return cursor.fetchall()
     except sqlite3.Error as e:
-        print(f"Error retrieving expenses: {e}")
+        logger.error(f"Error retrieving expenses: {e}")
         return []
 
 def get_expenses_by_category(conn, user_id, category, start_date=None, end_date=None):
@@ -150,7 +402,7 @@ def get_expenses_by_category(conn, user_id, category, start_date=None, end_date=
         cursor.execute(query, params)
         return cursor.fetchall()
     except sqlite3.Error as e:
-        print(f"Error retrieving expenses by category: {e}")
+        logger.error(f"Error retrieving expenses by category: {e}")
         return []
 
 def list_expenses(conn, user_id):
@@ -162,7 +414,133 @@ def list_expenses(conn, user_id):
         ''', (user_id,))
         return cursor.fetchall()
     except sqlite3.Error as e:
-        print(f"Error listing expenses: {e}")
+        logger.error(f"Error listing expenses: {e}")
+        return []
+
+def list_expenses_page(conn, user_id, limit, before=None):
+    """
+    Lists up to `limit` expenses for a user, newest first, using keyset pagination.
+    `before` is the (date_added, id) key of the last expense of the previous page.
+    """
+    try:
+        cursor = conn.cursor()
+        if before is None:
+            cursor.execute('''
+                SELECT * FROM expenses
+                WHERE user_id = ?
+                ORDER BY date_added DESC, id DESC
+                LIMIT ?
+            ''', (user_id, limit))
+        else:
+            cursor.execute('''
+                SELECT * FROM expenses
+                WHERE user_id = ? AND (date_added, id) < (?, ?)
+                ORDER BY date_added DESC, id DESC
+                LIMIT ?
+            ''', (user_id, before[0], before[1], limit))
+        return cursor.fetchall()
+    except sqlite3.Error as e:
+        logger.error(f"Error listing expenses page: {e}")
+        return []
+
+def page_key(expense):
+    """Returns the (date_added, id) keyset cursor of an expense row."""
+    return (expense[5], expense[0])
+
+def iter_expense_pages(conn, user_id, page_size):
+    """
+    Yields a user's expenses page by page, newest first, querying one page at a time.
+    """
+    before = None
+    while True:
+        page = list_expenses_page(conn, user_id, page_size, before)
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        before = page_key(page[-1])
+
+def iter_expenses(conn, user_id, chunk_size=1000):
+    """
+    Yields all of a user's expenses in chunks of up to `chunk_size` rows, oldest first,
+    from a single cursor, so only one chunk is held in memory at a time.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT id, amount, description, category, date_added
+        FROM expenses
+        WHERE user_id = ?
+        ORDER BY date_added, id
+    ''', (user_id,))
+    try:
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield rows
+    finally:
+        cursor.close()
+
+def generate_expense_report(conn, user_id, start_date, end_date):
+    """
+    Totals a user's expenses per category between two dates (inclusive) in one GROUP BY
+    query. Returns (category, total_spent, count) rows, largest total first.
+    """
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT category, SUM(amount), COUNT(*)
+            FROM expenses
+            WHERE user_id = ? AND date_added >= ? AND date_added < date(?, '+1 day')
+            GROUP BY category
+            ORDER BY SUM(amount) DESC
+        ''', (user_id, start_date, end_date))
+        return cursor.fetchall()
+    except sqlite3.Error as e:
+        logger.error(f"Error generating expense report: {e}")
+        return []
+
+def get_expense_series(conn, user_id, start_date=None):
+    """
+    Returns (day, amount, category) rows of a user's expenses since `start_date`, for
+    analytics. `day` counts days since 1970-01-01 so rows load into arrays without
+    parsing dates; a missing category is returned as ''.
+    """
+    try:
+        cursor = conn.cursor()
+        query = '''
+            SELECT CAST(julianday(date_added) - 2440587.5 AS INTEGER), amount,
+                   COALESCE(category, '')
+            FROM expenses
+            WHERE user_id = ?
+        '''
+        params = [user_id]
+        if start_date:
+            query += " AND date_added >= ?"
+            params.append(start_date)
+        cursor.execute(query, params)
+        return cursor.fetchall()
+    except sqlite3.Error as e:
+        logger.error(f"Error retrieving expense series: {e}")
+        return []
+
+def get_categorized_descriptions(conn, user_id, limit):
+    """
+    Returns the (description, category) pairs of a user's `limit` most recent expenses
+    that have a category, newest first, to learn how the user categorizes expenses.
+    """
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT description, category FROM expenses
+            WHERE user_id = ? AND category IS NOT NULL
+            ORDER BY date_added DESC
+            LIMIT ?
+        ''', (user_id, limit))
+        return cursor.fetchall()
+    except sqlite3.Error as e:
+        logger.error(f"Error retrieving categorized descriptions: {e}")
         return []
 
 def insert_budget(conn, user_id, category, limit, period, start_date, end_date):
@@ -175,7 +553,7 @@ def insert_budget(conn, user_id, category, limit, period, start_date, end_date):
         ''', (user_id, category, limit, period, start_date, end_date))
         conn.commit()
     except sqlite3.Error as e:
-        print(f"Error inserting budget: {e}")
+        logger.error(f"Error inserting budget: {e}")
         conn.rollback()
 
 def get_budget_by_category(conn, user_id, category):
@@ -187,7 +565,7 @@ def get_budget_by_category(conn, user_id, category):
         ''', (user_id, category))
         return cursor.fetchone()
     except sqlite3.Error as e:
-        print(f"Error retrieving budget: {e}")
+        logger.error(f"Error retrieving budget: {e}")
         return None
 
 def update_budget(conn, budget_id, new_limit):
@@ -201,5 +579,157 @@ def update_budget(conn, budget_id, new_limit):
         ''', (new_limit, budget_id))
         conn.commit()
     except sqlite3.Error as e:
-        print(f"Error updating budget: {e}")
+        logger.error(f"Error updating budget: {e}")
         conn.rollback()
+
+def get_total_expenses(conn, user_id, category, start_date=None, end_date=None):
+    """
+    Returns the total spent by a user in a category. Without dates every period is
+    read from the running totals; between two dates (both days included) the whole
+    months come from the running totals and the partial first and last months from
+    the raw expenses.
+    """
+    try:
+        cursor = conn.cursor()
+        if start_date and end_date:
+            cursor.execute(
+                f"SELECT {_PERIOD_BOUNDS.format(start=':start', end=':end')}",
+                {"start": start_date, "end": end_date},
+            )
+            s, e, fs, le = cursor.fetchone()
+            spent = _SPENT_IN_PERIOD.format(
+                user=":user", category=":category", s=":s", e=":e", fs=":fs", le=":le",
+            )
+            cursor.execute(
+                f"SELECT {spent}",
+                {
+                    "user": user_id,
+                    "category": category,
+                    "s": s,
+                    "e": e,
+                    "fs": fs,
+                    "le": le,
+                },
+            )
+        else:
+            cursor.execute(
+                'SELECT COALESCE(SUM(total), 0) FROM expense_totals WHERE user_id = ? '
+                'AND category = ?',
+                (user_id, category or ''),
+            )
+        return cursor.fetchone()[0]
+    except sqlite3.Error as e:
+        logger.error(f"Error retrieving total expenses: {e}")
+        return 0
+
+def check_budget_status(conn, user_id, category):
+    """
+    Compares what a user spent in a category during the budget's period against its
+    limit. Returns a dict with 'category', 'total_spent', 'budget' and 'exceeded', or
+    None if no budget is set.
+    """
+    budget = get_budget_by_category(conn, user_id, category)
+    if budget is None:
+        return None
+    total_spent = get_total_expenses(conn, user_id, category, budget[5], budget[6])
+    return {
+        "category": category,
+        "total_spent": total_spent,
+        "budget": budget[3],
+        "exceeded": total_spent > budget[3],
+    }
+
+def rebuild_expense_totals(conn):
+    """Recomputes every running total from the raw expenses in a single transaction."""
+    try:
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM expense_totals')
+        cursor.execute(f'''
+            INSERT INTO expense_totals (user_id, category, period_bucket, total, count)
+            {_AGGREGATE_EXPENSES}
+        ''')
+        conn.commit()
+    except sqlite3.Error as e:
+        logger.error(f"Error rebuilding expense totals: {e}")
+        conn.rollback()
+
+def find_expense_totals_drift(conn, tolerance=1e-6):
+    """
+    Compares the running totals with totals recomputed from the raw expenses.
+    Returns a list of (user_id, category, period_bucket, stored_total, actual_total,
+    stored_count, actual_count) for every bucket that drifted.
+    """
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            WITH actual AS ({_AGGREGATE_EXPENSES}),
+            keys AS (
+                SELECT user_id, category, period_bucket FROM actual
+                UNION
+                SELECT user_id, category, period_bucket FROM expense_totals
+            )
+            SELECT k.user_id, k.category, k.period_bucket,
+                   COALESCE(s.total, 0), COALESCE(a.total, 0),
+                   COALESCE(s.count, 0), COALESCE(a.count, 0)
+            FROM keys k
+            LEFT JOIN expense_totals s
+              ON s.user_id = k.user_id AND s.category = k.category
+             AND s.period_bucket = k.period_bucket
+            LEFT JOIN actual a
+              ON a.user_id = k.user_id AND a.category = k.category
+             AND a.period_bucket = k.period_bucket
+            WHERE ABS(COALESCE(s.total, 0) - COALESCE(a.total, 0)) > ?
+               OR COALESCE(s.count, 0) != COALESCE(a.count, 0)
+        ''', (tolerance,))
+        return cursor.fetchall()
+    except sqlite3.Error as e:
+        logger.error(f"Error checking expense totals: {e}")
+        return []
+
+def check_user_budgets(conn, user_id, active_on=None):
+    """
+    Compares every budget of a user against what they spent during its period in one
+    query, counting whole months from the running totals and partial months from the
+    raw expenses. With `active_on` (YYYY-MM-DD), only budgets whose period contains that
+    date are checked. Returns a list of dicts with 'budget_id', 'category',
+    'total_spent', 'budget', 'start_date', 'end_date' and 'exceeded'.
+    """
+    try:
+        cursor = conn.cursor()
+        bounds = _PERIOD_BOUNDS.format(start="start_date", end="end_date")
+        spent = _SPENT_IN_PERIOD.format(
+            user=":user", category="b.category", s="b.s", e="b.e", fs="b.fs", le="b.le"
+        )
+        query = f'''
+            WITH b AS (
+                SELECT id, category, "limit", start_date, end_date, {bounds}
+                FROM budgets
+                WHERE user_id = :user
+                  AND (:active_on IS NULL
+                       OR (date(start_date) <= date(:active_on)
+                           AND date(end_date) >= date(:active_on)))
+            )
+            SELECT b.id, b.category, b."limit", b.start_date, b.end_date, {spent}
+            FROM b
+        '''
+        cursor.execute(query, {"user": user_id, "active_on": active_on})
+        return [
+            {
+                "budget_id": budget_id,
+                "category": category,
+                "total_spent": total_spent,
+                "budget": limit,
+                "start_date": start_date,
+                "end_date": end_date,
+                "exceeded": total_spent > limit,
+            }
+            for (
+                budget_id, category, limit, start_date, end_date, total_spent
+            ) in cursor.fetchall()
+        ]
+    except sqlite3.Error as e:
+        logger.error(f"Error checking user budgets: {e}")
+        return []
+
+# Time every helper above: each call is recorded in the db.<name> latency histogram.
+instrument_functions(globals(), __name__)
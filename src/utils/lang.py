@@ -1,4 +1,16 @@
 # lang.py
+import json
+import logging
+import os
+import string
+
+logger = logging.getLogger(__name__)
+
+# Directory searched for extra languages, one '<language>.json' file per language
+LOCALES_DIR = os.path.join(os.path.dirname(__file__), '..', 'locales')
+
+# Language used when a language or a message is missing
+DEFAULT_LANGUAGE = "en"
 
 # Translation dictionary for supported languages
 translations = {
@@ -15,7 +27,68 @@ translations = {
         "no_report_data": "No expenses found for the given period.",
         "budget_exceeded": "You have exceeded your budget for {category}! Total spent: {total_spent}, Budget: {budget}.",
         "within_budget": "You are within your budget for {category}. Total spent: {total_spent}, Budget: {budget}.",
-        "no_budget_set": "No budget set for this category."
+        "no_budget_set": "No budget set for this category.",
+        "page_footer": "Page {page}",
+        "report_total": "Total: {total_spent}",
+        "uncategorized": "Uncategorized",
+        "invalid_date": "Invalid date '{value}'. Please use the YYYY-MM-DD format.",
+        "import_no_attachment": (
+            "Please attach a .csv or .jsonl file with amount, description, category "
+            "and date columns."
+        ),
+        "import_unsupported_format": (
+            "Unsupported file '{filename}'. Please attach a .csv or .jsonl file."
+        ),
+        "import_already_running": (
+            "An import of yours is already running. Please wait until it finishes."
+        ),
+        "import_started": "Importing {filename}...",
+        "import_progress": (
+            "Importing {filename}: {imported} expenses imported, {invalid} invalid "
+            "rows skipped..."
+        ),
+        "import_finished": (
+            "Imported {imported} expenses from {filename}. {invalid} invalid rows were "
+            "skipped."
+        ),
+        "import_invalid_row": "Line {line}: {error}",
+        "import_failed": (
+            "The import of {filename} stopped after {imported} expenses: {error}"
+        ),
+        "export_ready": "Exported {count} expenses.",
+        "export_unsupported_format": (
+            "Unsupported format '{file_format}'. Available formats: {formats}."
+        ),
+        "export_too_large": (
+            "The export is {size} MB, above the {limit} MB upload limit."
+        ),
+        "forecast_header": (
+            "Spending forecast up to {end_date}, from the trend of the last {days} "
+            "days:"
+        ),
+        "forecast_category": (
+            "- {category}: {spent} spent this month, projected {projected} ({trend} "
+            "per day)"
+        ),
+        "forecast_over_budget": (
+            "  Projected to exceed the budget of {budget} for this month!"
+        ),
+        "forecast_total": (
+            "Total: {spent} spent this month, projected {projected}. Next {days} days: "
+            "{upcoming}"
+        ),
+        "possible_duplicate": (
+            "This looks like a duplicate of expense {previous_id}, logged {minutes} "
+            "minutes ago. Use !delete_expense {id} if it was a mistake."
+        ),
+        "unusual_amount": (
+            "This is much more than you usually spend on {category} (about {usual})."
+        ),
+        "category_suggested": "Filed under {category}.",
+        "report_summary": (
+            "Summary: {total} spent over {count} expenses, {average} on average. "
+            "{category} took the largest share ({share}% of the total)."
+        ),
     },
     "es": {
         "expense_logged": "Gasto registrado con ID {id}: {amount} por {description}.",
@@ -30,14 +103,280 @@ translations = {
         "no_report_data": "No se encontraron gastos para el periodo dado.",
         "budget_exceeded": "Has excedido tu presupuesto para {category}! Total gastado: {total_spent}, Presupuesto: {budget}.",
         "within_budget": "Estás dentro de tu presupuesto para {category}. Total gastado: {total_spent}, Presupuesto: {budget}.",
-        "no_budget_set": "No se ha establecido un presupuesto para esta categoría."
-    }
+        "no_budget_set": "No se ha establecido un presupuesto para esta categoría.",
+        "page_footer": "Página {page}",
+        "report_total": "Total: {total_spent}",
+        "uncategorized": "Sin categoría",
+        "invalid_date": (
+            "Fecha inválida '{value}'. Por favor usa el formato AAAA-MM-DD."
+        ),
+        "import_no_attachment": (
+            "Por favor adjunta un archivo .csv o .jsonl con columnas de monto, "
+            "descripción, categoría y fecha."
+        ),
+        "import_unsupported_format": (
+            "Archivo '{filename}' no soportado. Por favor adjunta un archivo .csv o "
+            ".jsonl."
+        ),
+        "import_already_running": (
+            "Ya tienes una importación en curso. Por favor espera a que termine."
+        ),
+        "import_started": "Importando {filename}...",
+        "import_progress": (
+            "Importando {filename}: {imported} gastos importados, {invalid} filas "
+            "inválidas omitidas..."
+        ),
+        "import_finished": (
+            "Se importaron {imported} gastos desde {filename}. Se omitieron {invalid} "
+            "filas inválidas."
+        ),
+        "import_invalid_row": "Línea {line}: {error}",
+        "import_failed": (
+            "La importación de {filename} se detuvo tras {imported} gastos: {error}"
+        ),
+        "export_ready": "Se exportaron {count} gastos.",
+        "export_unsupported_format": (
+            "Formato '{file_format}' no soportado. Formatos disponibles: {formats}."
+        ),
+        "export_too_large": (
+            "La exportación ocupa {size} MB, por encima del límite de subida de "
+            "{limit} MB."
+        ),
+        "forecast_header": (
+            "Pronóstico de gastos hasta {end_date}, según la tendencia de los últimos "
+            "{days} días:"
+        ),
+        "forecast_category": (
+            "- {category}: {spent} gastado este mes, proyectado {projected} ({trend} "
+            "por día)"
+        ),
+        "forecast_over_budget": (
+            "  ¡Se proyecta superar el presupuesto de {budget} para este mes!"
+        ),
+        "forecast_total": (
+            "Total: {spent} gastado este mes, proyectado {projected}. Próximos {days} "
+            "días: {upcoming}"
+        ),
+        "possible_duplicate": (
+            "Parece un duplicado del gasto {previous_id}, registrado hace {minutes} "
+            "minutos. Usa !delete_expense {id} si fue un error."
+        ),
+        "unusual_amount": (
+            "Es mucho más de lo que sueles gastar en {category} (alrededor de {usual})."
+        ),
+        "category_suggested": "Clasificado en {category}.",
+        "report_summary": (
+            "Resumen: {total} gastado en {count} gastos, {average} en promedio. "
+            "{category} se llevó la mayor parte ({share}% del total)."
+        ),
+    },
+}
+
+
+# Vocabulary of the natural-language expense parser (see nlu.ExpenseParser), per
+# language: words that start an expense message, the decimal separator of amounts,
+# words that may introduce the description, relative dates (days ago), currency symbols
+# and words (left out of the description) and keywords that imply a category
+parser_keywords = {
+    "en": {
+        "decimal_separator": ".",
+        "triggers": ["spent", "i spent", "paid", "i paid", "bought", "i bought"],
+        "prepositions": ["on", "for", "at", "in"],
+        "dates": {
+            "today": 0,
+            "yesterday": 1,
+            "day before yesterday": 2,
+            "the day before yesterday": 2,
+        },
+        "currencies": [
+            "$", "usd", "dollar", "dollars", "bucks",
+            "€", "eur", "euro", "euros",
+            "£", "gbp", "pound", "pounds",
+        ],
+        "categories": {
+            "breakfast": "Food",
+            "lunch": "Food",
+            "dinner": "Food",
+            "coffee": "Food",
+            "groceries": "Food",
+            "restaurant": "Food",
+            "supermarket": "Food",
+            "taxi": "Transport",
+            "uber": "Transport",
+            "bus": "Transport",
+            "train": "Transport",
+            "subway": "Transport",
+            "gas": "Transport",
+            "fuel": "Transport",
+            "parking": "Transport",
+            "rent": "Housing",
+            "electricity": "Utilities",
+            "water bill": "Utilities",
+            "internet": "Utilities",
+            "phone bill": "Utilities",
+            "movie": "Entertainment",
+            "movies": "Entertainment",
+            "cinema": "Entertainment",
+            "concert": "Entertainment",
+            "doctor": "Health",
+            "pharmacy": "Health",
+            "medicine": "Health",
+            "gym": "Health",
+        },
+    },
+    "es": {
+        "decimal_separator": ",",
+        "triggers": ["gasté", "me gasté", "pagué", "compré"],
+        "prepositions": ["en", "por", "de", "para"],
+        "dates": {"hoy": 0, "ayer": 1, "anteayer": 2, "antier": 2, "antes de ayer": 2},
+        "currencies": ["$", "pesos", "usd", "dólares", "€", "eur", "euros"],
+        "categories": {
+            "desayuno": "Comida",
+            "almuerzo": "Comida",
+            "cena": "Comida",
+            "café": "Comida",
+            "mercado": "Comida",
+            "restaurante": "Comida",
+            "supermercado": "Comida",
+            "taxi": "Transporte",
+            "uber": "Transporte",
+            "bus": "Transporte",
+            "metro": "Transporte",
+            "gasolina": "Transporte",
+            "parqueadero": "Transporte",
+            "arriendo": "Vivienda",
+            "alquiler": "Vivienda",
+            "luz": "Servicios",
+            "recibo del agua": "Servicios",
+            "internet": "Servicios",
+            "celular": "Servicios",
+            "cine": "Entretenimiento",
+            "concierto": "Entretenimiento",
+            "médico": "Salud",
+            "farmacia": "Salud",
+            "medicina": "Salud",
+            "gimnasio": "Salud",
+        },
+    },
 }
 
+
+def compile_template(template):
+    """
+    Compiles a message template once and returns a function rendering it from a
+    mapping, together with the set of its placeholders. Templates without format
+    specs or conversions become printf-style templates, which render without parsing
+    the braces again; the others keep str.format_map. Placeholders must be names.
+    """
+    fields = set()
+    simple = True
+    parts = []
+    for literal, field, spec, conversion in string.Formatter().parse(template):
+        parts.append(literal.replace("%", "%%"))
+        if field is None:
+            continue
+        if not field.isidentifier():
+            raise ValueError(f"Placeholder {{{field}}} in {template!r} must be a name")
+        fields.add(field)
+        simple = simple and not spec and not conversion
+        parts.append(f"%({field})s")
+    if simple:
+        return "".join(parts).__mod__, fields
+    return template.format_map, fields
+
+
+class Catalog:
+    """
+    Compiled translations. The built-in languages and the other languages found as
+    '<language>.json' files in `locales_dir` are compiled and validated when the catalog
+    is created, so translating never touches the file system; a file that fails to load
+    is logged and skipped. Every template of a language must use the same placeholders
+    as the default language, messages a language lacks fall back to the default
+    language, and so do unknown languages.
+    """
+
+    def __init__(
+        self, builtin, locales_dir=LOCALES_DIR, default_language=DEFAULT_LANGUAGE
+    ):
+        self.locales_dir = locales_dir
+        self.default_language = default_language
+        self._fields = {}
+        self._languages = {}
+        self.add_language(default_language, builtin[default_language])
+        for language, templates in builtin.items():
+            if language != default_language:
+                self.add_language(language, templates)
+        self.load_locales()
+
+    def add_language(self, language, templates):
+        """
+        Compiles and validates the templates of a language. Raises
+        ValueError if one is invalid.
+        """
+        compiled = {}
+        for key, template in templates.items():
+            render, fields = compile_template(template)
+            if language == self.default_language:
+                self._fields[key] = fields
+            elif key not in self._fields:
+                raise ValueError(f"Unknown message '{key}' in language '{language}'")
+            elif fields != self._fields[key]:
+                raise ValueError(
+                    f"Message '{key}' in language '{language}' uses {sorted(fields)}, "
+                    f"expected {sorted(self._fields[key])}"
+                )
+            compiled[key] = render
+        if language != self.default_language:
+            compiled = {**self._languages[self.default_language], **compiled}
+        self._languages[language] = compiled
+
+    def load_language(self, language):
+        """
+        Loads a language from its file in `locales_dir`. Returns False
+        if there is no such file.
+        """
+        if not language.isidentifier():
+            return False
+        path = os.path.join(self.locales_dir, f"{language}.json")
+        if not os.path.exists(path):
+            return False
+        with open(path, encoding="utf-8") as locale_file:
+            self.add_language(language, json.load(locale_file))
+        return True
+
+    def load_locales(self):
+        """
+        Loads every language of `locales_dir` that is not built in, logging the files
+        that fail to load.
+        """
+        if not os.path.isdir(self.locales_dir):
+            return
+        for name in sorted(os.listdir(self.locales_dir)):
+            language = name[:-5]
+            if not name.endswith(".json") or language in self._languages:
+                continue
+            try:
+                self.load_language(language)
+            except (OSError, ValueError) as e:
+                logger.error(f"Could not load language '{language}': {e}")
+
+    def available_languages(self):
+        """Returns the loaded languages, sorted."""
+        return sorted(self._languages)
+
+    def translate(self, message_key, language=DEFAULT_LANGUAGE, **kwargs):
+        """
+        Returns the message in the given language, or an empty
+        string for an unknown message.
+        """
+        templates = self._languages.get(language)
+        if templates is None:
+            templates = self._languages[self.default_language]
+        render = templates.get(message_key)
+        return render(kwargs) if render is not None else ""
+
+
+catalog = Catalog(translations)
+
 # Function to retrieve the translated message
-def translate(message_key, language="en", **kwargs):
-    print(f"Translating '{message_key}' to '{language}' with values {kwargs}")
-    if language not in translations:
-        language = "en"
-    message_template = translations[language].get(message_key, "")
-    return message_template.format(**kwargs)
+translate = catalog.translate
@@ -0,0 +1,170 @@
+# logging_config.py
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime, timezone
+
+# Default level of every logger without a level of its own
+DEFAULT_LEVEL = "INFO"
+
+# Output formats: human-readable lines, or one JSON object per line
+FORMATS = ("text", "json")
+
+LEVELS = ("CRITICAL", "ERROR", "WARNING", "INFO", "DEBUG")
+
+# Attributes every LogRecord has; anything else was passed with
+# `extra=` and is structured data
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message",
+    "asctime",
+    "taskName",
+}
+
+_listener = None
+_queue_handler = None
+
+
+def record_fields(record):
+    """
+    Returns the structured fields of a record, such as command, user_id or latency_ms.
+    """
+    return {
+        key: value
+        for key, value in vars(record).items()
+        if key not in _RECORD_ATTRIBUTES
+    }
+
+
+def command_fields(ctx):
+    """
+    Returns the structured fields identifying a command invocation:
+    its name and the user's ID.
+    """
+    return {
+        "command": ctx.command.qualified_name if ctx.command else None,
+        "user_id": ctx.author.id,
+    }
+
+
+class TextFormatter(logging.Formatter):
+    """Formats records as 'time LEVEL logger: message key=value ...'."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = record_fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line, with their structured fields as keys.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(record_fields(record))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def parse_levels(value):
+    """
+    Parses per-logger levels written as 'logger=LEVEL,logger=LEVEL', e.g.
+    'src.utils.db=DEBUG,discord=WARNING'. Raises ValueError if one is invalid.
+    """
+    levels = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, separator, level = item.partition("=")
+        level = level.strip().upper()
+        if not separator or not name.strip() or level not in LEVELS:
+            raise ValueError(
+                f"Invalid logger level {item!r}, expected logger=LEVEL with LEVEL one "
+                f"of {LEVELS}"
+            )
+        levels[name.strip()] = level
+    return levels
+
+
+def setup_logging(
+    level=DEFAULT_LEVEL, log_format="text", file=None, levels=None, stream=None
+):
+    """
+    Routes every log record through a queue, so that formatting and output happen on a
+    background thread instead of the event loop.
+
+    The root logger gets a single QueueHandler; a QueueListener thread formats the
+    records (as text or JSON lines) and writes them to `stream` (stderr by default) and,
+    if given, to a rotating `file`. `levels` maps logger names to their own level.
+    Calling it again replaces the previous setup. Returns the listener.
+    """
+    shutdown_logging()
+    formatter = JsonFormatter() if log_format == "json" else TextFormatter()
+    handlers = [logging.StreamHandler(stream or sys.stderr)]
+    if file:
+        handlers.append(logging.handlers.RotatingFileHandler(
+            file, maxBytes=10 * 1024 * 1024, backupCount=5, encoding="utf-8",
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    global _listener, _queue_handler
+    records = queue.SimpleQueue()
+    _queue_handler = logging.handlers.QueueHandler(records)
+    _listener = logging.handlers.QueueListener(
+        records, *handlers, respect_handler_level=True
+    )
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(_queue_handler)
+    for name, logger_level in (levels or {}).items():
+        logging.getLogger(name).setLevel(logger_level)
+    _listener.start()
+    return _listener
+
+
+def setup_logging_from_config(options):
+    """
+    Sets up logging from the `logging` section of the configuration (a LoggingConfig).
+    """
+    return setup_logging(
+        level=options.level.upper(),
+        log_format=options.format,
+        file=options.file or None,
+        levels=parse_levels(options.levels),
+    )
+
+
+def shutdown_logging():
+    """
+    Writes out the queued records, stops the listener thread and
+    removes the queue handler.
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,331 @@
+# metrics.py
+import contextvars
+import functools
+import inspect
+import logging
+import time
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+# Precision of the latency histograms: 2**-(SUB_BUCKET_BITS - 1), about 1.6%
+SUB_BUCKET_BITS = 7
+
+# Default address of the Prometheus endpoint: local connections only
+DEFAULT_PROMETHEUS_HOST = "127.0.0.1"
+
+# Quantiles reported by !stats and the Prometheus endpoint
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Seconds spent awaiting the database by the command running in the current task
+_db_time = contextvars.ContextVar("db_time", default=None)
+
+
+class Histogram:
+    """
+    A latency histogram with HdrHistogram-style log-linear buckets.
+
+    Values are recorded in whole microseconds. Below 2**SUB_BUCKET_BITS microseconds
+    every value has its own bucket; above, each power of two is split into
+    2**(SUB_BUCKET_BITS - 1) buckets, so any quantile is within about 1.6% of the true
+    value while recording stays a few integer operations and memory stays bounded
+    whatever the range of latencies.
+    """
+
+    __slots__ = ("sub_bits", "sub_count", "counts", "count", "total", "max")
+
+    def __init__(self, sub_bucket_bits=SUB_BUCKET_BITS):
+        self.sub_bits = sub_bucket_bits
+        self.sub_count = 1 << sub_bucket_bits
+        self.counts = defaultdict(int)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        micros = int(seconds * 1_000_000)
+        if micros < self.sub_count:
+            index = max(micros, 0)
+        else:
+            shift = micros.bit_length() - self.sub_bits
+            half = self.sub_count >> 1
+            index = self.sub_count + (shift - 1) * half + (micros >> shift) - half
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def _bucket_value(self, index):
+        """Returns the middle of a bucket, in seconds."""
+        if index < self.sub_count:
+            return index / 1_000_000
+        half = self.sub_count >> 1
+        shift, offset = divmod(index - self.sub_count, half)
+        shift += 1
+        low = (half + offset) << shift
+        return (low + (1 << shift) / 2) / 1_000_000
+
+    def quantiles(self, quantiles=QUANTILES):
+        """Returns the value at each quantile, in seconds (0 for an empty histogram)."""
+        values = [0.0] * len(quantiles)
+        if not self.count:
+            return values
+        # The rank of each quantile among the recorded values, smallest first
+        ranks = sorted(
+            (max(1, round(q * self.count)), position)
+            for position, q in enumerate(quantiles)
+        )
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            while ranks and seen >= ranks[0][0]:
+                values[ranks.pop(0)[1]] = min(self._bucket_value(index), self.max)
+            if not ranks:
+                break
+        return values
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+
+class Metrics:
+    """
+    In-memory metrics of the bot: latency histograms and event counters by name, and the
+    LRU caches whose hit rates are reported. Caches are only read when a snapshot is
+    taken, so they cost nothing on the hot path. Updates take no lock: the reader
+    threads may rarely lose a count to a race, which monitoring can live with.
+    """
+
+    def __init__(self):
+        self.histograms = defaultdict(Histogram)
+        self.counters = defaultdict(int)
+        self.caches = {}
+
+    def observe(self, name, seconds):
+        self.histograms[name].record(seconds)
+
+    def increment(self, name, value=1):
+        self.counters[name] += value
+
+    def register_cache(self, name, cache):
+        """
+        Reports the hit rate of an LRUCache (or anything with
+        hits, misses and a length).
+        """
+        self.caches[name] = cache
+
+    def reset(self):
+        self.histograms.clear()
+        self.counters.clear()
+
+    def snapshot(self, quantiles=QUANTILES):
+        """
+        Returns the current metrics as plain data: {"latencies": {name: {"count",
+        "mean", "max", "quantiles"}}, "counters": {name: value}, "caches": {name:
+        {"hits", "misses", "hit_rate", "size"}}}, with times in seconds.
+        """
+        return {
+            "latencies": {
+                name: {
+                    "count": histogram.count,
+                    "mean": histogram.mean,
+                    "max": histogram.max,
+                    "total": histogram.total,
+                    "quantiles": dict(zip(quantiles, histogram.quantiles(quantiles))),
+                }
+                for name, histogram in sorted(self.histograms.items())
+            },
+            "counters": dict(sorted(self.counters.items())),
+            "caches": {
+                name: {
+                    "hits": cache.hits,
+                    "misses": cache.misses,
+                    "hit_rate": (
+                        cache.hits / (cache.hits + cache.misses)
+                        if cache.hits + cache.misses
+                        else 0.0
+                    ),
+                    "size": len(cache),
+                }
+                for name, cache in sorted(self.caches.items())
+            },
+        }
+
+
+# The metrics of the process, shared by the database layer, the command hooks and !stats
+registry = Metrics()
+
+
+def timed(fn, name=None, metrics=registry):
+    """
+    Wraps a function so every call is recorded in the `name` histogram (the function's
+    module and name by default). Generator functions are timed over their whole
+    iteration, excluding the time the consumer spends between items.
+    """
+    name = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+    if inspect.isgeneratorfunction(fn):
+        @functools.wraps(fn)
+        def timed_generator(*args, **kwargs):
+            elapsed = 0.0
+            iterator = fn(*args, **kwargs)
+            try:
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                    finally:
+                        elapsed += time.perf_counter() - start
+                    yield item
+            finally:
+                metrics.observe(name, elapsed)
+        return timed_generator
+
+    @functools.wraps(fn)
+    def timed_function(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            metrics.observe(name, time.perf_counter() - start)
+    return timed_function
+
+
+def instrument_functions(namespace, module_name, metrics=registry):
+    """
+    Replaces every public function defined in a module's namespace (its globals()) by a
+    timed wrapper, so calls made through the module, including its own internal calls,
+    are recorded.
+    """
+    for name, fn in list(namespace.items()):
+        if (
+            inspect.isfunction(fn)
+            and fn.__module__ == module_name
+            and not name.startswith("_")
+        ):
+            namespace[name] = timed(fn, metrics=metrics)
+
+
+def start_command():
+    """
+    Starts accumulating the database time of the command running in the current task.
+    """
+    _db_time.set([0.0])
+
+
+def add_db_time(seconds):
+    """
+    Adds time spent awaiting the database to the current command, if one is running.
+    """
+    accumulated = _db_time.get()
+    if accumulated is not None:
+        accumulated[0] += seconds
+
+
+def command_db_time():
+    """Returns the seconds the current command spent awaiting the database so far."""
+    accumulated = _db_time.get()
+    return accumulated[0] if accumulated is not None else 0.0
+
+
+def format_stats(snapshot, limit=None):
+    """Formats a snapshot as fixed-width tables for !stats, times in milliseconds."""
+    lines = [f"{'latency (ms)':<34}{'count':>8}{'p50':>9}{'p95':>9}{'p99':>9}"]
+    latencies = sorted(
+        snapshot["latencies"].items(), key=lambda item: item[1]["total"], reverse=True
+    )
+    for name, stats in latencies[:limit]:
+        p50, p95, p99 = (stats["quantiles"].get(q, 0.0) * 1000 for q in QUANTILES)
+        lines.append(
+            f"{name[:33]:<34}{stats['count']:>8}{p50:>9.2f}{p95:>9.2f}{p99:>9.2f}"
+        )
+    if snapshot["counters"]:
+        lines.append("")
+        lines.extend(
+            f"{name[:33]:<34}{value:>8}" for name, value in snapshot["counters"].items()
+        )
+    if snapshot["caches"]:
+        lines.append("")
+        lines.append(f"{'cache':<34}{'size':>8}{'hit rate':>9}")
+        for name, stats in snapshot["caches"].items():
+            lines.append(f"{name[:33]:<34}{stats['size']:>8}{stats['hit_rate']:>9.1%}")
+    return "\n".join(lines)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text(snapshot, prefix="expense_bot"):
+    """Renders a snapshot in the Prometheus text exposition format."""
+    lines = [
+        f"# HELP {prefix}_latency_seconds Latency of commands and database functions.",
+        f"# TYPE {prefix}_latency_seconds summary",
+    ]
+    for name, stats in snapshot["latencies"].items():
+        label = f'name="{_label(name)}"'
+        for quantile, value in stats["quantiles"].items():
+            lines.append(
+                f'{prefix}_latency_seconds{{{label},quantile="{quantile}"}} {value:.6f}'
+            )
+        lines.append(f"{prefix}_latency_seconds_sum{{{label}}} {stats['total']:.6f}")
+        lines.append(f"{prefix}_latency_seconds_count{{{label}}} {stats['count']}")
+    lines += [
+        f"# HELP {prefix}_events_total Counted events.",
+        f"# TYPE {prefix}_events_total counter",
+    ]
+    for name, value in snapshot["counters"].items():
+        lines.append(f'{prefix}_events_total{{name="{_label(name)}"}} {value}')
+    lines += [f"# HELP {prefix}_cache_hit_ratio Hit rate of the in-memory caches.",
+              f"# TYPE {prefix}_cache_hit_ratio gauge"]
+    for name, stats in snapshot["caches"].items():
+        lines.append(
+            f'{prefix}_cache_hit_ratio{{cache="{_label(name)}"}} '
+            f'{stats["hit_rate"]:.6f}'
+        )
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """
+    Serves the metrics in the Prometheus text format at http://host:port/metrics. It
+    listens on localhost by default; the bot only starts it when
+    `metrics.prometheus_port` is set.
+    """
+
+    def __init__(self, metrics=registry, host=DEFAULT_PROMETHEUS_HOST, port=9464):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._runner = None
+
+    async def handle(self, request):
+        from aiohttp import web
+
+        body = prometheus_text(self.metrics.snapshot())
+        return web.Response(text=body, content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    async def start(self):
+        # aiohttp is only needed here, so importing the metrics
+        # (e.g. from db.py) stays cheap
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # Port 0 lets the OS pick a free port
+        self.port = self._runner.addresses[0][1]
+        logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
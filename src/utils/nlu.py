@@ -0,0 +1,484 @@
+# nlu.py
+import logging
+import re
+import sqlite3
+import unicodedata
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from src.utils import db
+from src.utils.cache import LRUCache
+from src.utils.database import get_database
+from src.utils.lang import parser_keywords
+from src.utils.validation import ValidationError, validate_amount, validate_date
+
+logger = logging.getLogger(__name__)
+
+# Length of the character n-grams indexed
+NGRAM_SIZE = 3
+
+# Entries sharing the most n-grams with a query whose edit distance is computed
+DEFAULT_CANDIDATES = 8
+
+# Smallest similarity (1 - edit distance / length) for a category to be suggested
+SUGGEST_SIMILARITY = 0.75
+
+# Categorized expenses loaded from the database the first time a user is matched
+HISTORY_SEED_SIZE = 1000
+
+# Maximum number of users whose index is kept in memory
+DEFAULT_MATCHER_CACHE_SIZE = 10000
+
+_NON_WORD = re.compile(r"[\W_]+")
+_WORD = re.compile(r"\w+")
+_ISO_DATE = re.compile(r"\b\d{4}-\d{2}-\d{2}\b")
+_EDGE_PUNCTUATION = " \t\n,.;:-"
+
+
+def normalize(text):
+    """Lower-cases text, removes accents and punctuation and collapses spacing."""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def ngrams(text, n=NGRAM_SIZE):
+    """
+    Returns the set of character n-grams of normalized text, padded so word edges count.
+    """
+    padded = f"{' ' * (n - 1)}{text} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def levenshtein(a, b, max_distance=None):
+    """
+    Returns the edit distance (insertions, deletions and substitutions) between
+    two strings. With `max_distance`, only the diagonal band of the table that can
+    stay within it is computed, and max_distance + 1 is returned as soon as the
+    distance is known to exceed it.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if max_distance is None:
+        max_distance = len(a)
+    if len(a) - len(b) > max_distance:
+        return max_distance + 1
+    over = max_distance + 1
+    previous = [j if j <= max_distance else over for j in range(len(b) + 1)]
+    for i, char_a in enumerate(a, 1):
+        low = max(1, i - max_distance)
+        high = min(len(b), i + max_distance)
+        current = [over] * (len(b) + 1)
+        if i <= max_distance:
+            current[0] = i
+        for j in range(low, high + 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != b[j - 1]),
+            )
+        if min(current[low - 1:high + 1]) > max_distance:
+            return over
+        previous = current
+    return min(previous[-1], over)
+
+
+def similarity(a, b, min_similarity=0.0):
+    """
+    Returns 1 - edit distance / length of the longer string, from 0 (unrelated) to 1
+    (equal), or 0 once it is known to be below `min_similarity`.
+    """
+    longest = max(len(a), len(b))
+    if not longest:
+        return 1.0
+    max_distance = int((1 - min_similarity) * longest)
+    distance = levenshtein(a, b, max_distance)
+    return 0.0 if distance > max_distance else 1 - distance / longest
+
+
+class FuzzyIndex:
+    """
+    Finds the strings closest to a query among many, with a
+    character n-gram inverted index.
+
+    Each string is normalized and split into n-grams once, when it is added. A search
+    counts the n-grams every entry shares with the query by concatenating the query's
+    posting lists into one NumPy bincount, and only computes the edit distance of the
+    few entries sharing the most (by Dice coefficient), instead of comparing the query
+    with every string.
+    """
+
+    def __init__(self, n=NGRAM_SIZE):
+        self.n = n
+        self.keys = []
+        self.values = []
+        self.sizes = []
+        self.postings = defaultdict(list)
+        self._entries = {}
+        # Posting lists and sizes as arrays, rebuilt after entries are added
+        self._arrays = {}
+        self._size_array = None
+
+    def add(self, text, value):
+        """
+        Indexes `text`, which maps to `value`; adding the same text
+        again replaces its value.
+        """
+        key = normalize(text)
+        if not key:
+            return
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.values[entry] = value
+            return
+        entry = self._entries[key] = len(self.keys)
+        grams = ngrams(key, self.n)
+        self.keys.append(key)
+        self.values.append(value)
+        self.sizes.append(len(grams))
+        self._size_array = None
+        for gram in grams:
+            self.postings[gram].append(entry)
+            self._arrays.pop(gram, None)
+
+    def _posting(self, gram):
+        array = self._arrays.get(gram)
+        if array is None:
+            array = self._arrays[gram] = np.array(self.postings[gram], dtype=np.intp)
+        return array
+
+    def search(self, text, limit=1, min_similarity=0.0, candidates=DEFAULT_CANDIDATES):
+        """
+        Returns up to `limit` matches, most similar first, as dicts with the indexed
+        text (normalized), its value and its similarity to `text`.
+        """
+        key = normalize(text)
+        if not key:
+            return []
+        entry = self._entries.get(key)
+        if entry is not None and limit == 1:
+            return [{"text": key, "value": self.values[entry], "similarity": 1.0}]
+
+        query_grams = ngrams(key, self.n)
+        grams = [gram for gram in query_grams if gram in self.postings]
+        if not grams:
+            return []
+        if self._size_array is None:
+            self._size_array = np.array(self.sizes, dtype=np.float64)
+        shared = np.bincount(
+            np.concatenate([self._posting(gram) for gram in grams]),
+            minlength=len(self.keys),
+        )
+        dice = 2 * shared / (len(query_grams) + self._size_array)
+        if len(dice) > candidates:
+            best = np.argpartition(dice, -candidates)[-candidates:]
+        else:
+            best = np.arange(len(dice))
+        best = best[np.argsort(-dice[best], kind="stable")]
+
+        # Once `limit` matches are found, later candidates only need to beat the worst
+        # of them, which lets the edit distance give up early
+        matches = []
+        threshold = min_similarity
+        for entry in best.tolist():
+            if not shared[entry]:
+                break
+            score = similarity(key, self.keys[entry], threshold)
+            if score >= threshold and score > 0:
+                matches.append(
+                    {
+                        "text": self.keys[entry],
+                        "value": self.values[entry],
+                        "similarity": score,
+                    }
+                )
+                matches.sort(key=lambda match: match["similarity"], reverse=True)
+                del matches[limit:]
+                if len(matches) == limit:
+                    threshold = max(threshold, matches[-1]["similarity"])
+        return matches
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class UserCategories:
+    """
+    A user's past descriptions, mapped to the category they gave them,
+    and their category names.
+    """
+
+    __slots__ = ("descriptions", "categories")
+
+    def __init__(self):
+        self.descriptions = FuzzyIndex()
+        self.categories = FuzzyIndex()
+
+    def add(self, description, category):
+        self.descriptions.add(description, category)
+        self.categories.add(category, category)
+
+    def suggest(self, description, min_similarity=SUGGEST_SIMILARITY):
+        """
+        Returns the category of the most similar past description, or else a category
+        whose name a word of the description resembles, or None.
+        """
+        matches = self.descriptions.search(description, min_similarity=min_similarity)
+        if matches:
+            return matches[0]["value"]
+        best = None
+        for word in normalize(description).split():
+            if len(word) < NGRAM_SIZE:
+                continue
+            for match in self.categories.search(word, min_similarity=min_similarity):
+                if best is None or match["similarity"] > best["similarity"]:
+                    best = match
+        return best["value"] if best else None
+
+
+class CategoryMatcher:
+    """
+    Suggests a category for new expenses from the way each user
+    categorized earlier ones.
+
+    A user's index is built from their most recent categorized expenses on their first
+    suggestion, kept in a bounded LRU cache, and extended with `learn` as they log more.
+    """
+
+    def __init__(self, database, maxsize=DEFAULT_MATCHER_CACHE_SIZE):
+        self.database = database
+        self.indexes = LRUCache(maxsize)
+
+    async def index(self, user_id, conn=None):
+        """
+        Returns the UserCategories of a user, loading it from the database on first use.
+        """
+        index = self.indexes.get(user_id)
+        if index is not None:
+            return index
+        try:
+            rows = await self.database.read(
+                db.get_categorized_descriptions, user_id, HISTORY_SEED_SIZE, conn=conn
+            )
+        except sqlite3.Error as e:
+            logger.warning(
+                f"Could not load the categorized expenses of user {user_id}: {e}"
+            )
+            rows = []
+        index = self.indexes.get(user_id)
+        if index is None:  # Another suggestion may have loaded it meanwhile
+            index = UserCategories()
+            for description, category in reversed(rows):
+                index.add(description, category)
+            self.indexes.put(user_id, index)
+        return index
+
+    async def suggest(self, user_id, description, conn=None):
+        """Returns the suggested category for a new expense of a user, or None."""
+        return (await self.index(user_id, conn=conn)).suggest(description)
+
+    def learn(self, user_id, description, category):
+        """Adds a categorized expense to the user's index, if it is loaded."""
+        index = self.indexes.get(user_id)
+        if index is not None and category:
+            index.add(description, category)
+
+
+def get_category_matcher(bot):
+    """
+    Returns the CategoryMatcher owned by the bot, creating a default one on first use.
+    """
+    matcher = getattr(bot, "category_matcher", None)
+    if matcher is None:
+        matcher = CategoryMatcher(get_database(bot))
+        bot.category_matcher = matcher
+    return matcher
+
+
+class TokenTrie:
+    """Maps phrases of one or more normalized words to values, matched longest first."""
+
+    _VALUE = object()
+
+    def __init__(self):
+        self.root = {}
+
+    def add(self, phrase, value):
+        node = self.root
+        for token in normalize(phrase).split():
+            node = node.setdefault(token, {})
+        node[self._VALUE] = value
+
+    def match(self, tokens, start):
+        """
+        Returns (end, value) for the longest phrase starting at tokens[start], or None.
+        """
+        node = self.root
+        found = None
+        for end in range(start, len(tokens)):
+            node = node.get(tokens[end])
+            if node is None:
+                break
+            if self._VALUE in node:
+                found = (end + 1, node[self._VALUE])
+        return found
+
+
+def _alternation(phrases):
+    """
+    Returns a regex alternation of phrases, with and without accents, longest first.
+    """
+    variants = {phrase.casefold() for phrase in phrases} | {
+        normalize(phrase) for phrase in phrases
+    }
+    return "|".join(
+        r"\s+".join(map(re.escape, variant.split()))
+        for variant in sorted(variants, key=len, reverse=True)
+    )
+
+
+class LanguageRules:
+    """The compiled parsing rules of one language."""
+
+    def __init__(self, language, keywords):
+        self.language = language
+        symbols = [
+            currency for currency in keywords["currencies"] if not normalize(currency)
+        ]
+        symbol_class = "".join(map(re.escape, symbols)) or "$"
+        self.pattern = re.compile(
+            rf"^\s*(?:{_alternation(keywords['triggers'])})\s+"
+            rf"(?:(?P<symbol>[{symbol_class}])\s*)?(?P<amount>\d+(?:[.,]\d+)*)"
+            rf"(?:\s*(?P<suffix>[{symbol_class}]))?(?P<rest>(?:\s.*)?)$",
+            re.IGNORECASE | re.DOTALL,
+        )
+        self.trie = TokenTrie()
+        for phrase, days in keywords["dates"].items():
+            self.trie.add(phrase, ("date", days))
+        for phrase, category in keywords["categories"].items():
+            self.trie.add(phrase, ("category", category))
+        for phrase in keywords["currencies"]:
+            if phrase not in symbols:
+                self.trie.add(phrase, ("currency", None))
+        self.prepositions = {normalize(word) for word in keywords["prepositions"]}
+        self.decimal_separator = keywords["decimal_separator"]
+        grouping = re.escape(".,".replace(self.decimal_separator, ""))
+        self.thousands = re.compile(rf"\d{{1,3}}(?:{grouping}\d{{3}})+")
+
+    def amount(self, text):
+        """
+        Parses an amount. Without the language's decimal separator, groups of
+        three digits split by the other separator are thousands ('20.000' in
+        Spanish, '1,000' in English); with it, the other separator can only group
+        thousands ('1.234,5' in Spanish).
+        """
+        if self.decimal_separator in text:
+            grouping = ".,".replace(self.decimal_separator, "")
+            whole, _, fraction = text.rpartition(self.decimal_separator)
+            if grouping in whole and not self.thousands.fullmatch(whole):
+                raise ValidationError(f"Invalid amount: {text!r}")
+            text = f"{whole.replace(grouping, '')}.{fraction}"
+        elif self.thousands.fullmatch(text):
+            text = text.replace(".", "").replace(",", "")
+        return validate_amount(text)
+
+
+class ExpenseParser:
+    """
+    Parses expense messages such as "spent 12.50 on lunch
+    yesterday" or "gasté 20 en taxi".
+
+    The rules of every language are compiled once: one regular expression recognizes the
+    opening word, the amount and a currency symbol, and a token trie finds currency
+    words, relative dates and category keywords in the rest of the message in a single
+    pass. Messages that do not start like an expense are rejected by the regular
+    expression alone, so ordinary chat costs one failed match per language.
+    """
+
+    def __init__(self, keywords=parser_keywords):
+        self.rules = [
+            LanguageRules(language, words) for language, words in keywords.items()
+        ]
+
+    def parse(self, text, now=None):
+        """
+        Returns a dict with the amount, description, category (or None), date_added (an
+        SQLite UTC timestamp, or None for now) and language of an expense message, or
+        None if the text is not one. Currency symbols and words next to the amount are
+        left out of the description; expenses have no currency.
+        """
+        for rules in self.rules:
+            match = rules.pattern.match(text)
+            if match is not None:
+                return self._parse_match(rules, match, now)
+        return None
+
+    def _parse_match(self, rules, match, now):
+        try:
+            amount = rules.amount(match["amount"])
+        except ValidationError:
+            return None
+        symbol = match["symbol"] or match["suffix"]
+        rest = match["rest"]
+
+        date_added = None
+        iso_date = _ISO_DATE.search(rest)
+        if iso_date is not None:
+            try:
+                date_added = validate_date(iso_date.group())
+            except ValidationError:
+                return None
+            rest = rest[:iso_date.start()] + rest[iso_date.end():]
+
+        words = list(_WORD.finditer(rest))
+        tokens = [normalize(word.group()) for word in words]
+        removed = []
+        category = None
+        i = 0
+        while i < len(tokens):
+            found = rules.trie.match(tokens, i)
+            if found is None:
+                i += 1
+                continue
+            end, (kind, value) = found
+            if kind == "date":
+                if value:
+                    now = datetime.now(timezone.utc) if now is None else now
+                    date_added = (now - timedelta(days=value)).strftime(
+                        "%Y-%m-%d %H:%M:%S"
+                    )
+                removed.append((words[i].start(), words[end - 1].end()))
+            elif kind == "currency" and i == 0 and symbol is None:
+                # A currency word right after the amount, as in "5 euros of coffee"
+                removed.append((words[i].start(), words[end - 1].end()))
+            elif kind == "category" and category is None:
+                category = value
+            i = end
+
+        for start, end in reversed(removed):
+            rest = rest[:start] + rest[end:]
+        description = " ".join(rest.split()).strip(_EDGE_PUNCTUATION)
+        # Drop prepositions left at either end, as in "on lunch" or "lunch on"
+        words = description.split()
+        while words and normalize(words[0]) in rules.prepositions:
+            words.pop(0)
+        while words and normalize(words[-1]) in rules.prepositions:
+            words.pop()
+        description = " ".join(words).strip(_EDGE_PUNCTUATION)
+        if not description:
+            return None
+        return {
+            "amount": amount,
+            "description": description,
+            "category": category,
+            "date_added": date_added,
+            "language": rules.language,
+        }
+
+
+parser = ExpenseParser()
+
+# Function to parse an expense message
+parse_expense = parser.parse
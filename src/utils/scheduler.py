@@ -0,0 +1,164 @@
+import asyncio
+import logging
+from datetime import date
+
+import discord
+
+from src.utils import db
+from src.utils.lang import translate
+from src.utils.shared import LanguageCache
+
+logger = logging.getLogger(__name__)
+
+# Default number of seconds between two budget checks
+DEFAULT_BUDGET_INTERVAL = 60
+
+
+class Scheduler:
+    """
+    Runs coroutine jobs periodically on the bot's event loop.
+
+    Jobs are registered with `every` and started together with `start`, which is
+    safe to call again (for example from `on_ready` after a reconnect).
+    """
+
+    def __init__(self):
+        self._jobs = {}
+        self._tasks = {}
+
+    def every(self, seconds, job, name=None):
+        """Registers a coroutine function to run every `seconds` seconds."""
+        if seconds <= 0:
+            raise ValueError("The interval must be positive")
+        self._jobs[name or job.__qualname__] = (seconds, job)
+
+    def remove(self, name):
+        """Unregisters a job, cancelling it if it is running."""
+        self._jobs.pop(name, None)
+        task = self._tasks.pop(name, None)
+        if task is not None:
+            task.cancel()
+
+    def start(self):
+        """Starts every registered job that is not already running."""
+        for name, (seconds, job) in self._jobs.items():
+            task = self._tasks.get(name)
+            if task is None or task.done():
+                self._tasks[name] = asyncio.create_task(
+                    self._run(name, seconds, job), name=f"scheduler:{name}"
+                )
+
+    def stop(self):
+        """Cancels every running job."""
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+
+    @property
+    def running(self):
+        return any(not task.done() for task in self._tasks.values())
+
+    async def _run(self, name, seconds, job):
+        """Runs one job forever, logging its failures without stopping the schedule."""
+        while True:
+            await asyncio.sleep(seconds)
+            try:
+                await job()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception(f"Scheduled job {name} failed")
+
+
+class BudgetMonitor:
+    """
+    Warns users by DM when they exceed a budget.
+
+    Only users whose expenses changed since the last pass are checked: the
+    database write path feeds a dirty set, so the cost of a pass depends on
+    recent activity rather than on the size of the budgets table. Each budget
+    is reported once while it stays exceeded; the budgets already reported are
+    kept per user and replaced on every check of that user, so budgets that are
+    back under their limit, have ended or were deleted are forgotten.
+    """
+
+    def __init__(self, bot, database, languages=None, default_language="en"):
+        self.bot = bot
+        self.database = database
+        self.languages = languages or LanguageCache(database)
+        self.default_language = default_language
+        self.dirty = set()
+        self._notified = {}
+        database.add_write_listener(self.mark_dirty)
+
+    def mark_dirty(self, user_id):
+        """Queues a user for the next pass. Registered as a database write listener."""
+        self.dirty.add(user_id)
+
+    def close(self):
+        self.database.remove_write_listener(self.mark_dirty)
+
+    async def run_once(self):
+        """Checks the budgets of every dirty user and sends the pending warnings."""
+        if not self.dirty:
+            return
+        users, self.dirty = self.dirty, set()
+        today = date.today().isoformat()
+
+        def check(conn, user_ids):
+            return {
+                user_id: db.check_user_budgets(conn, user_id, today)
+                for user_id in user_ids
+            }
+
+        # One query pass per shard holding some of the users (a
+        # single one without sharding)
+        try:
+            results = await asyncio.gather(
+                *(
+                    shard.read(check, shard_users)
+                    for shard, shard_users in self.database.partition(users)
+                )
+            )
+        except Exception:
+            # Check them again on the next pass rather than waiting for their next write
+            self.dirty |= users
+            raise
+        for user_id, statuses in (
+            item for result in results for item in result.items()
+        ):
+            notified = self._notified.pop(user_id, set())
+            exceeded = {
+                status["budget_id"] for status in statuses if status["exceeded"]
+            }
+            sent = notified & exceeded
+            try:
+                for status in statuses:
+                    if status["budget_id"] in exceeded - notified:
+                        await self.notify(user_id, status)
+                        sent.add(status["budget_id"])
+            except Exception:
+                # The other users are still warned; this one is checked again on the
+                # next pass, for the warnings not sent yet
+                logger.exception(
+                    f"Could not send the budget warnings of user {user_id}"
+                )
+                self.dirty.add(user_id)
+            if sent:
+                self._notified[user_id] = sent
+
+    async def notify(self, user_id, status):
+        """Sends the budget_exceeded message to a user by DM."""
+        language = await self.languages.get(user_id, self.default_language)
+        message = translate(
+            "budget_exceeded",
+            language,
+            category=status["category"],
+            total_spent=f"{status['total_spent']:.2f}",
+            budget=f"{status['budget']:.2f}",
+        )
+        try:
+            user = self.bot.get_user(user_id) or await self.bot.fetch_user(user_id)
+            await user.send(message)
+        except discord.HTTPException as e:
+            logger.warning(f"Could not send budget warning to user {user_id}: {e}")
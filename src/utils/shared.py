@@ -1,2 +1,96 @@
 # shared.py
-user_language = {}
+import logging
+import sqlite3
+
+from src.utils import db
+from src.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of language preferences kept in memory
+DEFAULT_LANGUAGE_CACHE_SIZE = 10000
+
+# Sentinel distinguishing "not cached" from a user without a preference
+_MISSING = object()
+
+# Longest message Discord accepts
+MAX_MESSAGE_LENGTH = 2000
+
+
+class LanguageCache:
+    """
+    Users' preferred languages, backed by the user_language table.
+
+    A user's preference is read from the database on their first lookup and kept
+    in a bounded LRU cache, so preferences survive restarts without a query per
+    message. Users without a preference are cached too; if their preference cannot be
+    read, the default language is used without caching it, and the next lookup tries
+    the database again. `set` writes through to the database before updating the cache.
+    """
+
+    def __init__(self, database, maxsize=DEFAULT_LANGUAGE_CACHE_SIZE):
+        self.database = database
+        self.entries = LRUCache(maxsize)
+
+    async def get(self, user_id, default=None):
+        """
+        Returns the preferred language of a user, or `default` if they never set one.
+        """
+        language = self.entries.get(user_id, _MISSING)
+        if language is _MISSING:
+            try:
+                language = await self.database.read(db.get_user_language, user_id)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not load the language of user {user_id}: {e}")
+                return default
+            self.entries.put(user_id, language)
+        return language or default
+
+    async def set(self, user_id, language):
+        """Stores the preferred language of a user. Returns True on success."""
+        saved = await self.database.write(db.set_user_language, user_id, language)
+        if saved:
+            self.entries.put(user_id, language)
+        return saved
+
+
+def get_language_cache(bot):
+    """
+    Returns the LanguageCache owned by the bot, creating one over the bot's database
+    (`bot.db`) on first use. Raises RuntimeError if the bot has no database, rather than
+    opening the default file behind the caller's back.
+    """
+    languages = getattr(bot, "languages", None)
+    if languages is None:
+        database = getattr(bot, "db", None)
+        if database is None:
+            raise RuntimeError(
+                "The bot has no database (bot.db) to back its language cache"
+            )
+        languages = LanguageCache(database)
+        bot.languages = languages
+    return languages
+
+
+def split_message(text, limit=MAX_MESSAGE_LENGTH):
+    """
+    Splits a text into messages of at most `limit` characters, between lines where
+    possible, so long reports can be sent as several messages.
+    """
+    messages = []
+    lines = []
+    length = -1
+    for line in text.split("\n"):
+        while len(line) > limit:
+            if lines:
+                messages.append("\n".join(lines))
+                lines, length = [], -1
+            messages.append(line[:limit])
+            line = line[limit:]
+        if lines and length + 1 + len(line) > limit:
+            messages.append("\n".join(lines))
+            lines, length = [], -1
+        lines.append(line)
+        length += 1 + len(line)
+    messages.append("\n".join(lines))
+    return messages
@@ -0,0 +1,398 @@
+# validation.py
+import logging
+import math
+import re
+import sqlite3
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from src.utils import db
+from src.utils.cache import LRUCache
+from src.utils.database import get_database
+
+logger = logging.getLogger(__name__)
+
+# Longest description and category accepted for an expense
+MAX_DESCRIPTION_LENGTH = 255
+MAX_CATEGORY_LENGTH = 50
+
+# Alternative column names accepted for each field (lower case)
+FIELD_ALIASES = {
+    "amount": ("amount", "monto", "cantidad"),
+    "description": ("description", "descripcion", "descripción"),
+    "category": ("category", "categoria", "categoría"),
+    "date": ("date", "date_added", "fecha"),
+}
+
+# Expenses with the same description and an amount within DUPLICATE_AMOUNT_TOLERANCE
+# (relative) logged less than DUPLICATE_WINDOW seconds apart are likely duplicates
+DUPLICATE_WINDOW = 10 * 60
+DUPLICATE_AMOUNT_TOLERANCE = 0.01
+
+# An amount is unusual for a category once it is OUTLIER_ZSCORE standard deviations
+# above the user's (logarithmic) average, after at least OUTLIER_MIN_SAMPLES expenses
+OUTLIER_ZSCORE = 3.0
+OUTLIER_MIN_SAMPLES = 8
+# Smallest standard deviation assumed, so that a user who always spends the same
+# amount is not warned about every small difference
+MIN_LOG_STDDEV = 0.25
+
+# Expenses each category's statistics are weighted over, so old habits fade
+STATS_WINDOW = 200
+
+# Recent expenses loaded from the database the first time a user is checked
+HISTORY_SEED_SIZE = 200
+
+# Maximum number of users whose statistics are kept in memory
+DEFAULT_VALIDATOR_CACHE_SIZE = 10000
+
+# Whole numbers with their thousands grouped by '.' or ',', e.g. 1,234,567
+_GROUPED_THOUSANDS = {
+    separator: re.compile(rf"[+-]?\d{{1,3}}(?:{re.escape(separator)}\d{{3}})+")
+    for separator in ".,"
+}
+
+
+class ValidationError(ValueError):
+    """Raised when an expense field or row is invalid."""
+
+
+def validate_amount(value):
+    """
+    Returns the amount as a positive, finite float. Text amounts may group thousands
+    with '.' or ','. When both appear the last one is the decimal separator ('1,234.50',
+    '1.234,50'); a separator repeated ('1,000,000') or a single ',' followed by three
+    digits ('1,234') groups thousands, as in English messages; otherwise a single '.' or
+    ',' is the decimal separator ('12.5', '12,5'). Badly grouped amounts are rejected.
+    """
+    if isinstance(value, bool):
+        raise ValidationError(f"Invalid amount: {value!r}")
+    number = value
+    if isinstance(value, str):
+        number = _canonical_amount(value.strip())
+        if number is None:
+            raise ValidationError(f"Invalid amount: {value!r}")
+    try:
+        amount = float(number)
+    except (TypeError, ValueError):
+        raise ValidationError(f"Invalid amount: {value!r}") from None
+    if not math.isfinite(amount) or amount <= 0:
+        raise ValidationError(f"Amount must be a positive number: {value!r}")
+    return amount
+
+
+def _canonical_amount(text):
+    """
+    Returns a text amount with '.' as its only separator, or
+    None if it is badly grouped.
+    """
+    commas, dots = text.count(","), text.count(".")
+    if commas and dots:
+        decimal = "," if text.rfind(",") > text.rfind(".") else "."
+        grouping = "." if decimal == "," else ","
+        whole, _, fraction = text.rpartition(decimal)
+        if not _GROUPED_THOUSANDS[grouping].fullmatch(whole):
+            return None
+        return f"{whole.replace(grouping, '')}.{fraction}"
+    if not commas and not dots:
+        return text
+    separator = "," if commas else "."
+    if commas + dots > 1 or (
+        separator == "," and _GROUPED_THOUSANDS[","].fullmatch(text)
+    ):
+        if not _GROUPED_THOUSANDS[separator].fullmatch(text):
+            return None
+        return text.replace(separator, "")
+    return text.replace(",", ".")
+
+
+def validate_text(value, name, max_length, required=True):
+    """Returns a stripped text field, or None for an empty optional field."""
+    if value is None:
+        value = ""
+    if not isinstance(value, str):
+        value = str(value)
+    value = value.strip()
+    if not value:
+        if required:
+            raise ValidationError(f"Missing {name}")
+        return None
+    if len(value) > max_length:
+        raise ValidationError(
+            f"{name.capitalize()} is longer than {max_length} characters"
+        )
+    return value
+
+
+def validate_date(value):
+    """
+    Returns an ISO 8601 date or date and time as an SQLite timestamp ('YYYY-MM-DD
+    HH:MM:SS', in UTC like CURRENT_TIMESTAMP), or None when no date is given.
+    """
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip())
+    except (AttributeError, ValueError):
+        raise ValidationError(f"Invalid date: {value!r}") from None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.isoformat(sep=" ", timespec="seconds")
+
+
+def _field(row, name):
+    for alias in FIELD_ALIASES[name]:
+        if alias in row:
+            return row[alias]
+    return None
+
+
+def validate_expense_row(row):
+    """
+    Validates one imported expense, given as a mapping of (lower case) column names.
+    Returns an (amount, description, category, date_added) tuple; the category and
+    date are None when missing. Raises ValidationError.
+    """
+    return (
+        validate_amount(_field(row, "amount")),
+        validate_text(
+            _field(row, "description"), "description", MAX_DESCRIPTION_LENGTH
+        ),
+        validate_text(
+            _field(row, "category"), "category", MAX_CATEGORY_LENGTH, required=False
+        ),
+        validate_date(_field(row, "date")),
+    )
+
+
+class RunningStats:
+    """
+    Mean and variance of a stream of values, updated in O(1) with Welford's algorithm.
+    Past `window` values the count stops growing, so every new value keeps a weight of
+    1 / `window` and the statistics follow recent values.
+    """
+
+    __slots__ = ("window", "count", "mean", "m2")
+
+    def __init__(self, window=STATS_WINDOW):
+        self.window = window
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value):
+        if self.count < self.window:
+            self.count += 1
+        else:
+            self.m2 -= self.m2 / self.count  # Forget the share of one old value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stddev(self):
+        return math.sqrt(max(self.variance, 0.0))
+
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize_description(description):
+    """
+    Returns the key similar descriptions share, ignoring case, punctuation and spacing.
+    """
+    return _NON_WORD.sub(" ", description.casefold()).strip()
+
+
+def _timestamp(date_added):
+    """
+    Converts an SQLite UTC timestamp to seconds since the epoch,
+    or None if it is not one.
+    """
+    try:
+        return (
+            datetime.fromisoformat(str(date_added))
+            .replace(tzinfo=timezone.utc)
+            .timestamp()
+        )
+    except ValueError:
+        return None
+
+
+class UserHistory:
+    """
+    What the validator remembers about one user: running statistics of the logarithm of
+    the amounts per category, and their recent expenses indexed by normalized
+    description.
+    """
+
+    __slots__ = ("stats", "recent")
+
+    def __init__(self):
+        self.stats = {}
+        self.recent = {}
+
+    def prune(self, now, window=DUPLICATE_WINDOW):
+        """Drops the recent expenses older than the duplicate window."""
+        for key in list(self.recent):
+            entries = self.recent[key]
+            while entries and entries[0][0] < now - window:
+                entries.popleft()
+            if not entries:
+                del self.recent[key]
+
+    def find_duplicate(
+        self,
+        amount,
+        key,
+        now,
+        window=DUPLICATE_WINDOW,
+        tolerance=DUPLICATE_AMOUNT_TOLERANCE,
+    ):
+        """
+        Returns the (time, amount, expense_id) of a recent similar expense, or None.
+        """
+        self.prune(now, window)
+        for entry in reversed(self.recent.get(key, ())):
+            if abs(entry[1] - amount) <= tolerance * max(entry[1], amount):
+                return entry
+        return None
+
+    def outlier(
+        self, amount, category, zscore=OUTLIER_ZSCORE, min_samples=OUTLIER_MIN_SAMPLES
+    ):
+        """
+        Returns the z-score of an amount if it is unusually high
+        for the category, or None.
+        """
+        stats = self.stats.get(category)
+        if stats is None or stats.count < min_samples or amount <= 0:
+            return None
+        score = (math.log(amount) - stats.mean) / max(stats.stddev, MIN_LOG_STDDEV)
+        return score if score > zscore else None
+
+    def add(self, expense_id, amount, key, category, when):
+        if amount > 0:
+            stats = self.stats.get(category)
+            if stats is None:
+                stats = self.stats[category] = RunningStats()
+            stats.add(math.log(amount))
+        if when is not None:
+            self.recent.setdefault(key, deque()).append((when, amount, expense_id))
+
+
+class ExpenseValidator:
+    """
+    Flags likely duplicates and unusually large amounts as expenses are logged.
+
+    Each user's history is loaded from their most recent expenses on their first check
+    and then kept up to date in memory, so every check and record is O(1) instead of a
+    query over the whole history. Findings are dicts with a "kind" of "duplicate" (with
+    the ID of the earlier expense and the seconds since it) or "outlier" (with the
+    category, the usual amount and the z-score). The expenses logged through
+    insert_expense are recorded into the history; any other write to a user's expenses,
+    such as a delete, an update or an import, drops their history, which is reloaded on
+    their next check.
+    """
+
+    def __init__(self, database, maxsize=DEFAULT_VALIDATOR_CACHE_SIZE):
+        self.database = database
+        self.histories = LRUCache(maxsize)
+        database.add_write_listener(self.invalidate_user, inserts=False)
+
+    def invalidate_user(self, user_id):
+        """
+        Forgets the history of a user whose expenses changed. Registered as a
+        database write listener that is not told about the expenses logged through
+        insert_expense, which `record` adds instead.
+        """
+        self.histories.pop(user_id)
+
+    async def history(self, user_id, conn=None):
+        """
+        Returns the UserHistory of a user, loading it from the database on first use.
+        """
+        history = self.histories.get(user_id)
+        if history is not None:
+            return history
+        try:
+            rows = await self.database.read(
+                db.list_expenses_page, user_id, HISTORY_SEED_SIZE, conn=conn
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Could not load the recent expenses of user {user_id}: {e}")
+            rows = []
+        history = self.histories.get(user_id)
+        if history is None:  # Another check may have loaded it meanwhile
+            history = UserHistory()
+            for expense_id, _, amount, description, category, date_added in reversed(
+                rows
+            ):
+                history.add(
+                    expense_id,
+                    amount,
+                    normalize_description(description),
+                    category,
+                    _timestamp(date_added),
+                )
+            self.histories.put(user_id, history)
+        return history
+
+    async def check(
+        self, user_id, amount, description, category=None, now=None, conn=None
+    ):
+        """
+        Returns the findings about an expense about to be logged (an
+        empty list if it looks fine).
+        """
+        history = await self.history(user_id, conn=conn)
+        now = time.time() if now is None else now
+        findings = []
+        duplicate = history.find_duplicate(
+            amount, normalize_description(description), now
+        )
+        if duplicate is not None:
+            findings.append(
+                {
+                    "kind": "duplicate",
+                    "expense_id": duplicate[2],
+                    "seconds_ago": now - duplicate[0],
+                }
+            )
+        score = history.outlier(amount, category)
+        if score is not None:
+            findings.append({
+                "kind": "outlier",
+                "category": category,
+                "usual": math.exp(history.stats[category].mean),
+                "zscore": score,
+            })
+        return findings
+
+    def record(self, user_id, expense_id, amount, description, category=None, now=None):
+        """Adds a logged expense to the user's history, if it is loaded."""
+        history = self.histories.get(user_id)
+        if history is not None:
+            history.add(
+                expense_id,
+                amount,
+                normalize_description(description),
+                category,
+                time.time() if now is None else now,
+            )
+
+
+def get_expense_validator(bot):
+    """
+    Returns the ExpenseValidator owned by the bot, creating a default one on first use.
+    """
+    validator = getattr(bot, "expense_validator", None)
+    if validator is None:
+        validator = ExpenseValidator(get_database(bot))
+        bot.expense_validator = validator
+    return validator
@@ -0,0 +1,164 @@
+# watchdog.py
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from src.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Default seconds between two ticks of the watchdog task
+DEFAULT_WATCHDOG_INTERVAL = 0.1
+
+# Default lag, in seconds, from which a stall is reported with the blocking
+# stack; 0 disables the watchdog
+DEFAULT_WATCHDOG_THRESHOLD = 0.25
+
+# Innermost frames of the blocking stack kept in a report
+STACK_LIMIT = 30
+
+
+class LoopWatchdog:
+    """
+    Measures the lag of the event loop continuously and reports the code that blocks it.
+
+    A task wakes up every `interval` seconds and records how late it was in the loop.lag
+    histogram. A sampler thread watches those ticks: once the loop has been stuck for
+    `threshold` seconds it captures the stack of the loop thread (sys._current_frames),
+    so the report shows the blocking call while it is still running, together with the
+    command or task it was running for. The report is logged as a warning once the loop
+    is free again, with the total lag. Commands are tracked by the bot's invoke hooks
+    through command_started/command_finished.
+    """
+
+    def __init__(
+        self,
+        interval=DEFAULT_WATCHDOG_INTERVAL,
+        threshold=DEFAULT_WATCHDOG_THRESHOLD,
+        metrics=registry,
+    ):
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        if threshold <= 0:
+            raise ValueError("threshold must be positive")
+        self.interval = interval
+        self.threshold = threshold
+        self.metrics = metrics
+        self._commands = {}
+        self._loop = None
+        self._loop_thread = None
+        self._task = None
+        self._sampler = None
+        self._stopped = threading.Event()
+        self._last_tick = 0.0
+        self._sample = None
+
+    @classmethod
+    def from_config(cls, options):
+        """
+        Builds a LoopWatchdog from the `watchdog` section of the configuration (a
+        WatchdogConfig), or returns None when its threshold is 0.
+        """
+        if not options.threshold:
+            return None
+        return cls(interval=options.interval, threshold=options.threshold)
+
+    def start(self):
+        """
+        Starts the watchdog task and its sampler thread. Must be
+        called on the event loop.
+        """
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._stopped.clear()
+        self._task = self._loop.create_task(self._run(), name="loop_watchdog")
+        self._sampler = threading.Thread(
+            target=self._watch, name="loop-watchdog", daemon=True
+        )
+        self._sampler.start()
+
+    async def stop(self):
+        """Stops the task and the sampler thread."""
+        if self._task is None:
+            return
+        self._stopped.set()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        await asyncio.to_thread(self._sampler.join)
+        self._task = self._sampler = None
+
+    def command_started(self, name):
+        """Marks the current task as running the command `name`, for the reports."""
+        task = asyncio.current_task()
+        if task is not None:
+            self._commands[task] = name
+
+    def command_finished(self):
+        """Forgets the command of the current task."""
+        self._commands.pop(asyncio.current_task(), None)
+
+    async def _run(self):
+        """
+        Ticks every `interval` seconds, recording the lag and reporting the stalls.
+        """
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = self._last_tick = time.monotonic()
+            lag = max(now - start - self.interval, 0.0)
+            self.metrics.observe("loop.lag", lag)
+            if lag >= self.threshold:
+                self._report(lag)
+
+    def _report(self, lag):
+        """
+        Logs a stall with the stack and the command the sampler
+        caught, if it caught one.
+        """
+        sample, self._sample = self._sample, None
+        stack, command, task = sample or (None, None, None)
+        self.metrics.increment("loop.stalls")
+        location = (
+            f" in command {command}" if command else f" in task {task}" if task else ""
+        )
+        logger.warning(
+            f"Event loop blocked for {lag * 1000:.0f} ms{location}",
+            extra={
+                "lag_ms": round(lag * 1000, 1),
+                "command": command,
+                "task": task,
+                "stack": stack,
+            },
+        )
+
+    def _watch(self):
+        """
+        Sampler thread: captures the loop thread's stack once per stall
+        longer than the threshold.
+        """
+        period = max(min(self.threshold / 2, self.interval), 0.005)
+        sampled_tick = None
+        while not self._stopped.wait(period):
+            last_tick = self._last_tick
+            stuck = time.monotonic() - last_tick - self.interval
+            if stuck < self.threshold or sampled_tick == last_tick:
+                continue
+            sampled_tick = last_tick
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame)[-STACK_LIMIT:])
+            # Reading the loop's current task from this thread is
+            # a plain dictionary lookup
+            task = asyncio.current_task(self._loop)
+            self._sample = (
+                stack,
+                self._commands.get(task),
+                task.get_name() if task is not None else None,
+            )
@@ -2,13 +2,21 @@ import unittest
 import sys
 import os
 import discord
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, PropertyMock, patch
 from discord.ext import commands
 
 # Add the correct path for imports to include the src directory
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 
-from bot import bot, load_extensions
+from src.utils import metrics
+from bot import (
+    bot,
+    load_extensions,
+    log_command,
+    start_command_timer,
+    ExpenseBot,
+    EXTENSIONS,
+)
 
 class TestBot(unittest.IsolatedAsyncioTestCase):
 
@@ -23,9 +31,12 @@ class TestBot(unittest.IsolatedAsyncioTestCase):
         self.run_patcher = patch.object(self.bot, 'run', return_value=None)
         self.mock_run = self.run_patcher.start()
 
-        # Mock the bot's user object to simulate the bot being logged in
-        self.bot.user = MagicMock()
-        self.bot.user.id = 12345  # Set a mock bot user ID
+        # Mock the bot's user object (a read-only property) to
+        # simulate the bot being logged in
+        self.user_patcher = patch.object(
+            commands.Bot, 'user', new_callable=PropertyMock
+        )
+        self.user_patcher.start().return_value.id = 12345  # Set a mock bot user ID
 
         # Mock the send method for ctx
         self.ctx = MagicMock()
@@ -40,6 +51,7 @@ class TestBot(unittest.IsolatedAsyncioTestCase):
         Clean up after each test.
         """
         self.run_patcher.stop()
+        self.user_patcher.stop()
 
     async def test_ping_command(self):
         """
@@ -52,7 +64,7 @@ class TestBot(unittest.IsolatedAsyncioTestCase):
         # Get the command object and invoke it directly
         command = self.bot.get_command('ping')
         await command(self.ctx)
-        
+
         # Assert that the bot sends the "Pong!" message
         self.ctx.send.assert_called_with("Pong!")
 
@@ -62,8 +74,8 @@ class TestBot(unittest.IsolatedAsyncioTestCase):
         """
         # Patch the bot's load_extension method
         with patch.object(self.bot, 'load_extension', new_callable=AsyncMock) as mock_load_extension:
-            # Override bot instance in load_extensions function for testing
-            await load_extensions()  # Call the method to load extensions
+            # Load the extensions into the test bot
+            await load_extensions(self.bot)
 
             # Check that extensions were attempted to be loaded
             extensions = [
@@ -71,11 +83,61 @@ class TestBot(unittest.IsolatedAsyncioTestCase):
                 'src.commands.delete_expense',
                 'src.commands.list_expenses',
                 'src.commands.update_expense',
+                'src.commands.generate_report',
                 'src.commands.set_language'
             ]
             for ext in extensions:
                 mock_load_extension.assert_any_call(ext)
 
+    async def test_failed_extension_does_not_stop_the_others(self):
+        """
+        Test that every extension is timed and a failing one is reported as None.
+        """
+        async def load_extension(name):
+            if name == 'src.commands.log_expense':
+                raise commands.ExtensionFailed(name, RuntimeError("boom"))
+
+        with patch.object(self.bot, 'load_extension', side_effect=load_extension):
+            timings = await load_extensions(self.bot)
+
+        self.assertEqual(list(timings), EXTENSIONS)
+        self.assertIsNone(timings['src.commands.log_expense'])
+        self.assertTrue(
+            all(
+                timings[ext] >= 0
+                for ext in EXTENSIONS
+                if ext != 'src.commands.log_expense'
+            )
+        )
+
+    async def test_setup_hook_loads_extensions_once(self):
+        """
+        Test that extensions and scheduled jobs are set up in
+        setup_hook, not on every on_ready.
+        """
+        test_bot = ExpenseBot(command_prefix="!", intents=discord.Intents.default())
+        test_bot.scheduler = MagicMock()
+        with patch.object(
+            test_bot, 'load_extension', new_callable=AsyncMock
+        ) as mock_load_extension:
+            await test_bot.setup_hook()
+        self.assertEqual(mock_load_extension.await_count, len(EXTENSIONS))
+        test_bot.scheduler.start.assert_called_once()
+
+    async def test_close_cancels_pending_summaries(self):
+        """
+        Test that closing the bot closes its summarizer and writes
+        out the pending expenses.
+        """
+        test_bot = ExpenseBot(command_prefix="!", intents=discord.Intents.default())
+        test_bot.summarizer = MagicMock(close=AsyncMock())
+        test_bot.db = MagicMock(flush=AsyncMock())
+        # Never connected
+        with patch.object(commands.AutoShardedBot, 'close', new_callable=AsyncMock):
+            await test_bot.close()
+        test_bot.summarizer.close.assert_awaited_once()
+        test_bot.db.flush.assert_awaited_once()
+
     async def test_command_invocation(self):
         """
         Test invoking a non-existent command to ensure proper handling.
@@ -85,11 +147,51 @@ class TestBot(unittest.IsolatedAsyncioTestCase):
         message = self.ctx.message
         ctx = await self.bot.get_context(message)
 
-        # Invoke the non-existent command
-        await self.bot.invoke(ctx)
+        # Invoke the non-existent command (the CommandNotFound event needs a logged-in
+        # client, so it is not dispatched)
+        with patch.object(self.bot, 'dispatch'):
+            await self.bot.invoke(ctx)
 
         # Verify that the bot doesn't call ctx.send() because the command doesn't exist
         self.ctx.send.assert_not_called()
 
+    async def test_commands_are_logged_with_latency(self):
+        """
+        Test that the global command hooks log the command, the user and the latency.
+        """
+        self.ctx.command.qualified_name = "ping"
+        self.ctx.command_failed = False
+        await start_command_timer(self.ctx)
+        with self.assertLogs("bot", level="INFO") as logs:
+            await log_command(self.ctx)
+
+        record = logs.records[0]
+        self.assertEqual(
+            (record.command, record.user_id, record.failed), ("ping", 1, False)
+        )
+        self.assertGreaterEqual(record.latency_ms, 0)
+        self.assertEqual(record.db_ms, 0)
+
+    async def test_commands_are_recorded_in_the_metrics(self):
+        """
+        Test that the global command hooks record the latency and database time of each
+        command, and tell the loop watchdog which command is running.
+        """
+        metrics.registry.reset()
+        self.ctx.command.qualified_name = "ping"
+        self.ctx.command_failed = True
+        with patch.object(bot, 'watchdog') as watchdog:
+            await start_command_timer(self.ctx)
+            metrics.add_db_time(0.002)
+            await log_command(self.ctx)
+        watchdog.command_started.assert_called_once_with("ping")
+        watchdog.command_finished.assert_called_once()
+
+        snapshot = metrics.registry.snapshot()
+        self.assertEqual(snapshot["latencies"]["command.ping"]["count"], 1)
+        self.assertEqual(snapshot["latencies"]["command.ping.db"]["total"], 0.002)
+        self.assertEqual(snapshot["counters"]["command.ping.failed"], 1)
+        metrics.registry.reset()
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,175 @@
+import unittest
+import sqlite3
+from src.utils.db import (
+    create_expenses_table,
+    create_budgets_table,
+    create_expense_totals_table,
+    create_indexes,
+    insert_expense,
+    insert_expenses,
+    update_expense,
+    update_expense_category,
+    delete_expense,
+    insert_budget,
+    get_total_expenses,
+    check_budget_status,
+    find_expense_totals_drift,
+    rebuild_expense_totals,
+    check_user_budgets,
+)
+
+class TestExpenseTotals(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Set up a clean in-memory database with the running totals before each test.
+        """
+        self.conn = sqlite3.connect(':memory:')
+        create_expenses_table(self.conn)
+        create_budgets_table(self.conn)
+        create_expense_totals_table(self.conn)
+        create_indexes(self.conn)
+
+    def tearDown(self):
+        """Close the connection after each test."""
+        self.conn.close()
+
+    def insert_dated_expense(self, user_id, amount, category, date_added):
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            INSERT INTO expenses (user_id, amount, description, category, date_added)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (user_id, amount, "Test", category, date_added))
+        self.conn.commit()
+        return cursor.lastrowid
+
+    def totals(self):
+        return self.conn.execute(
+            "SELECT user_id, category, period_bucket, total, count FROM expense_totals "
+            "ORDER BY 1, 2, 3"
+        ).fetchall()
+
+    # Test that inserts, batched inserts, updates and deletes keep the totals in sync
+    def test_totals_follow_every_write(self):
+        first = self.insert_dated_expense(1, 10.0, "Food", "2024-01-05")
+        insert_expenses(self.conn, [(1, 5.0, "Snack", "Food"), (1, 2.0, "Bus", None)])
+        self.insert_dated_expense(1, 7.0, "Food", "2024-02-01")
+        update_expense(self.conn, first, 12.0, "Lunch")
+        update_expense_category(self.conn, first, "Fun")
+        delete_expense(self.conn, first)
+
+        self.assertEqual(find_expense_totals_drift(self.conn), [])
+        self.assertEqual(
+            get_total_expenses(self.conn, 1, "Food", "2024-02-01", "2024-02-29"), 7.0
+        )
+        self.assertNotIn("Fun", [row[1] for row in self.totals()])
+
+    # Test that expenses logged before the totals existed are aggregated once
+    def test_existing_expenses_are_backfilled(self):
+        conn = sqlite3.connect(':memory:')
+        create_expenses_table(conn)
+        insert_expense(conn, 1, 4.0, "Old", "Food")
+        insert_expense(conn, 1, 6.0, "Old", "Food")
+        create_expense_totals_table(conn)
+        self.assertEqual(get_total_expenses(conn, 1, "Food"), 10.0)
+        conn.close()
+
+    # Test that the consistency checker reports drift and the rebuild repairs it
+    def test_drift_is_detected_and_rebuilt(self):
+        self.insert_dated_expense(1, 10.0, "Food", "2024-01-05")
+        self.conn.execute("UPDATE expense_totals SET total = 99, count = 3")
+        self.conn.commit()
+
+        drift = find_expense_totals_drift(self.conn)
+        self.assertEqual(drift, [(1, "Food", "2024-01", 99.0, 10.0, 3, 1)])
+
+        rebuild_expense_totals(self.conn)
+        self.assertEqual(find_expense_totals_drift(self.conn), [])
+        self.assertEqual(self.totals(), [(1, "Food", "2024-01", 10.0, 1)])
+
+    # Test checking a budget against the running totals
+    def test_check_budget_status(self):
+        insert_budget(self.conn, 1, "Food", 50.0, "monthly", "2024-01-01", "2024-01-31")
+        self.insert_dated_expense(1, 30.0, "Food", "2024-01-10")
+        # Outside the budget period
+        self.insert_dated_expense(1, 100.0, "Food", "2024-02-10")
+
+        status = check_budget_status(self.conn, 1, "Food")
+        self.assertEqual(
+            status,
+            {
+                "category": "Food",
+                "total_spent": 30.0,
+                "budget": 50.0,
+                "exceeded": False,
+            },
+        )
+
+        self.insert_dated_expense(1, 25.0, "Food", "2024-01-20")
+        self.assertTrue(check_budget_status(self.conn, 1, "Food")["exceeded"])
+
+    # Test that a budget not aligned on months only counts the expenses of its own days
+    def test_check_budget_status_with_partial_months(self):
+        insert_budget(self.conn, 1, "Food", 20.0, "weekly", "2024-03-11", "2024-03-17")
+        # Same month, before the week
+        self.insert_dated_expense(1, 90.0, "Food", "2024-03-02 12:00:00")
+        self.insert_dated_expense(1, 5.0, "Food", "2024-03-12 09:30:00")
+        # Last day included
+        self.insert_dated_expense(1, 1.0, "Food", "2024-03-17 23:59:59")
+        self.insert_dated_expense(1, 70.0, "Food", "2024-03-18 00:00:00")
+
+        status = check_budget_status(self.conn, 1, "Food")
+        self.assertEqual(
+            status,
+            {"category": "Food", "total_spent": 6.0, "budget": 20.0, "exceeded": False},
+        )
+
+    # Test that the budget monitor's check counts the days of a mid-month budget only
+    def test_check_user_budgets_with_partial_months(self):
+        insert_budget(self.conn, 1, "Food", 20.0, "weekly", "2024-03-11", "2024-03-17")
+        insert_budget(self.conn, 1, "Food", 200.0, "custom", "2024-02-15", "2024-04-14")
+        self.insert_dated_expense(1, 90.0, "Food", "2024-03-02 12:00:00")
+        self.insert_dated_expense(1, 5.0, "Food", "2024-03-12 09:30:00")
+        self.insert_dated_expense(1, 40.0, "Food", "2024-02-14 10:00:00")
+        self.insert_dated_expense(1, 7.0, "Food", "2024-04-14 10:00:00")
+
+        weekly, custom = check_user_budgets(self.conn, 1)
+        self.assertEqual((weekly["total_spent"], weekly["exceeded"]), (5.0, False))
+        self.assertEqual(custom["total_spent"], 102.0)
+        self.assertEqual(
+            [
+                status["budget"]
+                for status in check_user_budgets(self.conn, 1, "2024-03-20")
+            ],
+            [200.0],
+        )
+
+    # Test a period made of a partial month, whole months and another partial month
+    def test_total_expenses_mixes_whole_and_partial_months(self):
+        for amount, date_added in [
+            (1.0, "2024-01-14 23:00:00"),
+            (2.0, "2024-01-15 08:00:00"),
+            (4.0, "2024-02-10 10:00:00"),
+            (8.0, "2024-03-01 00:00:00"),
+            (16.0, "2024-04-10 18:00:00"),
+            (32.0, "2024-04-11 00:00:01"),
+        ]:
+            self.insert_dated_expense(1, amount, "Food", date_added)
+        self.insert_dated_expense(1, 64.0, None, "2024-02-10 10:00:00")
+
+        self.assertEqual(
+            get_total_expenses(self.conn, 1, "Food", "2024-01-15", "2024-04-10"), 30.0
+        )
+        self.assertEqual(
+            get_total_expenses(self.conn, 1, "Food", "2024-02-01", "2024-03-31"), 12.0
+        )
+        self.assertEqual(
+            get_total_expenses(self.conn, 1, None, "2024-02-05", "2024-02-20"), 64.0
+        )
+
+    # Test checking a category without a budget
+    def test_check_budget_status_without_budget(self):
+        self.assertIsNone(check_budget_status(self.conn, 1, "Travel"))
+
+if __name__ == "__main__":
+    unittest.main()
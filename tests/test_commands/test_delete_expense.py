@@ -2,6 +2,7 @@ import unittest
 import sys
 import os
 import sqlite3
+import tempfile
 import discord
 from unittest.mock import MagicMock, AsyncMock, patch
 from discord.ext import commands
@@ -11,51 +12,44 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../s
 
 from commands.delete_expense import DeleteExpense
 from utils.lang import translate
-from utils.shared import user_language
+from src.utils import db
+from src.utils.database import Database
 
 class TestDeleteExpense(unittest.IsolatedAsyncioTestCase):
 
     async def asyncSetUp(self):
         """
-        Set up a test bot and delete expense cog before each test.
+        Set up a test bot, backed by a temporary database, and delete
+        expense cog before each test.
         """
         intents = discord.Intents.default()
         self.bot = commands.Bot(command_prefix="!", intents=intents)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.bot.db = Database(os.path.join(self.tmpdir.name, "expenses.db"))
         self.delete_expense_cog = DeleteExpense(self.bot)
         await self.bot.add_cog(self.delete_expense_cog)
         self.ctx = MagicMock()
         self.ctx.author.id = 1
         self.ctx.send = AsyncMock()
 
-        # Patch the connect_db method in the db module
-        self.conn_patcher = patch('utils.db.connect_db')
-        self.mock_connect_db = self.conn_patcher.start()
-
-        # Set up an in-memory database for testing
-        self.mock_conn = sqlite3.connect(':memory:')
-        self.mock_connect_db.return_value = self.mock_conn
-
-        # Import and create the expenses table in the in-memory database
-        from utils.db import create_expenses_table, insert_expense
-        create_expenses_table(self.mock_conn)
-
         # Insert an expense to delete in the test
-        self.expense_id = insert_expense(self.mock_conn, user_id=1, amount=100.0, description="Test expense")
+        self.expense_id = await self.bot.db.write(
+            db.insert_expense, 1, 100.0, "Test expense"
+        )
 
     async def asyncTearDown(self):
         """
-        Clean up after each test.
+        Close the temporary database after each test.
         """
-        self.mock_conn.close()
-        self.conn_patcher.stop()
+        self.bot.db.close()
+        self.tmpdir.cleanup()
 
-    @patch('utils.shared.user_language', new_callable=dict)
-    async def test_delete_expense_success(self, mock_user_language):
+    async def test_delete_expense_success(self):
         """
         Test deleting an expense successfully.
         """
         # Set the user's language preference
-        mock_user_language[1] = "en"
+        self.delete_expense_cog.languages.entries.put(1, "en")
 
         # Call the command to delete an expense
         await self.delete_expense_cog.delete_expense(self.ctx, self.expense_id)
@@ -63,16 +57,17 @@ class TestDeleteExpense(unittest.IsolatedAsyncioTestCase):
         # Check if the response was sent correctly
         expected_message = translate("expense_deleted", language="en", id=self.expense_id)
         self.ctx.send.assert_called_with(expected_message)
+        self.assertEqual(await self.bot.db.read(db.get_expenses_by_user, 1), [])
 
-    @patch('utils.shared.user_language', new_callable=dict)
-    async def test_delete_expense_error(self, mock_user_language):
+    async def test_delete_expense_error(self):
         """
         Test deleting an expense when the database connection fails.
         """
-        mock_user_language[1] = "en"
+        self.delete_expense_cog.languages.entries.put(1, "en")
 
         # Simulate a database connection failure by setting side_effect
-        with patch('sqlite3.connect', side_effect=sqlite3.OperationalError("Unable to connect to the database")):
+        error = sqlite3.OperationalError("Unable to connect to the database")
+        with patch.object(self.bot.db, 'write', AsyncMock(side_effect=error)):
             # Call the command to delete an expense
             await self.delete_expense_cog.delete_expense(self.ctx, self.expense_id)
 
@@ -0,0 +1,128 @@
+import unittest
+import sys
+import os
+import csv
+import gzip
+import io
+import tempfile
+import discord
+from unittest.mock import MagicMock, AsyncMock, patch
+from discord.ext import commands
+
+# Add the correct path for imports to include the src directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../src')))
+
+from commands.export_expenses import ExportExpenses, pyarrow
+from utils.lang import translate
+from src.utils import db
+from src.utils.database import Database
+
+class TestExportExpenses(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        """
+        Set up a test bot, the export cog and a temporary database with a few expenses.
+        """
+        intents = discord.Intents.default()
+        self.bot = commands.Bot(command_prefix="!", intents=intents)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmpdir.name, "expenses.db")
+        self.bot.db = Database(path)
+        self.export_expenses_cog = ExportExpenses(self.bot)
+        await self.bot.add_cog(self.export_expenses_cog)
+        self.export_expenses_cog.languages.entries.put(1, "en")
+        self.ctx = MagicMock()
+        self.ctx.author.id = 1
+        self.ctx.guild = None
+
+        # Keep a copy of every attachment, since the temporary
+        # file is closed after sending
+        self.attachments = []
+
+        async def send(content, file=None):
+            if file is not None:
+                self.attachments.append((file.filename, file.fp.read()))
+
+        self.ctx.send = AsyncMock(side_effect=send)
+
+        rows = [
+            (1, float(i), f"Expense {i}", "Food" if i % 2 else None,
+             f"2024-01-{i % 28 + 1:02d} 10:00:00")
+            for i in range(1, 12001)
+        ]
+        rows.append((2, 5.0, "Another user", None, "2024-01-01 10:00:00"))
+        conn = db.connect_db(path)
+        conn.executemany('''
+            INSERT INTO expenses (user_id, amount, description, category, date_added)
+            VALUES (?, ?, ?, ?, ?)
+        ''', rows)
+        conn.commit()
+        conn.close()
+
+    async def asyncTearDown(self):
+        """
+        Clean up after each test.
+        """
+        self.bot.db.close()
+        self.tmpdir.cleanup()
+
+    async def test_export_csv(self):
+        """
+        Test exporting every expense of the user as gzip-compressed CSV, oldest first.
+        """
+        await self.export_expenses_cog.export_expenses(self.ctx)
+
+        self.ctx.send.assert_called_once()
+        self.assertEqual(
+            self.ctx.send.call_args.args[0],
+            translate("export_ready", "en", count=12000),
+        )
+        filename, content = self.attachments[0]
+        self.assertEqual(filename, "expenses.csv.gz")
+        rows = list(csv.reader(io.StringIO(gzip.decompress(content).decode("utf-8"))))
+        self.assertEqual(
+            rows[0], ["id", "amount", "description", "category", "date_added"]
+        )
+        self.assertEqual(len(rows), 12001)
+        self.assertEqual(rows[1][4], "2024-01-01 10:00:00")
+        self.assertNotIn("Another user", {row[2] for row in rows})
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    async def test_export_parquet(self):
+        """
+        Test exporting as Parquet, one row group per chunk.
+        """
+        import pyarrow.parquet
+        with patch('commands.export_expenses.EXPORT_CHUNK_SIZE', 5000):
+            await self.export_expenses_cog.export_expenses(self.ctx, "parquet")
+
+        filename, content = self.attachments[0]
+        self.assertEqual(filename, "expenses.parquet")
+        parquet_file = pyarrow.parquet.ParquetFile(io.BytesIO(content))
+        self.assertEqual(parquet_file.metadata.num_rows, 12000)
+        self.assertEqual(parquet_file.num_row_groups, 3)
+
+    async def test_no_expenses(self):
+        """
+        Test that nothing is attached when the user has no expenses.
+        """
+        self.ctx.author.id = 3
+        await self.export_expenses_cog.export_expenses(self.ctx)
+        self.ctx.send.assert_called_once_with(translate("no_expenses_found", "en"))
+
+    async def test_unsupported_format_and_size_limit(self):
+        """
+        Test rejecting unknown formats and files above the upload limit.
+        """
+        await self.export_expenses_cog.export_expenses(self.ctx, "xlsx")
+        self.assertTrue(
+            self.ctx.send.call_args.args[0].startswith("Unsupported format 'xlsx'")
+        )
+
+        self.ctx.guild = MagicMock(filesize_limit=1024)
+        await self.export_expenses_cog.export_expenses(self.ctx)
+        self.assertTrue(self.ctx.send.call_args.args[0].startswith("The export is"))
+        self.assertEqual(self.attachments, [])
+
+if __name__ == '__main__':
+    unittest.main()
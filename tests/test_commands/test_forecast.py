@@ -0,0 +1,174 @@
+import unittest
+import sys
+import os
+import sqlite3
+import tempfile
+import discord
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, AsyncMock
+from discord.ext import commands
+
+try:
+    import numpy  # noqa: F401 (the forecast needs it)
+except ImportError:
+    raise unittest.SkipTest("numpy is not installed")
+
+# Add the correct path for imports to include the src directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../src')))
+
+from commands.forecast import Forecast
+from src.utils import analytics
+from utils.lang import translate
+from src.utils import db
+from src.utils.database import Database
+
+class TestForecast(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        """
+        Set up a test bot, the forecast cog and an in-memory database.
+        """
+        intents = discord.Intents.default()
+        self.bot = commands.Bot(command_prefix="!", intents=intents)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.bot.db = Database(os.path.join(self.tmpdir.name, "expenses.db"))
+        self.forecast_cog = Forecast(self.bot)
+        await self.bot.add_cog(self.forecast_cog)
+        self.forecast_cog.languages.entries.put(1, "en")
+        self.ctx = MagicMock()
+        self.ctx.author.id = 1
+        self.ctx.send = AsyncMock()
+
+        self.mock_conn = sqlite3.connect(':memory:')
+        db.create_expenses_table(self.mock_conn)
+        db.create_budgets_table(self.mock_conn)
+        db.create_expense_totals_table(self.mock_conn)
+        db.create_indexes(self.mock_conn)
+
+    async def asyncTearDown(self):
+        """
+        Clean up after each test.
+        """
+        self.mock_conn.close()
+        self.bot.db.close()
+        self.tmpdir.cleanup()
+
+    def log_daily_expenses(self, today, category="Food", amount=20.0):
+        """Logs one expense a day over the last 60 days."""
+        for offset in range(60):
+            day = (today - timedelta(days=offset)).isoformat()
+            self.mock_conn.execute(
+                "INSERT INTO expenses (user_id, amount, description, category, "
+                "date_added) VALUES (?, ?, ?, ?, ?)",
+                (1, amount, "Lunch", category, f"{day} 12:00:00"),
+            )
+        self.mock_conn.commit()
+
+    async def test_forecast_with_budget(self):
+        """
+        Test that the forecast lists each category and warns
+        about budgets it will exceed.
+        """
+        today = datetime.now(timezone.utc).date()
+        self.log_daily_expenses(today)
+        db.insert_budget(
+            self.mock_conn,
+            1,
+            "Food",
+            50.0,
+            "monthly",
+            today.replace(day=1).isoformat(),
+            analytics.month_end(today).isoformat(),
+        )
+
+        await self.forecast_cog.forecast(self.ctx, conn=self.mock_conn)
+
+        message = self.ctx.send.call_args.args[0]
+        lines = message.split("\n")
+        self.assertTrue(
+            lines[1].startswith(f"- Food: {20.0 * today.day:.2f} spent this month")
+        )
+        self.assertEqual(
+            lines[2], translate("forecast_over_budget", "en", budget="50.00")
+        )
+        self.assertTrue(lines[3].startswith("Total:"))
+
+    async def test_budgets_are_prorated_to_the_month(self):
+        """
+        Test that weekly and yearly budgets are compared with the projected month total
+        at their monthly value.
+        """
+        today = datetime.now(timezone.utc).date()
+        self.log_daily_expenses(today, "Food")
+        self.log_daily_expenses(today, "Rent")
+        # 200 a week is more than the 20 a day spent on food
+        db.insert_budget(
+            self.mock_conn,
+            1,
+            "Food",
+            200.0,
+            "weekly",
+            (today - timedelta(days=3)).isoformat(),
+            (today + timedelta(days=3)).isoformat(),
+        )
+        # 1000 a year is much less than 20 a day
+        year_start = today.replace(month=1, day=1)
+        year_end = today.replace(month=12, day=31)
+        db.insert_budget(
+            self.mock_conn,
+            1,
+            "Rent",
+            1000.0,
+            "yearly",
+            year_start.isoformat(),
+            year_end.isoformat(),
+        )
+
+        await self.forecast_cog.forecast(self.ctx, conn=self.mock_conn)
+
+        month_days = analytics.month_end(today).day
+        year_days = (year_end - year_start).days + 1
+        lines = self.ctx.send.call_args.args[0].split("\n")
+        food = next(i for i, line in enumerate(lines) if line.startswith("- Food"))
+        rent = next(i for i, line in enumerate(lines) if line.startswith("- Rent"))
+        self.assertFalse(lines[food + 1].startswith("  "))
+        self.assertEqual(
+            lines[rent + 1],
+            translate(
+                "forecast_over_budget",
+                "en",
+                budget=f"{1000.0 * month_days / year_days:.2f}",
+            ),
+        )
+
+    async def test_long_forecast_is_split_into_messages(self):
+        """
+        Test that a forecast longer than a Discord message is sent as several messages.
+        """
+        today = datetime.now(timezone.utc).date()
+        self.mock_conn.executemany(
+            "INSERT INTO expenses (user_id, amount, description, category, date_added) "
+            "VALUES (1, 5.0, 'Item', ?, ?)",
+            [
+                (f"Category with a rather long name {i:03d}", f"{today} 12:00:00")
+                for i in range(100)
+            ],
+        )
+        self.mock_conn.commit()
+
+        await self.forecast_cog.forecast(self.ctx, conn=self.mock_conn)
+
+        messages = [call.args[0] for call in self.ctx.send.call_args_list]
+        self.assertGreater(len(messages), 1)
+        self.assertTrue(all(len(message) <= 2000 for message in messages))
+        self.assertTrue(messages[-1].split("\n")[-1].startswith("Total:"))
+
+    async def test_forecast_without_expenses(self):
+        """
+        Test the reply for a user without recent expenses.
+        """
+        await self.forecast_cog.forecast(self.ctx, conn=self.mock_conn)
+        self.ctx.send.assert_called_once_with(translate("no_expenses_found", "en"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,270 @@
+import asyncio
+import dataclasses
+import unittest
+import sys
+import os
+import sqlite3
+import tempfile
+import discord
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, AsyncMock, call, patch
+from discord.ext import commands
+
+# Add the correct path for imports to include the src directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../src')))
+
+from commands.generate_report import GenerateReport, ReportCache
+from utils.lang import translate
+from src.utils import db
+from src.utils.ai import Summarizer, SummaryBackend
+from src.utils.database import Database
+
+class TestGenerateReport(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        """
+        Set up a test bot and generate report cog before each test.
+        """
+        intents = discord.Intents.default()
+        self.bot = commands.Bot(command_prefix="!", intents=intents)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.bot.db = Database(os.path.join(self.tmpdir.name, "expenses.db"))
+        self.generate_report_cog = GenerateReport(self.bot)
+        await self.bot.add_cog(self.generate_report_cog)
+        self.ctx = MagicMock()
+        self.ctx.author.id = 1
+        self.ctx.send = AsyncMock()
+        self.generate_report_cog.languages.entries.put(1, "en")
+
+        # Set up an in-memory database with a month of expenses
+        self.mock_conn = sqlite3.connect(':memory:')
+        db.create_expenses_table(self.mock_conn)
+        db.create_budgets_table(self.mock_conn)
+        db.create_indexes(self.mock_conn)
+        cursor = self.mock_conn.cursor()
+        cursor.executemany('''
+            INSERT INTO expenses (user_id, amount, description, category, date_added)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [
+            (1, 10.0, "Lunch", "Food", "2024-01-05 12:00:00"),
+            (1, 15.5, "Dinner", "Food", "2024-01-31 20:00:00"),
+            (1, 40.0, "Taxi", "Transport", "2024-01-10 08:00:00"),
+            (1, 3.0, "Gum", None, "2024-01-11 09:00:00"),
+            (1, 99.0, "Outside the period", "Food", "2024-02-01 00:00:00"),
+            (2, 70.0, "Another user", "Food", "2024-01-05 12:00:00"),
+        ])
+        self.mock_conn.commit()
+
+    async def asyncTearDown(self):
+        """
+        Clean up after each test.
+        """
+        await self.bot.remove_cog("GenerateReport")
+        self.mock_conn.close()
+        self.bot.db.close()
+        self.tmpdir.cleanup()
+
+    async def test_generate_report(self):
+        """
+        Test the report totals per category, largest first.
+        """
+        await self.generate_report_cog.generate_report(
+            self.ctx, "2024-01-01", "2024-01-31", conn=self.mock_conn
+        )
+
+        expected_message = "\n".join(
+            [
+                translate(
+                    "report_generated",
+                    language="en",
+                    start_date="2024-01-01",
+                    end_date="2024-01-31",
+                ),
+                translate(
+                    "category_total",
+                    language="en",
+                    category="Transport",
+                    total_spent="40.00",
+                ),
+                translate(
+                    "category_total",
+                    language="en",
+                    category="Food",
+                    total_spent="25.50",
+                ),
+                translate(
+                    "category_total",
+                    language="en",
+                    category="Uncategorized",
+                    total_spent="3.00",
+                ),
+                translate("report_total", language="en", total_spent="68.50"),
+            ]
+        )
+        expected_summary = translate(
+            "report_summary",
+            language="en",
+            total="68.50",
+            count=4,
+            average="17.12",
+            category="Transport",
+            share="58",
+        )
+        self.assertEqual(
+            self.ctx.send.call_args_list,
+            [call(expected_message), call(expected_summary)],
+        )
+
+    async def test_long_report_is_split_into_messages(self):
+        """
+        Test that a report longer than a Discord message is sent as several messages,
+        split between lines.
+        """
+        self.mock_conn.executemany(
+            "INSERT INTO expenses (user_id, amount, description, category, date_added) "
+            "VALUES (1, ?, 'Item', ?, '2024-01-15 12:00:00')",
+            [
+                (float(i), f"Category with a rather long name {i:03d}")
+                for i in range(150)
+            ],
+        )
+        await self.generate_report_cog.generate_report(
+            self.ctx, "2024-01-01", "2024-01-31", conn=self.mock_conn
+        )
+
+        messages = [call.args[0] for call in self.ctx.send.call_args_list[:-1]]
+        self.assertGreater(len(messages), 1)
+        self.assertTrue(all(len(message) <= 2000 for message in messages))
+        lines = "\n".join(messages).split("\n")
+        self.assertEqual(len(lines), 150 + 3 + 2)
+        self.assertEqual(
+            lines[-1], translate("report_total", language="en", total_spent="11243.50")
+        )
+
+    async def test_default_period_follows_utc(self):
+        """
+        Test that the default period ends on the current UTC day, the day of the
+        expense timestamps, whatever the local time zone.
+        """
+        self.mock_conn.execute(
+            "INSERT INTO expenses (user_id, amount, description, category, date_added) "
+            "VALUES (1, 7.0, 'Coffee', 'Food', '2024-03-01 00:10:00')"
+        )
+        now = datetime(2024, 3, 1, 0, 30, tzinfo=timezone.utc)
+        with patch("commands.generate_report.datetime") as mock_datetime:
+            mock_datetime.now.return_value = now
+            await self.generate_report_cog.generate_report(
+                self.ctx, conn=self.mock_conn
+            )
+
+        mock_datetime.now.assert_called_once_with(timezone.utc)
+        self.assertIn("2024-03-01", self.ctx.send.call_args_list[0].args[0])
+        self.assertIn("7.00", self.ctx.send.call_args_list[0].args[0])
+
+    async def test_generate_report_no_data(self):
+        """
+        Test a period without expenses.
+        """
+        await self.generate_report_cog.generate_report(
+            self.ctx, "2023-01-01", "2023-01-31", conn=self.mock_conn
+        )
+        self.ctx.send.assert_called_with(translate("no_report_data", language="en"))
+
+    async def test_generate_report_invalid_date(self):
+        """
+        Test a date that is not in the YYYY-MM-DD format.
+        """
+        await self.generate_report_cog.generate_report(
+            self.ctx, "31/01/2024", conn=self.mock_conn
+        )
+        self.ctx.send.assert_called_with(
+            translate("invalid_date", language="en", value="31/01/2024")
+        )
+
+    async def test_repeated_report_is_served_from_cache(self):
+        """
+        Test that the same report is only aggregated once.
+        """
+        with patch.object(
+            self.generate_report_cog.db, 'read', wraps=self.generate_report_cog.db.read
+        ) as mock_read:
+            await self.generate_report_cog.generate_report(
+                self.ctx, "2024-01-01", "2024-01-31", conn=self.mock_conn
+            )
+            first_report = self.ctx.send.call_args
+            await self.generate_report_cog.generate_report(
+                self.ctx, "2024-01-01", "2024-01-31", conn=self.mock_conn
+            )
+
+        self.assertEqual(mock_read.call_count, 1)
+        self.assertEqual(self.ctx.send.call_args, first_report)
+
+    async def test_write_invalidates_cached_report(self):
+        """
+        Test that a new expense for the user drops the cached report.
+        """
+        self.generate_report_cog.summarizer = None  # Only the reports are compared
+        await self.generate_report_cog.generate_report(
+            self.ctx, "2024-01-01", "2024-01-31", conn=self.mock_conn
+        )
+        first_report = self.ctx.send.call_args.args[0]
+
+        # Another user's write keeps the report cached
+        await self.generate_report_cog.db.insert_expense(
+            2, 1.0, "Coffee", "Food", conn=self.mock_conn
+        )
+        self.assertEqual(len(self.generate_report_cog.cache.entries), 1)
+
+        await self.generate_report_cog.db.write(
+            db.update_expense, 1, 20.0, "Bigger lunch", user_id=1, conn=self.mock_conn
+        )
+        self.assertEqual(len(self.generate_report_cog.cache.entries), 0)
+
+        await self.generate_report_cog.generate_report(
+            self.ctx, "2024-01-01", "2024-01-31", conn=self.mock_conn
+        )
+        self.assertNotEqual(self.ctx.send.call_args.args[0], first_report)
+        self.assertIn("35.50", self.ctx.send.call_args.args[0])
+
+    async def test_invalidations_stay_bounded(self):
+        """
+        Test that the cache keeps the invalidation counters of a bounded
+        number of users, and still refuses a report built before the
+        invalidation of a forgotten user.
+        """
+        cache = ReportCache(maxsize=4)
+        generation = cache.generation(1)
+        for user_id in range(1, 101):
+            cache.invalidate_user(user_id)
+        self.assertEqual(len(cache._generations), 4)
+
+        cache.put((1, "2024-01-01", "2024-01-31", "en"), "stale report", generation)
+        self.assertEqual(len(cache.entries), 0)
+        cache.put((1, "2024-01-01", "2024-01-31", "en"), "report", cache.generation(1))
+        self.assertEqual(cache.get((1, "2024-01-01", "2024-01-31", "en")), "report")
+
+    async def test_slow_summary_is_skipped(self):
+        """
+        Test that the report is sent without a summary when the backend is too slow.
+        """
+        class SlowBackend(SummaryBackend):
+            async def summarize(self, digests):
+                await asyncio.sleep(10)
+
+        self.generate_report_cog.summarizer = Summarizer(SlowBackend())
+        self.generate_report_cog.config = dataclasses.replace(
+            self.generate_report_cog.config,
+            summaries=dataclasses.replace(
+                self.generate_report_cog.config.summaries, timeout=0.05
+            ),
+        )
+        await self.generate_report_cog.generate_report(
+            self.ctx, "2024-01-01", "2024-01-31", conn=self.mock_conn
+        )
+
+        self.assertEqual(self.ctx.send.call_count, 1)
+        self.assertIn("68.50", self.ctx.send.call_args.args[0])
+        await self.generate_report_cog.summarizer.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+import unittest
+import sys
+import os
+import tempfile
+import discord
+from unittest.mock import MagicMock, AsyncMock, patch
+from discord.ext import commands
+
+# Add the correct path for imports to include the src directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../src')))
+
+from commands.import_expenses import ImportExpenses
+from utils.lang import translate
+from src.utils.database import Database
+
+class TestImportExpenses(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        """
+        Set up a test bot backed by a temporary database and the
+        import cog before each test.
+        """
+        intents = discord.Intents.default()
+        self.bot = commands.Bot(command_prefix="!", intents=intents)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.bot.db = Database(os.path.join(self.tmpdir.name, "expenses.db"))
+        self.import_expenses_cog = ImportExpenses(self.bot)
+        await self.bot.add_cog(self.import_expenses_cog)
+        self.import_expenses_cog.languages.entries.put(1, "en")
+
+        self.message = MagicMock()
+        self.message.edit = AsyncMock()
+        self.ctx = MagicMock()
+        self.ctx.author.id = 1
+        self.ctx.send = AsyncMock(return_value=self.message)
+        self.ctx.message.attachments = []
+
+    async def asyncTearDown(self):
+        """
+        Clean up after each test.
+        """
+        self.bot.db.close()
+        self.tmpdir.cleanup()
+
+    def attach(self, filename, content):
+        """Attaches a file whose download yields `content`."""
+        attachment = MagicMock()
+        attachment.filename = filename
+        self.ctx.message.attachments = [attachment]
+
+        async def download(attachment, fp):
+            fp.write(content.encode("utf-8"))
+
+        patcher = patch('commands.import_expenses.download', side_effect=download)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def fetch_expenses(self):
+        return await self.bot.db.read(
+            lambda conn: conn.execute(
+                "SELECT user_id, amount, description, category, date_added FROM "
+                "expenses ORDER BY id"
+            ).fetchall()
+        )
+
+    async def test_import_csv(self):
+        """
+        Test importing a semicolon separated CSV file, skipping invalid rows.
+        """
+        self.attach("bank.csv", (
+            "Date;Amount;Description;Category\n"
+            "2024-01-05;12,50;Lunch;Food\n"
+            "2024-01-06;abc;Broken;Food\n"
+            "2024-01-07;40;Taxi;\n"
+        ))
+        await self.import_expenses_cog.import_expenses(self.ctx)
+
+        self.assertEqual(await self.fetch_expenses(), [
+            (1, 12.5, "Lunch", "Food", "2024-01-05 00:00:00"),
+            (1, 40.0, "Taxi", None, "2024-01-07 00:00:00"),
+        ])
+        self.ctx.send.assert_called_once_with(
+            translate("import_started", "en", filename="bank.csv")
+        )
+        self.message.edit.assert_called_with(
+            content="\n".join(
+                [
+                    translate(
+                        "import_finished",
+                        "en",
+                        filename="bank.csv",
+                        imported=2,
+                        invalid=1,
+                    ),
+                    translate(
+                        "import_invalid_row",
+                        "en",
+                        line=3,
+                        error="Invalid amount: 'abc'",
+                    ),
+                ]
+            )
+        )
+
+    async def test_import_jsonl_in_chunks_with_progress(self):
+        """
+        Test importing a JSON lines file in several transactions,
+        editing the progress message.
+        """
+        lines = [
+            f'{{"amount": {i + 1}, "description": "Expense {i}"}}' for i in range(25)
+        ]
+        self.attach("export.jsonl", "\n".join(lines) + "\nnot json\n")
+        written = []
+        self.bot.db.add_write_listener(written.append)
+
+        with patch('commands.import_expenses.IMPORT_CHUNK_SIZE', 10), \
+                patch('commands.import_expenses.PROGRESS_INTERVAL', 0):
+            await self.import_expenses_cog.import_expenses(self.ctx)
+
+        expenses = await self.fetch_expenses()
+        self.assertEqual(len(expenses), 25)
+        self.assertEqual(expenses[-1][1:3], (25.0, "Expense 24"))
+        self.assertEqual(written, [1])
+        progress = [call.kwargs["content"] for call in self.message.edit.call_args_list]
+        self.assertEqual(
+            progress[:2],
+            [
+                translate(
+                    "import_progress",
+                    "en",
+                    filename="export.jsonl",
+                    imported=10,
+                    invalid=0,
+                ),
+                translate(
+                    "import_progress",
+                    "en",
+                    filename="export.jsonl",
+                    imported=20,
+                    invalid=0,
+                ),
+            ],
+        )
+        self.assertTrue(
+            progress[-1].startswith(
+                translate(
+                    "import_finished",
+                    "en",
+                    filename="export.jsonl",
+                    imported=25,
+                    invalid=1,
+                )
+            )
+        )
+
+    async def test_missing_or_unsupported_attachment(self):
+        """
+        Test that the command explains what to attach.
+        """
+        await self.import_expenses_cog.import_expenses(self.ctx)
+        self.ctx.send.assert_called_with(translate("import_no_attachment", "en"))
+
+        self.attach("photo.png", "")
+        await self.import_expenses_cog.import_expenses(self.ctx)
+        self.ctx.send.assert_called_with(
+            translate("import_unsupported_format", "en", filename="photo.png")
+        )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,7 @@ import unittest
 import sys
 import os
 import sqlite3
+import tempfile
 import discord
 from unittest.mock import MagicMock, AsyncMock, patch
 from discord.ext import commands
@@ -11,8 +12,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../s
 
 from commands.list_expenses import ListExpenses
 from utils.lang import translate
-from utils.shared import user_language
 from utils.db import create_expenses_table
+from src.utils.database import Database
 
 class TestListExpenses(unittest.IsolatedAsyncioTestCase):
 
@@ -22,6 +23,8 @@ class TestListExpenses(unittest.IsolatedAsyncioTestCase):
         """
         intents = discord.Intents.default()
         self.bot = commands.Bot(command_prefix="!", intents=intents)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.bot.db = Database(os.path.join(self.tmpdir.name, "expenses.db"))
         self.list_expenses_cog = ListExpenses(self.bot)
         await self.bot.add_cog(self.list_expenses_cog)
         self.ctx = MagicMock()
@@ -30,7 +33,7 @@ class TestListExpenses(unittest.IsolatedAsyncioTestCase):
 
         # Set up an in-memory database for testing
         self.mock_conn = sqlite3.connect(':memory:')
-        
+
         # Create the expenses table in the in-memory database
         create_expenses_table(self.mock_conn)
 
@@ -39,14 +42,15 @@ class TestListExpenses(unittest.IsolatedAsyncioTestCase):
         Clean up after each test.
         """
         self.mock_conn.close()
+        self.bot.db.close()
+        self.tmpdir.cleanup()
 
-    @patch('utils.shared.user_language', new_callable=dict)
-    async def test_list_expenses_no_expenses(self, mock_user_language):
+    async def test_list_expenses_no_expenses(self):
         """
         Test listing expenses when no expenses are found.
         """
         # Set the user's language preference
-        mock_user_language[1] = "en"
+        self.list_expenses_cog.languages.entries.put(1, "en")
 
         # Ensure the database has no expenses
         cursor = self.mock_conn.cursor()
@@ -60,13 +64,12 @@ class TestListExpenses(unittest.IsolatedAsyncioTestCase):
         expected_message = translate("no_expenses_found", language="en")
         self.ctx.send.assert_called_with(expected_message)
 
-    @patch('utils.shared.user_language', new_callable=dict)
-    async def test_list_expenses_with_expenses(self, mock_user_language):
+    async def test_list_expenses_with_expenses(self):
         """
         Test listing expenses when expenses are present.
         """
         # Set the user's language preference
-        mock_user_language[1] = "en"
+        self.list_expenses_cog.languages.entries.put(1, "en")
 
         # Insert a mock expense into the database
         cursor = self.mock_conn.cursor()
@@ -84,18 +87,73 @@ class TestListExpenses(unittest.IsolatedAsyncioTestCase):
         # Call the command to list expenses
         await self.list_expenses_cog.list_expenses(self.ctx, conn=self.mock_conn)
 
-        # Construct the expected message dynamically
-        expected_message = translate("here_are_your_expenses", language="en") + "\n"
-        expected_message += f"ID: {expense_id}, Amount: {amount}, Description: {description}, Date Added: {date_added}\n"
+        # A single page is sent as an embed without page buttons
+        kwargs = self.ctx.send.call_args.kwargs
+        self.assertNotIn("view", kwargs)
+        embed = kwargs["embed"]
+        self.assertEqual(
+            embed.title, translate("here_are_your_expenses", language="en")
+        )
+        self.assertEqual(
+            embed.description,
+            f"ID: {expense_id}, Amount: {amount}, Description: {description}, Date "
+            f"Added: {date_added}",
+        )
+
+    async def test_list_expenses_pages(self):
+        """
+        Test browsing a listing longer than one page with the page buttons.
+        """
+        self.list_expenses_cog.languages.entries.put(1, "en")
 
-        self.ctx.send.assert_called_with(expected_message)
+        # Insert 25 expenses with distinct dates, oldest first
+        cursor = self.mock_conn.cursor()
+        for day in range(1, 26):
+            cursor.execute('''
+                INSERT INTO expenses
+                    (user_id, amount, description, category, date_added)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (1, float(day), f"Expense {day}", None, f"2024-01-{day:02d} 12:00:00"))
+        self.mock_conn.commit()
+
+        await self.list_expenses_cog.list_expenses(self.ctx, conn=self.mock_conn)
 
-    @patch('utils.shared.user_language', new_callable=dict)
-    async def test_list_expenses_db_error(self, mock_user_language):
+        # The first page holds the 10 newest expenses and comes with page buttons
+        kwargs = self.ctx.send.call_args.kwargs
+        view = kwargs["view"]
+        first_page = kwargs["embed"].description.split("\n")
+        self.assertEqual(len(first_page), 10)
+        self.assertIn("Description: Expense 25,", first_page[0])
+        self.assertTrue(view.previous_page.disabled)
+
+        interaction = MagicMock()
+        interaction.user.id = 1
+        interaction.response.edit_message = AsyncMock()
+
+        # Turn to the last page
+        await view.next_page.callback(interaction)
+        await view.next_page.callback(interaction)
+        last_page = interaction.response.edit_message.call_args.kwargs["embed"]
+        self.assertEqual(len(last_page.description.split("\n")), 5)
+        self.assertIn("Description: Expense 5,", last_page.description.split("\n")[0])
+        self.assertEqual(
+            last_page.footer.text, translate("page_footer", language="en", page=3)
+        )
+        self.assertTrue(view.next_page.disabled)
+
+        # And back to the second one
+        await view.previous_page.callback(interaction)
+        second_page = interaction.response.edit_message.call_args.kwargs[
+            "embed"
+        ].description.split("\n")
+        self.assertIn("Description: Expense 15,", second_page[0])
+        view.stop()
+
+    async def test_list_expenses_db_error(self):
         """
         Test listing expenses when the database connection fails.
         """
-        mock_user_language[1] = "en"
+        self.list_expenses_cog.languages.entries.put(1, "en")
 
         # Simulate a database connection failure by setting side_effect
         with patch('sqlite3.connect', side_effect=sqlite3.OperationalError("Unable to connect to the database")):
@@ -2,6 +2,7 @@ import unittest
 import sys
 import os
 import sqlite3
+import tempfile
 import discord
 from unittest.mock import MagicMock, AsyncMock, patch
 from discord.ext import commands
@@ -11,7 +12,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../s
 
 from commands.log_expense import LogExpense
 from utils.lang import translate
-from utils.shared import user_language
+from src.utils import db
+from src.utils.database import Database
 
 class TestLogExpense(unittest.IsolatedAsyncioTestCase):
 
@@ -21,6 +23,8 @@ class TestLogExpense(unittest.IsolatedAsyncioTestCase):
         """
         intents = discord.Intents.default()
         self.bot = commands.Bot(command_prefix="!", intents=intents)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.bot.db = Database(os.path.join(self.tmpdir.name, "expenses.db"))
         self.log_expense_cog = LogExpense(self.bot)
         await self.bot.add_cog(self.log_expense_cog)
         self.ctx = MagicMock()
@@ -45,14 +49,15 @@ class TestLogExpense(unittest.IsolatedAsyncioTestCase):
         """
         self.mock_conn.close()
         self.conn_patcher.stop()
+        self.bot.db.close()
+        self.tmpdir.cleanup()
 
-    @patch('utils.shared.user_language', new_callable=dict)
-    async def test_log_expense_success(self, mock_user_language):
+    async def test_log_expense_success(self):
         """
         Test logging an expense successfully.
         """
         # Set the user's language preference
-        mock_user_language[1] = "en"
+        self.log_expense_cog.languages.entries.put(1, "en")
 
         # Call the command to log an expense
         await self.log_expense_cog.log_expense(self.ctx, 100.0, description="Lunch at cafe", conn=self.mock_conn)
@@ -61,12 +66,166 @@ class TestLogExpense(unittest.IsolatedAsyncioTestCase):
         expected_message = translate("expense_logged", language="en", id=1, amount=100.0, description="Lunch at cafe")
         self.ctx.send.assert_called_with(expected_message)
 
-    @patch('utils.shared.user_language', new_callable=dict)
-    async def test_log_expense_error(self, mock_user_language):
+    async def test_log_expense_flags_duplicate(self):
+        """
+        Test that logging the same expense twice in a row warns
+        about a likely duplicate.
+        """
+        self.log_expense_cog.languages.entries.put(1, "en")
+
+        await self.log_expense_cog.log_expense(
+            self.ctx, 100.0, description="Lunch at cafe", conn=self.mock_conn
+        )
+        await self.log_expense_cog.log_expense(
+            self.ctx, 100.0, description="lunch at cafe", conn=self.mock_conn
+        )
+
+        expected_message = "\n".join(
+            [
+                translate(
+                    "expense_logged",
+                    language="en",
+                    id=2,
+                    amount=100.0,
+                    description="lunch at cafe",
+                ),
+                translate(
+                    "possible_duplicate", language="en", previous_id=1, minutes=0, id=2
+                ),
+            ]
+        )
+        self.ctx.send.assert_called_with(expected_message)
+
+    async def test_log_expense_suggests_category(self):
+        """
+        Test that an expense similar to an earlier categorized one is filed
+        under the same category.
+        """
+        self.log_expense_cog.languages.entries.put(1, "en")
+        self.mock_conn.execute(
+            "INSERT INTO expenses (user_id, amount, description, category) VALUES (1, "
+            "8.0, 'Lunch at cafe', 'Food')"
+        )
+
+        await self.log_expense_cog.log_expense(
+            self.ctx, 9.5, description="Lunch at the cafe", conn=self.mock_conn
+        )
+
+        expected_message = "\n".join(
+            [
+                translate(
+                    "expense_logged",
+                    language="en",
+                    id=2,
+                    amount=9.5,
+                    description="Lunch at the cafe",
+                ),
+                translate("category_suggested", language="en", category="Food"),
+            ]
+        )
+        self.ctx.send.assert_called_with(expected_message)
+        category = self.mock_conn.execute(
+            "SELECT category FROM expenses WHERE id = 2"
+        ).fetchone()[0]
+        self.assertEqual(category, "Food")
+
+    async def test_logged_expenses_keep_the_history_loaded(self):
+        """
+        Test that the validator loads a user's history once and records the expenses
+        logged after it, instead of reloading it after every insert.
+        """
+        self.log_expense_cog.languages.entries.put(1, "en")
+        with patch.object(
+            db, "list_expenses_page", wraps=db.list_expenses_page
+        ) as load_history:
+            for i in range(5):
+                await self.log_expense_cog.log_expense(
+                    self.ctx, 10.0 + i, description=f"Expense {i}"
+                )
+
+        self.assertEqual(load_history.call_count, 1)
+        history = self.log_expense_cog.validator.histories.get(1)
+        self.assertEqual(len(history.recent), 5)
+
+    async def test_on_message_logs_plain_language_expense(self):
+        """
+        Test that a plain-language expense message is logged with its date and category.
+        """
+        self.log_expense_cog.languages.entries.put(1, "en")
+        message = MagicMock()
+        message.author.id = 1
+        message.author.bot = False
+        message.clean_content = message.content = "spent 12.50 on lunch yesterday"
+        message.channel.send = AsyncMock()
+
+        await self.log_expense_cog.on_message(message, conn=self.mock_conn)
+
+        expected_message = "\n".join(
+            [
+                translate(
+                    "expense_logged",
+                    language="en",
+                    id=1,
+                    amount=12.5,
+                    description="lunch",
+                ),
+                translate("category_suggested", language="en", category="Food"),
+            ]
+        )
+        message.channel.send.assert_called_with(expected_message)
+        row = self.mock_conn.execute(
+            "SELECT amount, description, category, date(date_added) = date('now', '-1 "
+            "day') FROM expenses"
+        ).fetchone()
+        self.assertEqual(row, (12.5, "lunch", "Food", 1))
+
+    async def test_on_message_keeps_the_written_category(self):
+        """
+        Test that a category keyword in the message wins over the category suggested
+        from the user's history.
+        """
+        self.log_expense_cog.languages.entries.put(1, "en")
+        self.mock_conn.execute(
+            "INSERT INTO expenses (user_id, amount, description, category) "
+            "VALUES (1, 15.0, 'taxi', 'Nights out')"
+        )
+        message = MagicMock()
+        message.author.id = 1
+        message.author.bot = False
+        message.clean_content = message.content = "spent 12 on taxi"
+        message.channel.send = AsyncMock()
+
+        await self.log_expense_cog.on_message(message, conn=self.mock_conn)
+
+        category = self.mock_conn.execute(
+            "SELECT category FROM expenses WHERE id = 2"
+        ).fetchone()[0]
+        self.assertEqual(category, "Transport")
+
+    async def test_on_message_ignores_commands_and_chat(self):
+        """
+        Test that commands, bot messages and ordinary chat are not logged.
+        """
+        for content, is_bot in (
+            ("!log_expense 5 Bus", False),
+            ("spent 5 on bus", True),
+            ("see you later", False),
+        ):
+            message = MagicMock()
+            message.author.bot = is_bot
+            message.clean_content = message.content = content
+            message.channel.send = AsyncMock()
+            await self.log_expense_cog.on_message(message, conn=self.mock_conn)
+            message.channel.send.assert_not_called()
+        self.assertEqual(
+            self.mock_conn.execute("SELECT COUNT(*) FROM expenses").fetchone()[0], 0
+        )
+
+    async def test_log_expense_error(self):
         """
         Test logging an expense when the database connection fails.
         """
-        mock_user_language[1] = "en"
+        self.log_expense_cog.languages.entries.put(1, "en")
 
         # Simulate a database connection failure by setting side_effect
         with patch('sqlite3.connect', side_effect=sqlite3.OperationalError("Unable to connect to the database")):
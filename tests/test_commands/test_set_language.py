@@ -1,6 +1,8 @@
 import unittest
 import sys
 import os
+import sqlite3
+import tempfile
 import discord
 from unittest.mock import MagicMock, AsyncMock, patch
 
@@ -8,49 +10,109 @@ from unittest.mock import MagicMock, AsyncMock, patch
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 from src.commands.set_language import SetLanguage
+from src.utils import db
+from src.utils.database import Database
 from src.utils.lang import translate
+from src.utils.shared import LanguageCache
 from discord.ext import commands
 
 class TestSetLanguage(unittest.IsolatedAsyncioTestCase):
 
     async def asyncSetUp(self):
-        """Set up a test bot and language cog."""
+        """Set up a test bot, backed by a temporary database, and language cog."""
         intents = discord.Intents.default()
         self.bot = commands.Bot(command_prefix="!", intents=intents)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.bot.db = Database(os.path.join(self.tmpdir.name, "expenses.db"))
         self.set_language_cog = SetLanguage(self.bot)
         await self.bot.add_cog(self.set_language_cog)
         self.ctx = MagicMock()
         self.ctx.author.id = 1
         self.ctx.send = AsyncMock()
 
-    @patch('src.utils.shared.user_language', new_callable=dict)
-    async def test_set_language_to_english(self, mock_user_language):
+    async def asyncTearDown(self):
+        """Close the temporary database."""
+        self.bot.db.close()
+        self.tmpdir.cleanup()
+
+    async def test_set_language_to_english(self):
         """Test setting language to English."""
         # Call the command to set the language to English
         await self.set_language_cog.set_language(self.ctx, "en")
 
         # Verify that the user language has been set correctly
-        mock_user_language[self.ctx.author.id] = "en"  # Update the mocked dictionary
-        self.assertEqual(mock_user_language[self.ctx.author.id], "en")
+        self.assertEqual(
+            await self.set_language_cog.languages.get(self.ctx.author.id), "en"
+        )
 
         # Check that the appropriate message was sent
         expected_message = translate("language_set", language="en", language_value="en")
         self.ctx.send.assert_called_with(expected_message)
 
-    @patch('src.utils.shared.user_language', new_callable=dict)
-    async def test_set_language_to_spanish(self, mock_user_language):
+    async def test_set_language_to_spanish(self):
         """Test setting language to Spanish."""
         # Call the command to set the language to Spanish
         await self.set_language_cog.set_language(self.ctx, "es")
 
         # Verify that the user language has been set correctly
-        mock_user_language[self.ctx.author.id] = "es"  # Update the mocked dictionary
-        self.assertEqual(mock_user_language[self.ctx.author.id], "es")
+        self.assertEqual(
+            await self.set_language_cog.languages.get(self.ctx.author.id), "es"
+        )
 
         # Check that the appropriate message was sent
         expected_message = translate("language_set", language="es", language_value="es")
         self.ctx.send.assert_called_with(expected_message)
 
+    async def test_language_survives_restart(self):
+        """
+        A new cache (as after a restart) loads the saved
+        language from the database once.
+        """
+        await self.set_language_cog.set_language(self.ctx, "es")
+
+        languages = LanguageCache(self.bot.db)
+        with patch.object(self.bot.db, 'read', wraps=self.bot.db.read) as mock_read:
+            self.assertEqual(await languages.get(self.ctx.author.id, "en"), "es")
+            self.assertEqual(await languages.get(self.ctx.author.id, "en"), "es")
+            self.assertEqual(await languages.get(2, "en"), "en")
+            self.assertEqual(await languages.get(2, "en"), "en")
+            self.assertEqual(mock_read.call_count, 2)
+
+    async def test_failed_read_is_not_cached(self):
+        """
+        A preference that cannot be read falls back to the default without being
+        cached, so the next lookup reads it again.
+        """
+        await self.set_language_cog.set_language(self.ctx, "es")
+        get_user_language = db.get_user_language
+        # The first lookup runs on a database without the user_language table
+        missing_table = sqlite3.connect(":memory:")
+        self.addCleanup(missing_table.close)
+        broken = [missing_table]
+
+        def flaky_get_user_language(conn, user_id):
+            if broken:
+                conn = broken.pop()
+            return get_user_language(conn, user_id)
+
+        languages = LanguageCache(self.bot.db)
+        with patch.object(db, "get_user_language", flaky_get_user_language):
+            with self.assertLogs("src.utils.shared", "WARNING"):
+                self.assertEqual(await languages.get(self.ctx.author.id, "en"), "en")
+            self.assertEqual(await languages.get(self.ctx.author.id, "en"), "es")
+
+    async def test_language_not_cached_when_save_fails(self):
+        """The cache is only updated once the preference is saved."""
+        with patch.object(self.bot.db, 'write', AsyncMock(return_value=False)):
+            await self.set_language_cog.set_language(self.ctx, "es")
+        self.ctx.send.assert_called_with(
+            "There was an error saving your language preference. Please try again "
+            "later."
+        )
+        self.assertEqual(
+            await self.set_language_cog.languages.get(self.ctx.author.id, "en"), "en"
+        )
+
     async def test_invalid_language(self):
         """Test setting an unsupported language."""
         await self.set_language_cog.set_language(self.ctx, "fr")
@@ -0,0 +1,67 @@
+import unittest
+import sys
+import os
+import discord
+from unittest.mock import MagicMock, AsyncMock, patch
+from discord.ext import commands
+
+# Add the correct path for imports to include the src directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../src')))
+
+from commands.stats import Stats
+from src.utils.metrics import Metrics
+
+class TestStats(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        """
+        Set up a test bot and the stats cog with its own metrics.
+        """
+        intents = discord.Intents.default()
+        self.bot = commands.Bot(command_prefix="!", intents=intents)
+        self.metrics = Metrics()
+        self.stats_cog = Stats(self.bot, self.metrics)
+        await self.bot.add_cog(self.stats_cog)
+        self.ctx = MagicMock()
+        self.ctx.author.id = 1
+        self.ctx.bot = self.bot
+        self.ctx.send = AsyncMock()
+
+    async def test_stats_shows_the_latencies(self):
+        """
+        Test that the owner gets the latency table in a code block.
+        """
+        self.metrics.observe("command.list_expenses", 0.004)
+        self.metrics.observe("db.list_expenses_page", 0.001)
+
+        with patch.object(
+            self.bot, 'is_owner', new_callable=AsyncMock, return_value=True
+        ):
+            await self.stats_cog.stats(self.ctx)
+
+        message = self.ctx.send.call_args[0][0]
+        self.assertTrue(message.startswith("```"))
+        self.assertIn("command.list_expenses", message)
+        self.assertIn("db.list_expenses_page", message)
+
+    async def test_stats_fits_in_a_message(self):
+        """
+        Test that many histograms are cut down to fit in one Discord message.
+        """
+        for i in range(500):
+            self.metrics.observe(f"db.helper_{i}", 0.001)
+        await self.stats_cog.stats(self.ctx)
+        self.assertLessEqual(len(self.ctx.send.call_args[0][0]), 2000)
+
+    async def test_stats_is_owner_only(self):
+        """
+        Test that other users fail the owner check.
+        """
+        with patch.object(
+            self.bot, 'is_owner', new_callable=AsyncMock, return_value=False
+        ):
+            with self.assertRaises(commands.NotOwner):
+                await self.stats_cog.stats.can_run(self.ctx)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,7 @@ import unittest
 import sys
 import os
 import sqlite3
+import tempfile
 import discord
 from unittest.mock import MagicMock, AsyncMock, patch
 from discord.ext import commands
@@ -11,54 +12,44 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../s
 
 from commands.update_expense import UpdateExpense
 from utils.lang import translate
-from utils.shared import user_language
-from utils.db import create_expenses_table
+from src.utils import db
+from src.utils.database import Database
 
 class TestUpdateExpense(unittest.IsolatedAsyncioTestCase):
 
     async def asyncSetUp(self):
         """
-        Set up a test bot and update expense cog before each test.
+        Set up a test bot, backed by a temporary database, and update
+        expense cog before each test.
         """
         intents = discord.Intents.default()
         self.bot = commands.Bot(command_prefix="!", intents=intents)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.bot.db = Database(os.path.join(self.tmpdir.name, "expenses.db"))
         self.update_expense_cog = UpdateExpense(self.bot)
         await self.bot.add_cog(self.update_expense_cog)
         self.ctx = MagicMock()
         self.ctx.author.id = 1
         self.ctx.send = AsyncMock()
 
-        # Set up an in-memory database for testing
-        self.mock_conn = sqlite3.connect(':memory:')
-        
-        # Create the expenses table in the in-memory database
-        create_expenses_table(self.mock_conn)
-
     async def asyncTearDown(self):
         """
-        Clean up after each test.
+        Close the temporary database after each test.
         """
-        self.mock_conn.close()
+        self.bot.db.close()
+        self.tmpdir.cleanup()
 
-    @patch('utils.shared.user_language', new_callable=dict)
-    async def test_update_expense_success(self, mock_user_language):
+    async def test_update_expense_success(self):
         """
         Test updating an expense successfully.
         """
         # Set the user's language preference
-        mock_user_language[1] = "en"
-
-        # Insert a mock expense into the database
-        cursor = self.mock_conn.cursor()
-        cursor.execute('''
-            INSERT INTO expenses (user_id, amount, description, category, date_added)
-            VALUES (?, ?, ?, ?, datetime('now'))
-        ''', (1, 50.0, "Grocery shopping", "Groceries"))
-        self.mock_conn.commit()
+        self.update_expense_cog.languages.entries.put(1, "en")
 
-        # Retrieve the inserted expense ID for updating
-        cursor.execute("SELECT id FROM expenses WHERE user_id = ?", (1,))
-        expense_id = cursor.fetchone()[0]
+        # Insert an expense into the database
+        expense_id = await self.bot.db.write(
+            db.insert_expense, 1, 50.0, "Grocery shopping", "Groceries"
+        )
 
         # Call the command to update the expense
         await self.update_expense_cog.update_expense(self.ctx, expense_id, 100.0, new_description="Updated description")
@@ -68,16 +59,18 @@ class TestUpdateExpense(unittest.IsolatedAsyncioTestCase):
 
         # Check if the response was sent correctly
         self.ctx.send.assert_called_with(expected_message)
+        expense = (await self.bot.db.read(db.get_expenses_by_user, 1))[0]
+        self.assertEqual((expense[2], expense[3]), (100.0, "Updated description"))
 
-    @patch('utils.shared.user_language', new_callable=dict)
-    async def test_update_expense_db_error(self, mock_user_language):
+    async def test_update_expense_db_error(self):
         """
         Test updating an expense when the database connection fails.
         """
-        mock_user_language[1] = "en"
+        self.update_expense_cog.languages.entries.put(1, "en")
 
         # Simulate a database connection failure by setting side_effect
-        with patch('sqlite3.connect', side_effect=sqlite3.OperationalError("Unable to connect to the database")):
+        error = sqlite3.OperationalError("Unable to connect to the database")
+        with patch.object(self.bot.db, 'write', AsyncMock(side_effect=error)):
             # Call the command to update an expense
             await self.update_expense_cog.update_expense(self.ctx, 1, 100.0, new_description="Should fail")
 
@@ -1,8 +1,20 @@
 import unittest
 import sqlite3
 from src.utils.db import (
-    insert_budget, get_budget_by_category, update_budget, insert_expense, 
-    update_expense_category, get_expenses_by_category, create_expenses_table, create_budgets_table
+    insert_budget,
+    get_budget_by_category,
+    update_budget,
+    insert_expense,
+    insert_expenses,
+    update_expense_category,
+    get_expenses_by_category,
+    create_expenses_table,
+    create_budgets_table,
+    list_expenses_page,
+    iter_expense_pages,
+    page_key,
+    delete_expense,
+    get_expenses_by_user,
 )
 
 class TestDatabaseOperations(unittest.TestCase):
@@ -37,19 +49,64 @@ class TestDatabaseOperations(unittest.TestCase):
     def test_update_expense_category(self):
         # Insert an expense with a valid category
         insert_expense(self.conn, 1, 50.0, "Groceries", category="Groceries")
-        
+
         # Retrieve expenses before updating category
         expenses = get_expenses_by_category(self.conn, 1, "Groceries")
         self.assertGreater(len(expenses), 0, "No expenses found for user 1 before update")
-        
+
         # Update the expense category
         if expenses:
             expense_id = expenses[0][0]  # Get the ID of the inserted expense
             update_expense_category(self.conn, expense_id, "Food")
-        
+
             # Retrieve expenses after updating category
             categorized_expenses = get_expenses_by_category(self.conn, 1, "Food")
             self.assertGreater(len(categorized_expenses), 0, "Expense category update failed")
 
+    # Test for inserting several expenses in one transaction
+    def test_insert_expenses_returns_ids_in_order(self):
+        insert_expense(self.conn, 1, 1.0, "Existing")
+        expense_ids = insert_expenses(
+            self.conn, [(1, 10.0, "First", None), (2, 20.0, "Second", "Food")]
+        )
+        self.assertEqual(expense_ids, [2, 3])
+        row = self.conn.execute(
+            "SELECT user_id, amount, description FROM expenses WHERE id = ?", (3,)
+        ).fetchone()
+        self.assertEqual(row, (2, 20.0, "Second"))
+
+    # Test for keyset pagination of expenses
+    def test_list_expenses_page_uses_keyset_cursor(self):
+        for day in range(1, 6):
+            self.conn.execute(
+                "INSERT INTO expenses (user_id, amount, description, date_added) "
+                "VALUES (?, ?, ?, ?)",
+                (1, float(day), f"Day {day}", f"2024-01-0{day}"),
+            )
+        self.conn.commit()
+        first = list_expenses_page(self.conn, 1, 2)
+        self.assertEqual([row[3] for row in first], ["Day 5", "Day 4"])
+        second = list_expenses_page(self.conn, 1, 2, before=page_key(first[-1]))
+        self.assertEqual([row[3] for row in second], ["Day 3", "Day 2"])
+
+    # Test for iterating over every page of a user's expenses
+    def test_iter_expense_pages(self):
+        insert_expenses(
+            self.conn,
+            [(1, 1.0, f"Expense {i}", None) for i in range(5)]
+            + [(2, 1.0, "Other", None)],
+        )
+        pages = list(iter_expense_pages(self.conn, 1, 2))
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual(len({row[0] for page in pages for row in page}), 5)
+
+    # Test that deleting with a user_id only removes that user's expense
+    def test_delete_expense_checks_owner(self):
+        expense_id = insert_expense(self.conn, 1, 10.0, "Mine")
+        delete_expense(self.conn, expense_id, user_id=2)
+        self.assertEqual(len(get_expenses_by_user(self.conn, 1)), 1)
+        delete_expense(self.conn, expense_id, user_id=1)
+        self.assertEqual(get_expenses_by_user(self.conn, 1), [])
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,11 +1,14 @@
 import unittest
 import sys
 import os
+import json
+import tempfile
+from unittest.mock import patch
 
 # Add the 'src' directory to the system path
 sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
 
-from utils.lang import translate
+from utils.lang import translate, translations, Catalog
 
 class TestTranslation(unittest.TestCase):
 
@@ -24,6 +27,97 @@ class TestTranslation(unittest.TestCase):
         result = translate("invalid_key", "en")
         self.assertEqual(result, "")
 
+    def test_unknown_language_falls_back_to_english(self):
+        """Test that a language without a locale file uses English."""
+        result = translate("expense_deleted", "xx", id=3)
+        self.assertEqual(result, "Expense with ID 3 deleted.")
+
+    def test_missing_placeholder_value(self):
+        """Test that a missing placeholder value raises KeyError, as str.format does."""
+        with self.assertRaises(KeyError):
+            translate("expense_deleted", "en")
+
+
+class TestCatalog(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Create a temporary directory for the extra languages of the catalogs.
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_locale(self, language, templates):
+        with open(
+            os.path.join(self.tmpdir.name, f"{language}.json"), "w", encoding="utf-8"
+        ) as locale_file:
+            json.dump(templates, locale_file)
+
+    def test_languages_loaded_from_files_when_created(self):
+        """Test that the locale files are loaded when the catalog is created."""
+        self.write_locale("fr", {"expense_deleted": "Dépense {id} supprimée."})
+        catalog = Catalog(translations, locales_dir=self.tmpdir.name)
+        self.assertEqual(catalog.available_languages(), ["en", "es", "fr"])
+        self.assertEqual(
+            catalog.translate("expense_deleted", "fr", id=4), "Dépense 4 supprimée."
+        )
+        # Messages missing from the file fall back to English
+        self.assertEqual(
+            catalog.translate("no_expenses_found", "fr"), "No expenses found."
+        )
+
+    def test_translating_does_not_touch_the_file_system(self):
+        """
+        Test that listing the languages and translating, even to an unknown language,
+        neither lists nor opens files.
+        """
+        catalog = Catalog(translations, locales_dir=self.tmpdir.name)
+        with (
+            patch("os.listdir") as listdir,
+            patch("os.path.exists") as exists,
+            patch("builtins.open") as open_file,
+        ):
+            self.assertEqual(catalog.available_languages(), ["en", "es"])
+            self.assertEqual(
+                catalog.translate("expense_deleted", "de", id=5),
+                "Expense with ID 5 deleted.",
+            )
+        listdir.assert_not_called()
+        exists.assert_not_called()
+        open_file.assert_not_called()
+
+    def test_invalid_locale_file_is_rejected(self):
+        """Test that placeholders are validated when a language is loaded."""
+        self.write_locale("fr", {"expense_deleted": "Dépense {identifiant} supprimée."})
+        with self.assertLogs(level="ERROR"):
+            catalog = Catalog(translations, locales_dir=self.tmpdir.name)
+        with self.assertRaises(ValueError):
+            catalog.load_language("fr")
+        self.assertEqual(catalog.available_languages(), ["en", "es"])
+        self.assertEqual(
+            catalog.translate("expense_deleted", "fr", id=4),
+            "Expense with ID 4 deleted.",
+        )
+
+    def test_invalid_builtin_template_is_rejected(self):
+        """Test that positional placeholders are rejected at load time."""
+        with self.assertRaises(ValueError):
+            Catalog(
+                {"en": {"expense_deleted": "Expense {0} deleted."}},
+                locales_dir=self.tmpdir.name,
+            )
+
+    def test_templates_with_percent_signs_and_format_specs(self):
+        """Test that literal percent signs and format specs render like str.format."""
+        catalog = Catalog({"en": {
+            "discount": "{rate}% off",
+            "total": "Total: {amount:.2f} ({amount!r})",
+        }}, locales_dir=self.tmpdir.name)
+        self.assertEqual(catalog.translate("discount", rate=10), "10% off")
+        self.assertEqual(catalog.translate("total", amount=2.5), "Total: 2.50 (2.5)")
+
 
 if __name__ == '__main__':
     unittest.main()
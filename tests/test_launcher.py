@@ -0,0 +1,237 @@
+import asyncio
+import multiprocessing
+import os
+import queue
+import sqlite3
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from discord.ext import commands
+
+from src import launcher
+from src.launcher import Launcher, shard_ranges
+from src.utils.config import BotConfig, Config
+
+SHARD_COUNT = 4
+
+BOT_USER_ID = 1
+
+
+class FakeMessage:
+    """The message returned by `send`; only what the Cogs use of it."""
+
+    async def edit(self, **kwargs):
+        pass
+
+
+class ReplyContext(commands.Context):
+    """A Context whose replies are recorded instead of being sent to Discord."""
+
+    def __init__(self, **attrs):
+        super().__init__(**attrs)
+        self.replies = []
+
+    async def send(self, content=None, **kwargs):
+        embed = kwargs.get("embed")
+        self.replies.append(content if content is not None else embed.title)
+        view = kwargs.get("view")
+        if view is not None:
+            view.stop()  # Nobody turns the pages; don't keep their timeouts running
+        return FakeMessage()
+
+
+class FakeGateway:
+    """
+    Stands for the Discord gateway, locally: one queue of message events per shard.
+    A worker reads the queues of its own shards only, the way it would connect only
+    those shards to Discord, and reports which process answered each message.
+    """
+
+    def __init__(self, shard_count, context):
+        self.shards = [context.Queue() for _ in range(shard_count)]
+        self.replies = context.Queue()
+
+    def send(self, event_id, guild_id, user_id, content):
+        # Discord delivers the events of a guild to shard (guild_id >> 22) % shard_count
+        self.shards[(guild_id >> 22) % len(self.shards)].put(
+            (event_id, guild_id, user_id, content)
+        )
+
+    def reply(self, timeout=30):
+        return self.replies.get(timeout=timeout)
+
+    async def run(self, bot):
+        # What logging in and the READY event would do
+        bot._connection.user = SimpleNamespace(id=BOT_USER_ID, name="ExpenseBot")
+        await bot.setup_hook()
+        bot.dispatch("ready")
+        await asyncio.gather(*(self._read(bot, shard_id) for shard_id in bot.shard_ids))
+
+    async def _read(self, bot, shard_id):
+        while True:
+            event = await asyncio.to_thread(self._next, self.shards[shard_id])
+            if event is None:
+                continue
+            event_id, guild_id, user_id, content = event
+            message = SimpleNamespace(
+                content=content, author=SimpleNamespace(id=user_id, bot=False),
+                guild=SimpleNamespace(id=guild_id, filesize_limit=8 * 1024 * 1024),
+                channel=None, attachments=[], mentions=[], _state=None,
+            )
+            ctx = await bot.get_context(message, cls=ReplyContext)
+            await bot.invoke(ctx)
+            self.replies.put((event_id, shard_id, os.getpid(), ctx.replies))
+
+    @staticmethod
+    def _next(shard):
+        try:
+            return shard.get(timeout=0.1)
+        except queue.Empty:
+            return None
+
+
+def guild_on_shard(shard_id, n=0):
+    """Returns the ID of a guild whose events go to `shard_id`."""
+    return (shard_id + n * SHARD_COUNT) << 22
+
+
+class TestShardRanges(unittest.TestCase):
+
+    def test_shards_are_split_into_contiguous_ranges(self):
+        self.assertEqual(shard_ranges(4, 2), [[0, 1], [2, 3]])
+        self.assertEqual(shard_ranges(5, 3), [[0, 1], [2, 3], [4]])
+        self.assertEqual(shard_ranges(3, 1), [[0, 1, 2]])
+        with self.assertRaises(ValueError):
+            shard_ranges(2, 3)
+
+
+class TestMain(unittest.TestCase):
+
+    def setUp(self):
+        config = Config(bot=BotConfig(shard_count=2, processes=2))
+        for name, value in (
+            ("load_config", MagicMock(return_value=config)),
+            ("setup_logging_from_config", MagicMock()),
+            ("shutdown_logging", MagicMock()),
+            ("signal", MagicMock()),
+        ):
+            patcher = patch.object(launcher, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_main(self):
+        with (
+            self.assertRaises(SystemExit) as raised,
+            self.assertLogs("src.launcher", "ERROR"),
+        ):
+            launcher.main()
+        return raised.exception.code
+
+    def test_workers_are_stopped_when_starting_fails(self):
+        with patch.object(launcher, "Launcher") as launcher_class:
+            launcher_class.return_value.start.side_effect = OSError(
+                "Cannot start a process"
+            )
+            launcher_class.return_value.stop.return_value = [0]
+            self.assertEqual(self.run_main(), 1)
+        launcher_class.return_value.stop.assert_called_once()
+        launcher.shutdown_logging.assert_called_once()
+
+    def test_failure_before_the_workers_exist(self):
+        with patch.object(
+            launcher,
+            "Launcher",
+            side_effect=ValueError("processes must be between 1 and shard_count"),
+        ):
+            self.assertEqual(self.run_main(), 1)
+        launcher.shutdown_logging.assert_called_once()
+
+
+class TestLauncher(unittest.TestCase):
+
+    def setUp(self):
+        """Point the workers at a temporary database; they inherit the environment."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "expenses.db")
+        self.environ = patch.dict(os.environ, {
+            "EXPENSE_BOT_DATABASE_PATH": self.path,
+            "EXPENSE_BOT_LOGGING_LEVEL": "WARNING",
+        })
+        self.environ.start()
+        self.gateway = FakeGateway(SHARD_COUNT, multiprocessing.get_context("spawn"))
+        self.launcher = Launcher(
+            SHARD_COUNT, 2, gateway=self.gateway, shutdown_timeout=15
+        )
+
+    def tearDown(self):
+        self.launcher.stop()
+        self.environ.stop()
+        self.tmpdir.cleanup()
+
+    def test_commands_are_spread_across_processes(self):
+        """
+        Each worker answers the messages of its own shards, all
+        writing to the same database.
+        """
+        self.assertTrue(self.launcher.start())
+        for event_id in range(40):
+            self.gateway.send(
+                event_id,
+                guild_on_shard(event_id % SHARD_COUNT, event_id // SHARD_COUNT),
+                100 + event_id % 10,
+                f"!log_expense {event_id + 1} Coffee",
+            )
+        replies = [self.gateway.reply() for _ in range(40)]
+
+        pids = {
+            shard_id: process.pid
+            for process, shard_ids in zip(
+                self.launcher.workers, self.launcher.shard_ranges
+            )
+            for shard_id in shard_ids
+        }
+        self.assertEqual(
+            sorted(event_id for event_id, _, _, _ in replies), list(range(40))
+        )
+        for event_id, shard_id, pid, messages in replies:
+            self.assertEqual(shard_id, event_id % SHARD_COUNT)
+            self.assertEqual(pid, pids[shard_id])
+            self.assertIn("Expense logged with ID", messages[0])
+        self.assertEqual(len({pid for _, _, pid, _ in replies}), 2)
+
+        # Coordinated shutdown: every worker writes out its expenses and exits cleanly
+        self.assertEqual(self.launcher.stop(), [0, 0])
+        with sqlite3.connect(self.path) as conn:
+            self.assertEqual(
+                conn.execute("SELECT COUNT(*) FROM expenses").fetchone()[0], 40
+            )
+
+    def test_caches_follow_the_writes_of_other_workers(self):
+        """
+        A language set through one worker is used by the other one,
+        which had cached the old one.
+        """
+        self.assertTrue(self.launcher.start())
+        other_guild, own_guild = guild_on_shard(SHARD_COUNT - 1), guild_on_shard(0)
+
+        self.gateway.send(0, other_guild, 7, "!list_expenses")
+        self.assertEqual(self.gateway.reply()[3], ["No expenses found."])
+        self.gateway.send(1, own_guild, 7, "!set_language es")
+        self.gateway.reply()
+
+        # The invalidation travels between the processes while the commands go on
+        deadline = time.monotonic() + 10
+        while True:
+            self.gateway.send(2, other_guild, 7, "!list_expenses")
+            messages = self.gateway.reply()[3]
+            if messages != ["No expenses found."] or time.monotonic() > deadline:
+                break
+            time.sleep(0.05)
+        self.assertEqual(messages, ["No se encontraron gastos."])
+
+
+if __name__ == "__main__":
+    unittest.main()
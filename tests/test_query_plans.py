@@ -0,0 +1,129 @@
+import inspect
+import sqlite3
+import unittest
+
+from src.utils import db
+
+# Functions in db.py that only manage connections or the schema, or run no query
+NON_QUERY_FUNCTIONS = {
+    "connect_db",
+    "create_expenses_table",
+    "create_budgets_table",
+    "create_user_language_table",
+    "create_expense_totals_table",
+    "create_indexes",
+    "set_id_floor",
+    "page_key",
+}
+
+# Arguments (after the connection) that exercise every query in db.py.
+# A new query function must be added here, otherwise the coverage test fails.
+SAMPLE_CALLS = {
+    "set_user_language": (1, "en"),
+    "get_user_language": (1,),
+    "insert_expense": (1, 10.0, "Lunch", "Food"),
+    "insert_expenses": ([(1, 5.0, "Bus", "Transport")],),
+    "import_expenses": ([(1, 5.0, "Bus", "Transport", "2024-01-02 08:00:00")],),
+    "delete_expense": (99,),
+    "update_expense": (1, 12.0, "Dinner"),
+    "update_expense_category": (1, "Food"),
+    "get_expenses_by_user": (1,),
+    "get_expenses_by_category": (1, "Food", "2024-01-01", "2024-12-31"),
+    "list_expenses": (1,),
+    "list_expenses_page": (1, 10, ("2024-06-01 00:00:00", 50)),
+    "iter_expense_pages": (1, 1),
+    "iter_expenses": (1, 1),
+    "insert_budget": (1, "Food", 100.0, "monthly", "2024-01-01", "2024-01-31"),
+    "get_budget_by_category": (1, "Food"),
+    "update_budget": (1, 200.0),
+    "get_total_expenses": (1, "Food", "2024-01-01", "2024-03-31"),
+    "check_budget_status": (1, "Food"),
+    "generate_expense_report": (1, "2024-01-01", "2024-01-31"),
+    "get_expense_series": (1, "2024-01-01"),
+    "get_categorized_descriptions": (1, 100),
+    "check_user_budgets": (1, "2024-01-15"),
+    "rebuild_expense_totals": (),
+    "find_expense_totals_drift": (),
+}
+
+# Maintenance functions that recompute aggregates from every raw row by design
+FULL_SCAN_ALLOWED = {"rebuild_expense_totals", "find_expense_totals_drift"}
+
+
+def explain(conn, sql):
+    """Returns the detail column of EXPLAIN QUERY PLAN for a statement."""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def find_full_scans(conn, fn, *args):
+    """
+    Runs a db.py function and returns (sql, plan detail) for every statement it
+    executed that falls back to scanning a whole table.
+    """
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        result = fn(conn, *args)
+        if inspect.isgenerator(result):
+            list(result)
+    finally:
+        conn.set_trace_callback(None)
+
+    scans = []
+    for sql in statements:
+        if not sql.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+            continue
+        for detail in explain(conn, sql):
+            if detail.startswith("SCAN") and detail != "SCAN CONSTANT ROW":
+                scans.append((sql.strip(), detail))
+    return scans
+
+
+def query_functions():
+    """Returns the public query functions defined in db.py."""
+    return {
+        name: fn
+        for name, fn in inspect.getmembers(db, inspect.isfunction)
+        if fn.__module__ == db.__name__
+        and not name.startswith("_")
+        and name not in NON_QUERY_FUNCTIONS
+    }
+
+
+class TestQueryPlans(unittest.TestCase):
+
+    def setUp(self):
+        """Set up an in-memory database with the full schema and a few rows."""
+        self.conn = sqlite3.connect(':memory:')
+        db.create_expenses_table(self.conn)
+        db.create_budgets_table(self.conn)
+        db.create_user_language_table(self.conn)
+        db.create_expense_totals_table(self.conn)
+        db.create_indexes(self.conn)
+        for user_id in range(1, 4):
+            db.insert_expense(self.conn, user_id, 10.0, "Seed", "Food")
+            db.insert_budget(
+                self.conn, user_id, "Food", 100.0, "monthly", "2024-01-01", "2024-01-31"
+            )
+
+    def tearDown(self):
+        """Close the connection after each test."""
+        self.conn.close()
+
+    def test_every_query_function_is_checked(self):
+        """Every query function in db.py must have a sample call."""
+        self.assertEqual(set(query_functions()), set(SAMPLE_CALLS))
+
+    def test_no_query_scans_a_full_table(self):
+        """No query in db.py may fall back to a full table SCAN."""
+        for name, fn in query_functions().items():
+            if name in FULL_SCAN_ALLOWED:
+                continue
+            with self.subTest(function=name):
+                self.assertEqual(
+                    find_full_scans(self.conn, fn, *SAMPLE_CALLS[name]), []
+                )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+import asyncio
+import unittest
+
+from src.utils.ai import (
+    Summarizer,
+    SummaryBackend,
+    TemplateBackend,
+    digest_key,
+    report_digest,
+)
+from src.utils.config import ConfigError, SummaryConfig
+from src.utils.lang import translate
+
+ROWS = [("Transport", 40.0, 1), ("Food", 25.5, 2), (None, 3.0, 1)]
+
+
+class RecordingBackend(SummaryBackend):
+    """
+    Summarizes every digest as its total, recording the batches
+    and the peak concurrency.
+    """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+        self.running = 0
+        self.peak = 0
+
+    async def summarize(self, digests):
+        self.batches.append(len(digests))
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(self.delay)
+        self.running -= 1
+        return [f"{digest['language']}:{digest['total']}" for digest in digests]
+
+
+def digest(total, language="en"):
+    return report_digest([("Food", total, 1)], "2024-01-01", "2024-01-31", language)
+
+
+class TestDigest(unittest.TestCase):
+
+    def test_report_digest(self):
+        """
+        The digest aggregates the report rows, with each category's share of the total.
+        """
+        result = report_digest(ROWS, "2024-01-01", "2024-01-31", "en")
+        self.assertEqual((result["total"], result["count"]), (68.5, 4))
+        self.assertEqual(
+            result["categories"][0],
+            {"category": "Transport", "total": 40.0, "count": 1, "share": 58.4},
+        )
+
+    def test_digest_key(self):
+        """
+        Identical inputs hash the same, whatever the key order; different inputs do not.
+        """
+        self.assertEqual(digest_key({"a": 1, "b": [2]}), digest_key({"b": [2], "a": 1}))
+        self.assertNotEqual(digest_key(digest(10.0)), digest_key(digest(10.0, "es")))
+
+    def test_summary_config(self):
+        """Unknown backends are rejected."""
+        self.assertIsNone(Summarizer.from_config(SummaryConfig(backend="none")))
+        self.assertIsInstance(
+            Summarizer.from_config(SummaryConfig()).backend, TemplateBackend
+        )
+        with self.assertRaises(ConfigError):
+            SummaryConfig(backend="gpt")
+
+    def test_backends_must_summarize(self):
+        """A backend without a summarize method cannot be created."""
+        class IncompleteBackend(SummaryBackend):
+            pass
+
+        with self.assertRaises(TypeError):
+            IncompleteBackend()
+
+
+class TestSummarizer(unittest.IsolatedAsyncioTestCase):
+
+    async def test_template_backend_is_deterministic(self):
+        """The local backend fills the translated summary template."""
+        summarizer = Summarizer(TemplateBackend())
+        summary = await summarizer.summarize(
+            report_digest(ROWS, "2024-01-01", "2024-01-31", "es")
+        )
+        self.assertEqual(
+            summary,
+            translate(
+                "report_summary",
+                "es",
+                total="68.50",
+                count=4,
+                average="17.12",
+                category="Transport",
+                share="58",
+            ),
+        )
+
+    async def test_requests_are_batched(self):
+        """
+        Requests arriving together reach the backend as one batch, each
+        getting its own summary.
+        """
+        backend = RecordingBackend()
+        summarizer = Summarizer(backend, batch_window_ms=10)
+        summaries = await asyncio.gather(
+            *(summarizer.summarize(digest(total)) for total in (1.0, 2.0, 3.0))
+        )
+        self.assertEqual(summaries, ["en:1.0", "en:2.0", "en:3.0"])
+        self.assertEqual(backend.batches, [3])
+
+    async def test_identical_inputs_are_deduplicated_and_cached(self):
+        """
+        Concurrent identical inputs share one summary, which is
+        then served from the cache.
+        """
+        backend = RecordingBackend()
+        summarizer = Summarizer(backend)
+        summaries = await asyncio.gather(
+            summarizer.summarize(digest(5.0)), summarizer.summarize(digest(5.0))
+        )
+        self.assertEqual(summaries, ["en:5.0", "en:5.0"])
+        self.assertEqual(await summarizer.summarize(digest(5.0)), "en:5.0")
+        self.assertEqual(backend.batches, [1])
+
+    async def test_concurrency_is_bounded(self):
+        """No more than max_concurrency batches run at once."""
+        backend = RecordingBackend(delay=0.01)
+        summarizer = Summarizer(
+            backend, batch_window_ms=0, max_batch_size=1, max_concurrency=2
+        )
+        await asyncio.gather(
+            *(summarizer.summarize(digest(float(total))) for total in range(6))
+        )
+        self.assertEqual(backend.batches, [1] * 6)
+        self.assertEqual(backend.peak, 2)
+
+    async def test_backend_errors_reach_every_caller(self):
+        """A failing batch fails its requests and is not cached."""
+        class FailingBackend(SummaryBackend):
+            calls = 0
+
+            async def summarize(self, digests):
+                self.calls += 1
+                raise RuntimeError("model unavailable")
+
+        backend = FailingBackend()
+        summarizer = Summarizer(backend)
+        with self.assertLogs(level="ERROR"):
+            results = await asyncio.gather(
+                summarizer.summarize(digest(1.0)),
+                summarizer.summarize(digest(2.0)),
+                return_exceptions=True,
+            )
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+        with self.assertLogs(level="ERROR"), self.assertRaises(RuntimeError):
+            await summarizer.summarize(digest(1.0))
+        self.assertEqual(backend.calls, 2)
+
+    async def test_timed_out_caller_does_not_cancel_others(self):
+        """A caller giving up leaves the shared summary running for the others."""
+        summarizer = Summarizer(RecordingBackend(delay=0.05))
+        waiting = asyncio.ensure_future(summarizer.summarize(digest(7.0)))
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(summarizer.summarize(digest(7.0)), 0.01)
+        self.assertEqual(await waiting, "en:7.0")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import sqlite3
+import unittest
+from datetime import date, timedelta
+
+try:
+    import numpy as np
+except ImportError:
+    raise unittest.SkipTest("numpy is not installed")
+
+from src.utils import analytics, db
+from src.utils.analytics import ExpenseSeries, day_number
+
+
+class TestAnalytics(unittest.TestCase):
+
+    def setUp(self):
+        """A series with two categories over ten days starting on 2024-01-01."""
+        self.start = day_number(date(2024, 1, 1))
+        rows = []
+        for offset in range(10):
+            # Grows by 1 per day
+            rows.append((self.start + offset, 10.0 + offset, "Food"))
+            if offset % 2 == 0:
+                rows.append((self.start + offset, 5.0, "Transport"))
+        rows.append((self.start - 1, 100.0, "Food"))  # Before the window
+        self.series = ExpenseSeries.from_rows(rows)
+
+    def test_daily_totals(self):
+        """Amounts are summed per category and day inside the window only."""
+        daily = analytics.daily_totals(self.series, self.start, 10)
+        self.assertEqual(list(self.series.categories), ["Food", "Transport"])
+        np.testing.assert_allclose(daily[0], np.arange(10, 20))
+        np.testing.assert_allclose(daily[1], [5, 0] * 5)
+
+    def test_rolling_totals(self):
+        """Rolling totals cover the last `window` days."""
+        rolling = analytics.rolling_totals(np.array([[1.0, 2, 3, 4, 5]]), 3)
+        np.testing.assert_allclose(rolling, [[1, 3, 6, 9, 12]])
+
+    def test_linear_trend_recovers_a_line(self):
+        """An exactly linear series gives back its slope and intercept."""
+        daily = analytics.daily_totals(self.series, self.start, 10)
+        slope, intercept = analytics.linear_trend(daily)
+        self.assertAlmostEqual(slope[0], 1.0)
+        self.assertAlmostEqual(intercept[0], 10.0)
+        self.assertAlmostEqual(slope[1], -5 / 33)
+        np.testing.assert_allclose(
+            analytics.predict_total(slope[:1], intercept[:1], 10, 12), [20 + 21]
+        )
+
+    def test_predictions_are_never_negative(self):
+        """A falling trend stops at zero instead of predicting refunds."""
+        total = analytics.predict_total(np.array([-10.0]), np.array([5.0]), 0, 5)
+        np.testing.assert_allclose(total, [5.0])
+
+    def test_forecast(self):
+        """The forecast projects this month's spending to the end of the month."""
+        today = date(2024, 1, 10)
+        results = analytics.forecast(
+            self.series, today, history_days=10, window_days=7, horizon_days=3
+        )
+        food = results[0]
+        self.assertEqual(food["category"], "Food")
+        self.assertAlmostEqual(food["spent_this_month"], sum(range(10, 20)))
+        self.assertAlmostEqual(food["recent_total"], sum(range(13, 20)))
+        self.assertAlmostEqual(food["trend_per_day"], 1.0)
+        # 21 days left in January, following the trend 20, 21, ... 40
+        self.assertAlmostEqual(
+            food["projected_month_total"], sum(range(10, 20)) + sum(range(20, 41))
+        )
+        self.assertAlmostEqual(food["forecast_total"], 20 + 21 + 22)
+
+    def test_load_series_from_database(self):
+        """Expenses are loaded with one query into arrays of day numbers."""
+        conn = sqlite3.connect(':memory:')
+        db.create_expenses_table(conn)
+        conn.executemany(
+            "INSERT INTO expenses (user_id, amount, description, category, "
+            "date_added) VALUES (?, ?, ?, ?, ?)",
+            [
+                (1, 3.0, "Old", "Food", "2023-12-01 08:00:00"),
+                (1, 4.0, "New", None, "2024-01-02 23:59:59"),
+                (2, 9.0, "Other user", "Food", "2024-01-02 10:00:00"),
+            ],
+        )
+        series = analytics.load_series(conn, 1, "2024-01-01")
+        conn.close()
+        self.assertEqual(series.days.tolist(), [day_number(date(2024, 1, 2))])
+        self.assertEqual(series.amounts.tolist(), [4.0])
+        self.assertEqual(series.categories.tolist(), [""])
+
+    def test_empty_series(self):
+        """A user without expenses has no forecast."""
+        self.assertEqual(
+            analytics.forecast(ExpenseSeries.from_rows([]), date.today()), []
+        )
+
+    def test_history_start_covers_the_month(self):
+        """The loaded history always includes the whole current month."""
+        self.assertEqual(
+            analytics.history_start(date(2024, 1, 31), 10), date(2024, 1, 1)
+        )
+        self.assertEqual(
+            analytics.history_start(date(2024, 3, 5), 90),
+            date(2024, 3, 5) - timedelta(days=89),
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
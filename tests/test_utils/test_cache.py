@@ -0,0 +1,31 @@
+import unittest
+
+from src.utils.cache import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        """The least recently used entry is evicted once the cache is full."""
+        evicted = []
+        cache = LRUCache(2, on_evict=lambda key, value: evicted.append(key))
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        self.assertEqual(evicted, ["b"])
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+
+    def test_counts_hits_and_misses(self):
+        """Lookups are counted to report the hit rate."""
+        cache = LRUCache(2)
+        cache.put("a", None)
+        self.assertIsNone(cache.get("a", "default"))
+        self.assertEqual(cache.get("b", "default"), "default")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(cache.hit_rate, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import dataclasses
+import os
+import tempfile
+import unittest
+
+from src.utils.config import Config, ConfigError, load_config, parse_config, read_config
+from src.utils.database import DEFAULT_POOL_SIZE
+
+
+class TestConfig(unittest.TestCase):
+
+    def setUp(self):
+        """Create a temporary directory for configuration files."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "config.yaml")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, text):
+        with open(self.path, "w") as config_file:
+            config_file.write(text)
+
+    def test_missing_file_uses_defaults(self):
+        """A missing file yields the defaults of every subsystem."""
+        config = read_config(self.path, environ={})
+        self.assertEqual(config, Config())
+        self.assertEqual(config.database.pool_size, DEFAULT_POOL_SIZE)
+
+    def test_file_values_are_typed(self):
+        """Sections of the file become typed, immutable objects."""
+        self.write(
+            'bot:\n  prefix: "?"\n  token: "abc"\n'
+            'default_language: "es"\n'
+            'database:\n  pool_size: 8\n  batch_window_ms: 2\n'
+            'caches:\n  report_cache_size: 32\n'
+        )
+        config = read_config(self.path, environ={})
+        self.assertEqual(config.bot.prefix, "?")
+        self.assertEqual(config.default_language, "es")
+        self.assertEqual(config.database.pool_size, 8)
+        self.assertEqual(config.database.batch_window_ms, 2.0)
+        self.assertIsInstance(config.database.batch_window_ms, float)
+        self.assertEqual(config.caches.report_cache_size, 32)
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            config.database.pool_size = 1
+
+    def test_environment_overrides_file(self):
+        """
+        EXPENSE_BOT_* variables override the file and are
+        converted to the declared type.
+        """
+        self.write('bot:\n  token: "from-file"\ndatabase:\n  pool_size: 8\n')
+        config = read_config(self.path, environ={
+            "EXPENSE_BOT_BOT_TOKEN": "from-env",
+            "EXPENSE_BOT_DATABASE_POOL_SIZE": "2",
+            "EXPENSE_BOT_SCHEDULER_BUDGET_INTERVAL": "30",
+        })
+        self.assertEqual(config.bot.token, "from-env")
+        self.assertEqual(config.database.pool_size, 2)
+        self.assertEqual(config.scheduler.budget_interval, 30.0)
+
+    def test_invalid_values_are_rejected(self):
+        """Wrong types, out of range values and unknown keys raise ConfigError."""
+        for data, environ in [
+            ({"database": {"pool_size": "many"}}, {}),
+            ({"database": {"pool_size": True}}, {}),
+            ({"database": {"pool_size": 0}}, {}),
+            ({"database": {"synchronous": "fast"}}, {}),
+            ({"database": {"pool_sise": 2}}, {}),
+            ({"bot": "!"}, {}),
+            ({"bot": {"processes": 0}}, {}),
+            ({"bot": {"processes": 4, "shard_count": 2}}, {}),
+            ({}, {"EXPENSE_BOT_CACHES_LANGUAGE_CACHE_SIZE": "big"}),
+        ]:
+            with self.subTest(data=data, environ=environ):
+                with self.assertRaises(ConfigError):
+                    parse_config(data, environ)
+
+    def test_load_config_is_read_once(self):
+        """Every caller shares the same Config object."""
+        self.write('default_language: "es"\n')
+        config = load_config(self.path)
+        os.remove(self.path)
+        self.assertIs(load_config(self.path), config)
+        load_config.cache_clear()
+
+
+if __name__ == '__main__':
+    unittest.main()
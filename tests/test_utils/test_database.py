@@ -0,0 +1,472 @@
+import asyncio
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.utils import db
+from src.utils.config import Config, DatabaseConfig
+from src.utils.database import (
+    SHARD_ID_SPACING,
+    Database,
+    ShardedDatabase,
+    get_database,
+    open_database,
+    shard_index,
+    shard_paths,
+)
+from src.utils.shared import get_language_cache
+from src.migrations.migrate_database import check_expense_totals, reshard
+
+
+class TestDatabase(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        """Create a database service backed by a temporary file."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "expenses.db")
+        self.database = Database(self.path, pool_size=2)
+
+    async def asyncTearDown(self):
+        """Close the pool and remove the temporary file."""
+        self.database.close()
+        self.tmpdir.cleanup()
+
+    async def test_write_then_read_against_created_schema(self):
+        """Writes and reads share a freshly created schema."""
+        expense_id = await self.database.write(db.insert_expense, 1, 10.0, "Coffee")
+        expenses = await self.database.read(db.list_expenses, 1)
+        self.assertEqual(expenses[0][0], expense_id)
+
+    async def test_queries_execute_off_the_event_loop(self):
+        """Neither reads nor writes may run on the event loop thread."""
+        loop_thread = threading.get_ident()
+        reader_thread = await self.database.read(lambda conn: threading.get_ident())
+        writer_thread = await self.database.write(lambda conn: threading.get_ident())
+        self.assertNotEqual(reader_thread, loop_thread)
+        self.assertNotEqual(writer_thread, loop_thread)
+
+    async def test_writes_are_serialized_on_one_thread(self):
+        """Every write runs on the same dedicated writer thread."""
+        threads = await asyncio.gather(
+            *(
+                self.database.write(lambda conn: threading.get_ident())
+                for _ in range(20)
+            )
+        )
+        self.assertEqual(len(set(threads)), 1)
+
+    async def test_pragmas_are_applied(self):
+        """Connections use WAL and the configured pragmas."""
+        journal_mode = await self.database.read(
+            lambda conn: conn.execute("PRAGMA journal_mode").fetchone()[0]
+        )
+        synchronous = await self.database.write(
+            lambda conn: conn.execute("PRAGMA synchronous").fetchone()[0]
+        )
+        self.assertEqual(journal_mode, "wal")
+        self.assertEqual(synchronous, 1)  # NORMAL
+
+    async def test_mixed_load_stress(self):
+        """Concurrent writes and reads complete without "database is locked" errors."""
+        writes = [
+            self.database.write(db.insert_expense, user_id % 10, 1.0, "Stress")
+            for user_id in range(300)
+        ]
+        reads = [
+            self.database.read(db.list_expenses, user_id % 10) for user_id in range(300)
+        ]
+        results = await asyncio.gather(*writes, *reads)
+        self.assertNotIn(None, results[:300])
+        total = await self.database.read(
+            lambda conn: conn.execute("SELECT COUNT(*) FROM expenses").fetchone()[0]
+        )
+        self.assertEqual(total, 300)
+
+    async def test_batched_inserts_share_one_transaction(self):
+        """
+        Inserts arriving together are committed in one batch, each
+        caller getting its own ID.
+        """
+        batches = []
+        write = self.database.write
+
+        async def counting_write(fn, *args, **kwargs):
+            if fn is db.insert_expenses:
+                batches.append(len(args[0]))
+            return await write(fn, *args, **kwargs)
+
+        self.database.write = counting_write
+        expense_ids = await asyncio.gather(
+            *(
+                self.database.insert_expense(1, float(i), f"Expense {i}")
+                for i in range(20)
+            )
+        )
+
+        self.assertEqual(batches, [20])
+        self.assertEqual(len(set(expense_ids)), 20)
+        rows = await self.database.read(
+            lambda conn: dict(conn.execute("SELECT id, description FROM expenses"))
+        )
+        for i, expense_id in enumerate(expense_ids):
+            self.assertEqual(rows[expense_id], f"Expense {i}")
+
+    async def test_batch_is_capped_at_max_rows(self):
+        """A batch never exceeds the configured number of rows."""
+        self.database.batcher.max_rows = 8
+        batches = []
+        write = self.database.write
+
+        async def counting_write(fn, *args, **kwargs):
+            batches.append(len(args[0]))
+            return await write(fn, *args, **kwargs)
+
+        self.database.write = counting_write
+        await asyncio.gather(
+            *(self.database.insert_expense(1, 1.0, "Capped") for _ in range(20))
+        )
+        self.assertEqual(batches, [8, 8, 4])
+
+    async def test_write_listeners_receive_the_written_user(self):
+        """
+        Writes, including batched inserts, notify listeners with the user they touched.
+        """
+        written = []
+        self.database.add_write_listener(written.append)
+        expense_id = await self.database.insert_expense(7, 1.0, "Batched")
+        await self.database.write(db.delete_expense, expense_id, user_id=8)
+        await self.database.write(db.update_budget, 1, 10.0)  # No user_id argument
+        self.assertEqual(written, [7, 8])
+
+        self.database.remove_write_listener(written.append)
+        await self.database.insert_expense(9, 1.0, "Unheard")
+        self.assertEqual(written, [7, 8])
+
+    async def test_write_listeners_can_skip_logged_inserts(self):
+        """A listener registered with inserts=False only hears the other writes."""
+        written = []
+        self.database.add_write_listener(written.append, inserts=False)
+        expense_id = await self.database.insert_expense(7, 1.0, "Recorded elsewhere")
+        await self.database.write(db.delete_expense, expense_id, user_id=7)
+        self.database.notify_write({8})  # e.g. an import
+        self.assertEqual(written, [7, 8])
+
+    def test_rejects_unknown_pragma_values(self):
+        """Pragma values are validated since they cannot be bound as parameters."""
+        with self.assertRaises(ValueError):
+            Database(self.path, synchronous="fast; DROP TABLE expenses")
+
+    async def test_pool_is_bounded(self):
+        """Concurrent queries never open more connections than the pool size."""
+        seen = set()
+
+        def query(conn):
+            seen.add(id(conn))
+            return conn.execute("SELECT 1").fetchone()
+
+        await asyncio.gather(*(self.database.read(query) for _ in range(50)))
+        self.assertLessEqual(len(seen), 2)
+
+    async def test_explicit_connection_bypasses_pool(self):
+        """An explicit connection bypasses the pool (used by the tests)."""
+        conn = sqlite3.connect(':memory:')
+        db.create_expenses_table(conn)
+        expense_id = await self.database.write(
+            db.insert_expense, 1, 5.0, "Tea", conn=conn
+        )
+        self.assertEqual(expense_id, 1)
+        conn.close()
+
+    async def test_get_database_is_bot_scoped(self):
+        """
+        The same bot always gets the same Database instance; opening
+        the default one is logged.
+        """
+        bot = MagicMock(spec=[])
+        with self.assertLogs("src.utils.database", "WARNING"):
+            first = get_database(bot)
+        self.assertIs(get_database(bot), first)
+        first.close()
+
+    async def test_language_cache_uses_the_bot_database(self):
+        """
+        The language cache is built over bot.db and never opens a database of its own.
+        """
+        with self.assertRaises(RuntimeError):
+            get_language_cache(MagicMock(spec=[]))
+        bot = MagicMock(spec=[])
+        bot.db = self.database
+        self.assertIs(get_language_cache(bot).database, self.database)
+
+
+class TestShardedDatabase(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        """Create a database split in three shards in a temporary directory."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "expenses.db")
+        self.database = ShardedDatabase(self.path, shards=3, batch_window_ms=0)
+        # Two users stored on different shards
+        self.first = 1
+        self.second = next(
+            user for user in range(2, 100) if shard_index(user, 3) != shard_index(1, 3)
+        )
+
+    async def asyncTearDown(self):
+        self.database.close()
+        self.tmpdir.cleanup()
+
+    def count_rows(self, shard):
+        with sqlite3.connect(shard.path) as conn:
+            return dict(
+                conn.execute(
+                    "SELECT user_id, COUNT(*) FROM expenses GROUP BY user_id"
+                ).fetchall()
+            )
+
+    def test_users_are_hashed_to_a_stable_shard(self):
+        """The shard of a user depends only on its ID and the number of shards."""
+        self.assertEqual(
+            [shard_index(user, 4) for user in range(8)],
+            [shard_index(user, 4) for user in range(8)],
+        )
+        self.assertEqual(len({shard_index(user, 4) for user in range(1000)}), 4)
+        self.assertEqual(shard_paths("data/expenses.db", 1), ["data/expenses.db"])
+        self.assertEqual(
+            shard_paths("data/expenses.db", 2),
+            ["data/expenses.shard0-of-2.db", "data/expenses.shard1-of-2.db"],
+        )
+
+    async def test_calls_are_routed_to_the_user_shard(self):
+        """
+        db.py helpers are called as with one Database and land on
+        the shard of their user.
+        """
+        first_id = await self.database.insert_expense(self.first, 10.0, "Coffee")
+        await self.database.write(db.insert_expense, self.second, 5.0, "Tea")
+        await self.database.write(
+            db.update_expense, first_id, 12.0, "Large coffee", user_id=self.first
+        )
+
+        self.assertEqual(
+            self.count_rows(self.database.shard_for(self.first)), {self.first: 1}
+        )
+        self.assertEqual(
+            self.count_rows(self.database.shard_for(self.second)), {self.second: 1}
+        )
+        expenses = await self.database.read(db.list_expenses, self.first)
+        self.assertEqual(
+            [(row[0], row[2], row[3]) for row in expenses],
+            [(first_id, 12.0, "Large coffee")],
+        )
+
+    async def test_rows_are_split_by_user_and_ids_are_unique(self):
+        """
+        insert_expenses splits its rows by shard and returns their IDs in
+        order, unique across shards.
+        """
+        rows = [
+            (self.first, 1.0, "A", None),
+            (self.second, 2.0, "B", None),
+            (self.first, 3.0, "C", None),
+        ]
+        expense_ids = await self.database.write(db.insert_expenses, rows)
+
+        self.assertEqual(len(set(expense_ids)), 3)
+        self.assertEqual(expense_ids[0] // SHARD_ID_SPACING, shard_index(self.first, 3))
+        self.assertEqual(
+            expense_ids[1] // SHARD_ID_SPACING, shard_index(self.second, 3)
+        )
+        amounts = {row[0]: row[2] for user in (self.first, self.second)
+                   for row in await self.database.read(db.list_expenses, user)}
+        self.assertEqual(
+            [amounts[expense_id] for expense_id in expense_ids], [1.0, 2.0, 3.0]
+        )
+        self.assertEqual(
+            await self.database.write(
+                db.import_expenses, [row + (None,) for row in rows]
+            ),
+            3,
+        )
+
+    async def test_calls_without_a_user_run_on_every_shard(self):
+        """Maintenance helpers see every shard and their results are combined."""
+        await self.database.insert_expense(self.first, 10.0, "Coffee", "Food")
+        await self.database.insert_expense(self.second, 5.0, "Tea", "Food")
+
+        def count(conn):
+            return conn.execute("SELECT COUNT(*) FROM expenses").fetchone()[0]
+
+        self.assertEqual(await self.database.read(count), 2)
+        self.assertEqual(await self.database.read(db.find_expense_totals_drift), [])
+
+    async def test_write_listeners_hear_every_shard(self):
+        """Writes on any shard, batched or not, reach the listeners of the router."""
+        written = []
+        self.database.add_write_listener(written.append)
+        await self.database.insert_expense(self.first, 10.0, "Coffee")
+        await self.database.write(db.set_user_language, self.second, "es")
+        self.assertEqual(written, [self.first, self.second])
+
+        skipping = []
+        self.database.add_write_listener(skipping.append, inserts=False)
+        await self.database.insert_expense(self.first, 10.0, "Coffee")
+        await self.database.write(db.set_user_language, self.second, "en")
+        self.assertEqual(skipping, [self.second])
+
+    def test_partition_groups_users_by_shard(self):
+        groups = self.database.partition([self.first, self.second, self.first])
+        self.assertEqual(sorted(len(users) for _, users in groups), [1, 2])
+        for shard, users in groups:
+            self.assertTrue(
+                all(self.database.shard_for(user) is shard for user in users)
+            )
+
+    async def test_open_database_picks_the_layout_from_the_config(self):
+        single = open_database(DatabaseConfig(path=self.path))
+        sharded = open_database(DatabaseConfig(path=self.path, shards=2))
+        self.assertIsInstance(single, Database)
+        self.assertEqual(len(sharded.shards), 2)
+        single.close()
+        sharded.close()
+
+
+class TestReshard(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "expenses.db")
+        conn = sqlite3.connect(self.path)
+        for create in (
+            db.create_expenses_table,
+            db.create_budgets_table,
+            db.create_user_language_table,
+            db.create_expense_totals_table,
+            db.create_indexes,
+        ):
+            create(conn)
+        db.insert_expenses(
+            conn, [(user, 10.0, f"Expense {user}", "Food") for user in range(20)]
+        )
+        db.insert_budget(conn, 3, "Food", 100.0, "monthly", "2024-01-01", "2024-01-31")
+        db.set_user_language(conn, 3, "es")
+        conn.close()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_single_file_is_split_and_merged_back(self):
+        """
+        Resharding moves every user to its shard with its IDs, and back to one file.
+        """
+        four = shard_paths(self.path, 4)
+        self.assertEqual(sum(reshard([self.path], four)), 20)
+        for index, path in enumerate(four):
+            with sqlite3.connect(path) as conn:
+                users = [row[0] for row in conn.execute("SELECT user_id FROM expenses")]
+                self.assertTrue(all(shard_index(user, 4) == index for user in users))
+                self.assertEqual(db.find_expense_totals_drift(conn), [])
+
+        with sqlite3.connect(four[shard_index(3, 4)]) as conn:
+            self.assertEqual(db.get_user_language(conn, 3), "es")
+            self.assertIsNotNone(db.get_budget_by_category(conn, 3, "Food"))
+            self.assertEqual(
+                conn.execute("SELECT id FROM expenses WHERE user_id = 3").fetchone()[0],
+                4,
+            )
+
+        two = shard_paths(self.path, 2)
+        self.assertEqual(sum(reshard(four, two)), 20)
+
+    def test_ids_stay_unique_after_resharding_shards(self):
+        """
+        New rows never reuse an ID kept from the previous layout
+        or given by another shard.
+        """
+        two, three = shard_paths(self.path, 2), shard_paths(self.path, 3)
+        reshard([self.path], two)
+        for index, path in enumerate(two):
+            with sqlite3.connect(path) as conn:
+                db.set_id_floor(conn, index * SHARD_ID_SPACING)
+                db.insert_expenses(
+                    conn,
+                    [
+                        (user, 5.0, "After the split", None)
+                        for user in range(20)
+                        if shard_index(user, 2) == index
+                    ],
+                )
+                db.insert_budget(
+                    conn,
+                    20 + index,
+                    "Food",
+                    50.0,
+                    "monthly",
+                    "2024-01-01",
+                    "2024-01-31",
+                )
+        self.assertEqual(sum(reshard(two, three)), 40)
+
+        ids = {"expenses": [], "budgets": []}
+        for index, path in enumerate(three):
+            with sqlite3.connect(path) as conn:
+                # As the shard's Database does on connect
+                db.set_id_floor(conn, index * SHARD_ID_SPACING)
+                db.insert_expense(conn, 100 + index, 1.0, "After the second split")
+                db.insert_budget(
+                    conn,
+                    100 + index,
+                    "Food",
+                    50.0,
+                    "monthly",
+                    "2024-01-01",
+                    "2024-01-31",
+                )
+                for table in ids:
+                    ids[table] += [
+                        row[0] for row in conn.execute(f"SELECT id FROM {table}")
+                    ]
+        self.assertEqual(len(ids["expenses"]), 43)
+        self.assertEqual(len(ids["budgets"]), 6)
+        for table, table_ids in ids.items():
+            self.assertEqual(len(set(table_ids)), len(table_ids), table)
+
+    def test_totals_are_checked_in_every_configured_shard(self):
+        """
+        The maintenance commands open the files of database.path and database.shards.
+        """
+        two = shard_paths(self.path, 2)
+        reshard([self.path], two)
+        for path in two:
+            with sqlite3.connect(path) as conn:
+                conn.execute("UPDATE expense_totals SET total = total + 1")
+
+        config = Config(database=DatabaseConfig(path=self.path, shards=2))
+        with (
+            patch('src.migrations.migrate_database.load_config', return_value=config),
+            contextlib.redirect_stdout(io.StringIO()),
+        ):
+            drifted = check_expense_totals(rebuild=True)
+            self.assertEqual(check_expense_totals(), 0)
+        with sqlite3.connect(two[0]) as first, sqlite3.connect(two[1]) as second:
+            self.assertEqual(
+                drifted,
+                sum(
+                    conn.execute("SELECT COUNT(*) FROM expense_totals").fetchone()[0]
+                    for conn in (first, second)
+                ),
+            )
+        self.assertGreater(drifted, 1)
+
+    def test_existing_targets_are_not_overwritten(self):
+        with self.assertRaises(FileExistsError):
+            reshard(shard_paths(self.path, 2), [self.path])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import io
+import json
+import logging
+import logging.handlers
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+from src.utils.config import ConfigError, LoggingConfig
+from src.utils.logging_config import (
+    JsonFormatter,
+    TextFormatter,
+    command_fields,
+    parse_levels,
+    setup_logging,
+    shutdown_logging,
+)
+
+class ThreadRecordingStream(io.StringIO):
+    """A text stream remembering which threads wrote to it."""
+
+    def __init__(self):
+        super().__init__()
+        self.threads = set()
+
+    def write(self, text):
+        self.threads.add(threading.current_thread().name)
+        return super().write(text)
+
+
+def make_record(**extra):
+    record = logging.LogRecord(
+        "src.commands.test", logging.INFO, __file__, 1, "Command %s", ("done",), None
+    )
+    record.__dict__.update(extra)
+    return record
+
+
+class TestFormatters(unittest.TestCase):
+
+    def test_json_formatter(self):
+        """JSON lines carry the message and the structured fields."""
+        entry = json.loads(
+            JsonFormatter().format(
+                make_record(command="log_expense", user_id=1, latency_ms=2.5)
+            )
+        )
+        self.assertEqual(entry["message"], "Command done")
+        self.assertEqual(entry["logger"], "src.commands.test")
+        self.assertEqual(
+            (entry["command"], entry["user_id"], entry["latency_ms"]),
+            ("log_expense", 1, 2.5),
+        )
+
+    def test_text_formatter(self):
+        """Text lines end with the structured fields as key=value pairs."""
+        line = TextFormatter().format(make_record(user_id=1))
+        self.assertTrue(line.endswith("INFO src.commands.test: Command done user_id=1"))
+
+    def test_command_fields(self):
+        ctx = MagicMock()
+        ctx.command.qualified_name = "forecast"
+        ctx.author.id = 7
+        self.assertEqual(command_fields(ctx), {"command": "forecast", "user_id": 7})
+
+    def test_parse_levels(self):
+        """Per-logger levels are parsed and validated."""
+        self.assertEqual(parse_levels("src.utils.db=debug, discord=WARNING"),
+                         {"src.utils.db": "DEBUG", "discord": "WARNING"})
+        self.assertEqual(parse_levels(""), {})
+        for value in ("src.utils.db", "src.utils.db=LOUD", "=INFO"):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    parse_levels(value)
+        with self.assertRaises(ConfigError):
+            LoggingConfig(levels="discord=LOUD")
+
+
+class TestSetupLogging(unittest.TestCase):
+
+    def setUp(self):
+        self.root_level = logging.getLogger().level
+
+    def tearDown(self):
+        shutdown_logging()
+        logging.getLogger().setLevel(self.root_level)
+
+    def test_records_are_written_by_the_listener_thread(self):
+        """
+        Records go through a queue and are formatted and written off the calling thread.
+        """
+        stream = ThreadRecordingStream()
+        setup_logging(
+            log_format="json", stream=stream, levels={"test.quiet": "WARNING"}
+        )
+        self.assertTrue(any(isinstance(handler, logging.handlers.QueueHandler)
+                            for handler in logging.getLogger().handlers))
+
+        logging.getLogger("test.loud").info("Logged", extra={"user_id": 3})
+        logging.getLogger("test.quiet").info("Filtered out")
+        logging.getLogger("test.quiet").warning("Kept")
+        shutdown_logging()
+
+        entries = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual([entry["message"] for entry in entries], ["Logged", "Kept"])
+        self.assertEqual(entries[0]["user_id"], 3)
+        self.assertNotIn(threading.current_thread().name, stream.threads)
+        self.assertFalse(any(isinstance(handler, logging.handlers.QueueHandler)
+                             for handler in logging.getLogger().handlers))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+import os
+import random
+import sqlite3
+import tempfile
+import unittest
+
+import aiohttp
+
+from src.utils import db
+from src.utils.cache import LRUCache
+from src.utils.config import ConfigError, MetricsConfig
+from src.utils.database import Database
+from src.utils.metrics import (
+    Histogram, Metrics, MetricsServer, command_db_time, format_stats, prometheus_text,
+    registry, start_command, timed,
+)
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_quantiles_are_within_the_bucket_precision(self):
+        """Quantiles of a wide range of latencies stay within 2% of the exact values."""
+        rng = random.Random(1)
+        values = sorted(rng.lognormvariate(-6, 1.5) for _ in range(10000))
+        histogram = Histogram()
+        for value in values:
+            histogram.record(value)
+
+        for quantile, estimate in zip((0.5, 0.95, 0.99), histogram.quantiles()):
+            exact = values[round(quantile * len(values)) - 1]
+            self.assertAlmostEqual(estimate / exact, 1, delta=0.02)
+        self.assertEqual(histogram.count, len(values))
+        self.assertAlmostEqual(histogram.mean, sum(values) / len(values))
+
+    def test_small_values_are_exact_and_empty_histograms_report_zero(self):
+        """Latencies below the first power-of-two range keep microsecond resolution."""
+        histogram = Histogram()
+        self.assertEqual(histogram.quantiles(), [0.0, 0.0, 0.0])
+        for micros in (5, 10, 20):
+            histogram.record(micros / 1_000_000)
+        self.assertEqual(histogram.quantiles((0.0, 0.5, 1.0)), [5e-06, 1e-05, 2e-05])
+
+    def test_buckets_stay_bounded(self):
+        """
+        A million distinct latencies up to an hour use a few thousand buckets at most.
+        """
+        histogram = Histogram()
+        for micros in range(1, 3_600_000_000, 3600):
+            histogram.record(micros / 1_000_000)
+        self.assertLess(len(histogram.counts), 2000)
+
+
+class TestInstrumentation(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        registry.reset()
+        self.conn = sqlite3.connect(":memory:")
+        db.create_expenses_table(self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+        registry.reset()
+
+    def test_every_db_call_is_timed(self):
+        """
+        Each db.py helper records its calls in its own histogram, keeping its signature.
+        """
+        db.insert_expense(self.conn, 1, 10.0, "Coffee")
+        db.insert_expense(self.conn, 1, 5.0, "Tea")
+        db.list_expenses(self.conn, 1)
+
+        latencies = registry.snapshot()["latencies"]
+        self.assertEqual(latencies["db.insert_expense"]["count"], 2)
+        self.assertEqual(latencies["db.list_expenses"]["count"], 1)
+        self.assertEqual(db.insert_expense.__name__, "insert_expense")
+        self.assertEqual(db.insert_expense.__module__, db.__name__)
+
+    def test_generators_are_timed_over_their_iteration(self):
+        """Generator helpers are recorded once, when the iteration ends."""
+        metrics = Metrics()
+
+        def numbers():
+            yield from range(3)
+
+        self.assertEqual(list(timed(numbers, "numbers", metrics)()), [0, 1, 2])
+        self.assertEqual(metrics.histograms["numbers"].count, 1)
+
+    async def test_commands_accumulate_the_time_spent_awaiting_the_database(self):
+        """Database awaits made by a command add up to its database time."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            database = Database(os.path.join(tmpdir, "expenses.db"), pool_size=1)
+            try:
+                start_command()
+                await database.write(db.insert_expense, 1, 10.0, "Coffee")
+                after_write = command_db_time()
+                await database.read(db.list_expenses, 1)
+                self.assertGreater(after_write, 0)
+                self.assertGreater(command_db_time(), after_write)
+            finally:
+                database.close()
+
+
+class TestReporting(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.metrics = Metrics()
+        for latency in (0.001, 0.002, 0.004):
+            self.metrics.observe("command.log_expense", latency)
+        self.metrics.increment("command.log_expense.failed")
+        cache = LRUCache(4)
+        cache.put(1, "en")
+        cache.get(1)
+        cache.get(2)
+        self.metrics.register_cache("languages", cache)
+
+    def test_format_stats(self):
+        """
+        The !stats table shows the quantiles in milliseconds, the
+        counters and the hit rates.
+        """
+        table = format_stats(self.metrics.snapshot())
+        self.assertIn("command.log_expense", table)
+        self.assertIn("4.00", table)
+        self.assertIn("command.log_expense.failed", table)
+        self.assertIn("50.0%", table)
+
+    def test_prometheus_text(self):
+        """
+        The exposition format has a summary per histogram, counters and cache gauges.
+        """
+        text = prometheus_text(self.metrics.snapshot())
+        self.assertIn(
+            'expense_bot_latency_seconds{name="command.log_expense",quantile="0.95"} '
+            '0.004000',
+            text,
+        )
+        self.assertIn(
+            'expense_bot_latency_seconds_count{name="command.log_expense"} 3', text
+        )
+        self.assertIn(
+            'expense_bot_events_total{name="command.log_expense.failed"} 1', text
+        )
+        self.assertIn('expense_bot_cache_hit_ratio{cache="languages"} 0.500000', text)
+
+    async def test_server_serves_the_metrics(self):
+        """The endpoint serves the Prometheus text on /metrics."""
+        server = MetricsServer(self.metrics, port=0)
+        await server.start()
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(
+                    f"http://127.0.0.1:{server.port}/metrics"
+                ) as response:
+                    self.assertEqual(response.status, 200)
+                    self.assertIn(
+                        "expense_bot_latency_seconds_count", await response.text()
+                    )
+        finally:
+            await server.stop()
+
+    def test_config_validates_the_port(self):
+        self.assertEqual(MetricsConfig().prometheus_port, 0)
+        with self.assertRaises(ConfigError):
+            MetricsConfig(prometheus_port=70000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,216 @@
+import random
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+from src.utils.nlu import (
+    CategoryMatcher,
+    ExpenseParser,
+    FuzzyIndex,
+    TokenTrie,
+    UserCategories,
+    levenshtein,
+    normalize,
+    parse_expense,
+    similarity,
+)
+from src.utils.validation import validate_amount
+
+
+def reference_levenshtein(a, b):
+    """Textbook edit distance over the full table."""
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (char_a != char_b),
+                )
+            )
+        previous = current
+    return previous[-1]
+
+
+class TestFuzzyMatching(unittest.TestCase):
+
+    def test_normalize(self):
+        """Case, accents, punctuation and spacing are ignored."""
+        self.assertEqual(normalize("  Café,  Almuerzo!"), "cafe almuerzo")
+
+    def test_levenshtein(self):
+        """
+        The banded edit distance matches the full table, and gives up past max_distance.
+        """
+        self.assertEqual(levenshtein("kitten", "sitting"), 3)
+        rng = random.Random(0)
+        for _ in range(2000):
+            a = "".join(rng.choice("abc") for _ in range(rng.randrange(8)))
+            b = "".join(rng.choice("abc") for _ in range(rng.randrange(8)))
+            max_distance = rng.randrange(5)
+            expected = reference_levenshtein(a, b)
+            self.assertEqual(levenshtein(a, b), expected, (a, b))
+            self.assertEqual(
+                levenshtein(a, b, max_distance),
+                min(expected, max_distance + 1),
+                (a, b, max_distance),
+            )
+        self.assertEqual(similarity("taxi", "taxi"), 1.0)
+        self.assertEqual(similarity("taxi", "taxo"), 0.75)
+
+    def test_index_search(self):
+        """The closest entries are found despite typos, most similar first."""
+        index = FuzzyIndex()
+        for text, value in [
+            ("Groceries", "Food"),
+            ("Grocery store", "Food"),
+            ("Gas station", "Car"),
+            ("Gym", "Health"),
+        ]:
+            index.add(text, value)
+        matches = index.search("grocerys", limit=2)
+        self.assertEqual(
+            [match["text"] for match in matches], ["groceries", "grocery store"]
+        )
+        self.assertEqual(matches[0]["value"], "Food")
+        self.assertEqual(index.search("gas statoin")[0]["value"], "Car")
+        self.assertEqual(index.search("zzz"), [])
+
+        # Adding the same text again replaces its value
+        index.add("GROCERIES", "Supermarket")
+        self.assertEqual(len(index), 4)
+        self.assertEqual(index.search("groceries")[0]["value"], "Supermarket")
+
+    def test_suggest(self):
+        """
+        A category is suggested from similar descriptions, or from a
+        word resembling a category.
+        """
+        user = UserCategories()
+        user.add("Uber to the airport", "Transport")
+        user.add("Lunch at cafe", "Food")
+        self.assertEqual(user.suggest("uber to the airprot"), "Transport")
+        self.assertEqual(user.suggest("More food for the week"), "Food")
+        self.assertIsNone(user.suggest("Concert tickets"))
+
+
+class TestCategoryMatcher(unittest.IsolatedAsyncioTestCase):
+
+    async def test_loads_and_learns(self):
+        """
+        A user's index is loaded from their categorized expenses
+        once, then learns new ones.
+        """
+        database = MagicMock()
+        database.read = AsyncMock(return_value=[("Lunch at cafe", "Food")])
+        matcher = CategoryMatcher(database)
+
+        self.assertEqual(await matcher.suggest(1, "lunch at the cafe"), "Food")
+        self.assertIsNone(await matcher.suggest(1, "Netflix subscription"))
+        matcher.learn(1, "Netflix subscription", "Entertainment")
+        self.assertEqual(
+            await matcher.suggest(1, "netflix subscripton"), "Entertainment"
+        )
+        database.read.assert_awaited_once()
+
+
+class TestExpenseParser(unittest.TestCase):
+
+    NOW = datetime(2024, 5, 10, 15, 0, tzinfo=timezone.utc)
+
+    def test_english(self):
+        """Amount, description, category keyword and relative date are extracted."""
+        self.assertEqual(parse_expense("spent 12.50 on lunch yesterday", self.NOW), {
+            "amount": 12.5, "description": "lunch", "category": "Food",
+            "date_added": "2024-05-09 15:00:00", "language": "en",
+        })
+        parsed = parse_expense("I paid $1,000 for rent on 2024-05-01", self.NOW)
+        self.assertEqual(
+            (parsed["amount"], parsed["description"], parsed["date_added"]),
+            (1000.0, "rent", "2024-05-01 00:00:00"),
+        )
+        parsed = parse_expense("bought 5 euros of coffee at Café Luna", self.NOW)
+        self.assertEqual(
+            (parsed["description"], parsed["category"]),
+            ("of coffee at Café Luna", "Food"),
+        )
+
+    def test_spanish(self):
+        """Accents are optional and '.' separates thousands in Spanish amounts."""
+        self.assertEqual(parse_expense("gasté 20 en taxi", self.NOW), {
+            "amount": 20.0, "description": "taxi", "category": "Transporte",
+            "date_added": None, "language": "es",
+        })
+        parsed = parse_expense("Gaste $20.000 en el almuerzo antes de ayer", self.NOW)
+        self.assertEqual(
+            (parsed["amount"], parsed["description"], parsed["date_added"]),
+            (20000.0, "el almuerzo", "2024-05-08 15:00:00"),
+        )
+        self.assertEqual(
+            parse_expense("pagué 12,50 por un libro", self.NOW)["amount"], 12.5
+        )
+        self.assertEqual(
+            parse_expense("pagué 1.234,56 por un libro", self.NOW)["amount"], 1234.56
+        )
+
+    def test_amounts_agree_with_validation(self):
+        """Messages and commands read the same amounts."""
+        for text, amount in (
+            ("spent 1,234 on rent", "1,234"),
+            ("spent 1,000,000 on a house", "1,000,000"),
+            ("spent 1,234.5 on rent", "1,234.5"),
+            ("spent 12.5 on lunch", "12.5"),
+        ):
+            with self.subTest(text=text):
+                self.assertEqual(
+                    parse_expense(text, self.NOW)["amount"], validate_amount(amount)
+                )
+
+    def test_rejects_other_messages(self):
+        """
+        Ordinary chat and expenses without an amount or description are not parsed.
+        """
+        for text in (
+            "hello there",
+            "spent lots on lunch",
+            "spent 12",
+            "spent 10 yesterday",
+            "I spent all day",
+        ):
+            with self.subTest(text=text):
+                self.assertIsNone(parse_expense(text, self.NOW))
+
+    def test_token_trie(self):
+        """The longest phrase wins."""
+        trie = TokenTrie()
+        trie.add("ayer", 1)
+        trie.add("antes de ayer", 2)
+        self.assertEqual(trie.match(["antes", "de", "ayer"], 0), (3, 2))
+        self.assertEqual(trie.match(["antes", "de", "ayer"], 2), (3, 1))
+        self.assertIsNone(trie.match(["antes", "de"], 0))
+
+    def test_custom_keywords(self):
+        """Parsers can be built for other vocabularies."""
+        parser = ExpenseParser(
+            {
+                "fr": {
+                    "decimal_separator": ",",
+                    "triggers": ["dépensé"],
+                    "prepositions": ["pour"],
+                    "dates": {"hier": 1},
+                    "currencies": ["€"],
+                    "categories": {"déjeuner": "Repas"},
+                }
+            }
+        )
+        parsed = parser.parse("dépensé 9,90 € pour déjeuner", self.NOW)
+        self.assertEqual(
+            (parsed["amount"], parsed["description"], parsed["category"]),
+            (9.9, "déjeuner", "Repas"),
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,194 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import date
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from src.utils import db
+from src.utils.database import Database
+from src.utils.lang import translate
+from src.utils.scheduler import BudgetMonitor, Scheduler
+
+
+class TestScheduler(unittest.IsolatedAsyncioTestCase):
+
+    async def test_runs_jobs_periodically(self):
+        """A registered job runs once per interval until stopped."""
+        calls = []
+
+        async def job():
+            calls.append(1)
+
+        scheduler = Scheduler()
+        scheduler.every(0.01, job)
+        scheduler.start()
+        await asyncio.sleep(0.055)
+        scheduler.stop()
+        self.assertGreaterEqual(len(calls), 3)
+        self.assertFalse(scheduler.running)
+
+    async def test_failing_job_keeps_running(self):
+        """An exception in a job is logged and the schedule continues."""
+        calls = []
+
+        async def job():
+            calls.append(1)
+            raise RuntimeError("boom")
+
+        scheduler = Scheduler()
+        scheduler.every(0.01, job)
+        with self.assertLogs("src.utils.scheduler", level="ERROR"):
+            scheduler.start()
+            await asyncio.sleep(0.035)
+        scheduler.stop()
+        self.assertGreaterEqual(len(calls), 2)
+
+    async def test_start_is_idempotent(self):
+        """
+        Starting twice (as on_ready does after a reconnect) keeps a single task per job.
+        """
+        scheduler = Scheduler()
+        scheduler.every(60, AsyncMock(), name="job")
+        scheduler.start()
+        task = scheduler._tasks["job"]
+        scheduler.start()
+        self.assertIs(scheduler._tasks["job"], task)
+        scheduler.stop()
+
+
+class TestBudgetMonitor(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        """Set up a temporary database, a fake bot and the monitor."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.database = Database(
+            os.path.join(self.tmpdir.name, "expenses.db"), batch_window_ms=0
+        )
+        self.user = MagicMock()
+        self.user.send = AsyncMock()
+        self.bot = MagicMock()
+        self.bot.get_user.return_value = self.user
+        self.monitor = BudgetMonitor(self.bot, self.database)
+
+        today = date.today()
+        await self.database.write(
+            db.insert_budget,
+            1,
+            "Food",
+            50.0,
+            "monthly",
+            today.replace(day=1).isoformat(),
+            today.isoformat(),
+        )
+        self.monitor.dirty.clear()
+
+    async def asyncTearDown(self):
+        self.monitor.close()
+        self.database.close()
+        self.tmpdir.cleanup()
+
+    async def test_warns_once_when_budget_exceeded(self):
+        """Exceeding a budget sends one DM, even if the user keeps spending."""
+        await self.database.insert_expense(1, 30.0, "Groceries", "Food")
+        await self.monitor.run_once()
+        self.user.send.assert_not_called()
+
+        await self.database.insert_expense(1, 30.0, "Restaurant", "Food")
+        await self.monitor.run_once()
+        self.user.send.assert_called_once_with(
+            translate(
+                "budget_exceeded",
+                "en",
+                category="Food",
+                total_spent="60.00",
+                budget="50.00",
+            )
+        )
+
+        await self.database.insert_expense(1, 5.0, "Snack", "Food")
+        await self.monitor.run_once()
+        self.user.send.assert_called_once()
+
+    async def test_only_dirty_users_are_checked(self):
+        """A pass without writes since the previous one does not query the database."""
+        with patch.object(self.database, "read", wraps=self.database.read) as mock_read:
+            await self.monitor.run_once()
+            mock_read.assert_not_called()
+
+            await self.database.insert_expense(2, 10.0, "Other user", "Food")
+            self.assertEqual(self.monitor.dirty, {2})
+            await self.monitor.run_once()
+            mock_read.assert_called_once()
+        self.assertEqual(self.monitor.dirty, set())
+
+    async def test_users_are_checked_again_after_a_failed_pass(self):
+        """A read that fails leaves the users dirty for the next pass."""
+        await self.database.insert_expense(1, 60.0, "Groceries", "Food")
+        with patch.object(
+            self.database,
+            "read",
+            AsyncMock(side_effect=sqlite3.OperationalError("locked")),
+        ):
+            with self.assertRaises(sqlite3.OperationalError):
+                await self.monitor.run_once()
+        self.assertEqual(self.monitor.dirty, {1})
+
+        await self.monitor.run_once()
+        self.user.send.assert_called_once()
+
+    async def test_a_failed_warning_does_not_lose_the_others(self):
+        """
+        A user whose warning cannot be sent is checked again on the next pass, while
+        the other users are warned.
+        """
+        today = date.today()
+        await self.database.write(
+            db.insert_budget,
+            2,
+            "Food",
+            50.0,
+            "monthly",
+            today.replace(day=1).isoformat(),
+            today.isoformat(),
+        )
+        await self.database.insert_expense(1, 60.0, "Groceries", "Food")
+        await self.database.insert_expense(2, 70.0, "Groceries", "Food")
+        other_user = MagicMock()
+        other_user.send = AsyncMock()
+        self.bot.get_user.side_effect = lambda user_id: {
+            1: MagicMock(send=AsyncMock(side_effect=RuntimeError("No DM channel"))),
+            2: other_user,
+        }[user_id]
+
+        with self.assertLogs("src.utils.scheduler", "ERROR"):
+            await self.monitor.run_once()
+        other_user.send.assert_called_once()
+        self.assertEqual(self.monitor.dirty, {1})
+
+        self.bot.get_user.side_effect = lambda user_id: {
+            1: self.user, 2: other_user
+        }[user_id]
+        await self.monitor.run_once()
+        self.user.send.assert_called_once()
+        other_user.send.assert_called_once()
+
+    async def test_reported_budgets_are_forgotten_once_gone(self):
+        """
+        Only the budgets still exceeded are remembered, so deleted ones don't pile up.
+        """
+        await self.database.insert_expense(1, 60.0, "Groceries", "Food")
+        await self.monitor.run_once()
+        self.assertEqual(len(self.monitor._notified[1]), 1)
+
+        await self.database.write(
+            lambda conn: conn.execute("DELETE FROM budgets").connection.commit()
+        )
+        self.monitor.mark_dirty(1)
+        await self.monitor.run_once()
+        self.assertEqual(self.monitor._notified, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
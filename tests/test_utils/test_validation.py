@@ -0,0 +1,216 @@
+import math
+import statistics
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from src.utils.validation import (
+    DUPLICATE_WINDOW,
+    OUTLIER_MIN_SAMPLES,
+    ExpenseValidator,
+    RunningStats,
+    ValidationError,
+    normalize_description,
+    validate_amount,
+    validate_date,
+    validate_expense_row,
+    validate_text,
+)
+
+class TestValidation(unittest.TestCase):
+
+    def test_amounts(self):
+        """Amounts are parsed with either decimal separator and must be positive."""
+        self.assertEqual(validate_amount("12.5"), 12.5)
+        self.assertEqual(validate_amount(" 1,234.50 "), 1234.5)
+        self.assertEqual(validate_amount("1.234,50"), 1234.5)
+        self.assertEqual(validate_amount("12,5"), 12.5)
+        self.assertEqual(validate_amount(3), 3.0)
+        self.assertEqual(validate_amount("1,234"), 1234.0)
+        self.assertEqual(validate_amount("1.234,56"), 1234.56)
+        self.assertEqual(validate_amount("1,000,000"), 1000000.0)
+        self.assertEqual(validate_amount("1.000.000"), 1000000.0)
+        for value in (
+            "",
+            "abc",
+            "0",
+            "-4",
+            "nan",
+            "inf",
+            None,
+            True,
+            "1,2,3",
+            "12,34.5",
+            "1.2345,6",
+        ):
+            with self.subTest(value=value):
+                with self.assertRaises(ValidationError):
+                    validate_amount(value)
+
+    def test_text(self):
+        """Text fields are stripped; empty optional fields become None."""
+        self.assertEqual(validate_text("  Lunch ", "description", 10), "Lunch")
+        self.assertIsNone(validate_text(" ", "category", 10, required=False))
+        with self.assertRaises(ValidationError):
+            validate_text("", "description", 10)
+        with self.assertRaises(ValidationError):
+            validate_text("x" * 11, "description", 10)
+
+    def test_dates(self):
+        """ISO dates become SQLite timestamps in UTC."""
+        self.assertEqual(validate_date("2024-01-05"), "2024-01-05 00:00:00")
+        self.assertEqual(validate_date("2024-01-05T10:30"), "2024-01-05 10:30:00")
+        self.assertEqual(
+            validate_date("2024-01-05T10:00:00+02:00"), "2024-01-05 08:00:00"
+        )
+        self.assertIsNone(validate_date(""))
+        self.assertIsNone(validate_date(None))
+        for value in ("05/01/2024", "2024-13-01", 20240105):
+            with self.subTest(value=value):
+                with self.assertRaises(ValidationError):
+                    validate_date(value)
+
+    def test_row_with_aliases(self):
+        """Rows may use Spanish column names and omit the optional fields."""
+        self.assertEqual(
+            validate_expense_row(
+                {"monto": "5", "descripción": "Bus", "fecha": "2024-02-01"}
+            ),
+            (5.0, "Bus", None, "2024-02-01 00:00:00"),
+        )
+        with self.assertRaises(ValidationError):
+            validate_expense_row({"description": "No amount"})
+
+    def test_running_stats(self):
+        """
+        Welford's algorithm matches the batch mean and variance
+        until the window is full.
+        """
+        values = [3.0, 7.5, 1.25, 9.0, 4.0]
+        stats = RunningStats()
+        for value in values:
+            stats.add(value)
+        self.assertAlmostEqual(stats.mean, statistics.mean(values))
+        self.assertAlmostEqual(stats.variance, statistics.variance(values))
+
+        # Past the window, recent values dominate
+        stats = RunningStats(window=10)
+        for value in [100.0] * 50 + [1.0] * 50:
+            stats.add(value)
+        self.assertLess(stats.mean, 2.0)
+
+    def test_normalize_description(self):
+        """Descriptions differing only in case, punctuation or spacing share a key."""
+        self.assertEqual(
+            normalize_description("  Lunch  at Café!"),
+            normalize_description("lunch at café"),
+        )
+        self.assertNotEqual(
+            normalize_description("Lunch"), normalize_description("Dinner")
+        )
+
+
+class TestExpenseValidator(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.database = MagicMock()
+        self.database.read = AsyncMock(return_value=[])
+        self.validator = ExpenseValidator(self.database)
+
+    async def test_duplicates(self):
+        """
+        A similar expense within the window is flagged with the ID of the earlier one.
+        """
+        self.assertEqual(await self.validator.check(1, 12.0, "Taxi", now=1000.0), [])
+        self.validator.record(1, 7, 12.0, "Taxi", now=1000.0)
+
+        findings = await self.validator.check(1, 12.05, "taxi.", now=1120.0)
+        self.assertEqual(
+            findings, [{"kind": "duplicate", "expense_id": 7, "seconds_ago": 120.0}]
+        )
+
+        # Different amount, different user, or outside the window
+        self.assertEqual(await self.validator.check(1, 30.0, "Taxi", now=1120.0), [])
+        self.assertEqual(await self.validator.check(2, 12.0, "Taxi", now=1120.0), [])
+        self.assertEqual(
+            await self.validator.check(1, 12.0, "Taxi", now=1001.0 + DUPLICATE_WINDOW),
+            [],
+        )
+
+        # The history was loaded once per user
+        self.assertEqual(self.database.read.await_count, 2)
+
+    async def test_outliers(self):
+        """Amounts far above the user's usual spending in a category are flagged."""
+        for i in range(OUTLIER_MIN_SAMPLES):
+            self.assertEqual(
+                await self.validator.check(
+                    1, 10.0 + i, f"Lunch {i}", "Food", now=i * 3600.0
+                ),
+                [],
+            )
+            self.validator.record(
+                1, i + 1, 10.0 + i, f"Lunch {i}", "Food", now=i * 3600.0
+            )
+
+        self.assertEqual(
+            await self.validator.check(1, 16.0, "Dinner", "Food", now=1e6), []
+        )
+        findings = await self.validator.check(1, 400.0, "Dinner", "Food", now=1e6)
+        self.assertEqual([finding["kind"] for finding in findings], ["outlier"])
+        self.assertEqual(findings[0]["category"], "Food")
+        self.assertAlmostEqual(
+            findings[0]["usual"],
+            math.exp(statistics.mean(math.log(10.0 + i) for i in range(8))),
+        )
+
+        # Other categories have their own statistics
+        self.assertEqual(
+            await self.validator.check(1, 400.0, "Rent", "Housing", now=1e6), []
+        )
+
+    async def test_history_seeded_from_database(self):
+        """
+        A user's recent expenses are loaded from the database on their first check.
+        """
+        self.database.read.return_value = [
+            (3, 1, 50.0, "Groceries", None, "2024-01-01 10:05:00"),
+            (2, 1, 20.0, "Coffee", None, "2024-01-01 10:00:00"),
+        ]
+        now = 1704103500.0  # 2024-01-01 10:05:00 UTC
+        findings = await self.validator.check(1, 50.0, "groceries", now=now + 60)
+        self.assertEqual(
+            findings, [{"kind": "duplicate", "expense_id": 3, "seconds_ago": 60.0}]
+        )
+        self.assertEqual(self.validator.histories.get(1).stats[None].count, 2)
+
+    async def test_old_entries_are_pruned(self):
+        """
+        Expenses past the duplicate window are dropped from the history on each check.
+        """
+        await self.validator.check(1, 10.0, "Expense 0", now=1000.0)
+        for i in range(50):
+            self.validator.record(1, i + 1, 10.0, f"Expense {i}", now=1000.0)
+        self.assertEqual(len(self.validator.histories.get(1).recent), 50)
+        await self.validator.check(
+            1, 10.0, "Something else", now=1001.0 + DUPLICATE_WINDOW
+        )
+        self.assertEqual(self.validator.histories.get(1).recent, {})
+
+    async def test_writes_invalidate_the_history(self):
+        """
+        A delete or an update of the user's expenses drops their history,
+        reloaded on the next check.
+        """
+        self.database.add_write_listener.assert_called_once_with(
+            self.validator.invalidate_user, inserts=False
+        )
+        await self.validator.check(1, 12.0, "Taxi", now=1000.0)
+        self.validator.record(1, 7, 12.0, "Taxi", now=1000.0)
+
+        self.validator.invalidate_user(1)  # Expense 7 was deleted
+        self.assertEqual(await self.validator.check(1, 12.0, "Taxi", now=1060.0), [])
+        self.assertEqual(self.database.read.await_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import asyncio
+import time
+import unittest
+
+from src.utils.config import ConfigError, WatchdogConfig
+from src.utils.metrics import Metrics
+from src.utils.watchdog import LoopWatchdog
+
+
+def blocking_call(seconds):
+    """Stands for a synchronous call made on the event loop, e.g. sqlite3.connect."""
+    time.sleep(seconds)
+
+
+class TestLoopWatchdog(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.metrics = Metrics()
+        self.watchdog = LoopWatchdog(
+            interval=0.01, threshold=0.05, metrics=self.metrics
+        )
+        self.watchdog.start()
+        await asyncio.sleep(0.02)
+
+    async def asyncTearDown(self):
+        await self.watchdog.stop()
+
+    async def test_stalls_are_reported_with_the_blocking_stack_and_command(self):
+        """
+        A command blocking the loop is logged with its name and the
+        stack of the blocking call.
+        """
+        with self.assertLogs("src.utils.watchdog", level="WARNING") as logs:
+            self.watchdog.command_started("log_expense")
+            blocking_call(0.3)
+            self.watchdog.command_finished()
+            await asyncio.sleep(0.05)
+
+        record = logs.records[0]
+        self.assertEqual(record.command, "log_expense")
+        self.assertGreaterEqual(record.lag_ms, 250)
+        self.assertIn("blocking_call", record.stack)
+        self.assertIn("time.sleep(seconds)", record.stack)
+        self.assertIn("in command log_expense", record.getMessage())
+        self.assertEqual(self.metrics.counters["loop.stalls"], 1)
+
+    async def test_lag_is_recorded_without_reports_when_the_loop_is_free(self):
+        """Ticks below the threshold only feed the loop.lag histogram."""
+        with self.assertNoLogs("src.utils.watchdog", level="WARNING"):
+            await asyncio.sleep(0.1)
+        self.assertGreater(self.metrics.histograms["loop.lag"].count, 3)
+        self.assertNotIn("loop.stalls", self.metrics.counters)
+
+    async def test_stop_ends_the_task_and_the_sampler(self):
+        sampler = self.watchdog._sampler
+        await self.watchdog.stop()
+        self.assertFalse(sampler.is_alive())
+        self.assertIsNone(self.watchdog._task)
+
+
+class TestWatchdogConfig(unittest.TestCase):
+
+    def test_threshold_zero_disables_the_watchdog(self):
+        self.assertIsNone(LoopWatchdog.from_config(WatchdogConfig(threshold=0)))
+        watchdog = LoopWatchdog.from_config(WatchdogConfig(interval=0.5, threshold=1.0))
+        self.assertEqual((watchdog.interval, watchdog.threshold), (0.5, 1.0))
+
+    def test_invalid_values_are_rejected(self):
+        with self.assertRaises(ConfigError):
+            WatchdogConfig(interval=0)
+        with self.assertRaises(ConfigError):
+            WatchdogConfig(threshold=-1)
+
+
+if __name__ == "__main__":
+    unittest.main()